@@ -0,0 +1,244 @@
+"""
+Medición de rendimiento del proceso de evaluación con datos sintéticos.
+
+Genera libros con la hoja 'Respuestas de formulario 1' para varios tamaños y mide por
+separado la lectura, el cálculo de puntuaciones, la exportación del archivo general y
+la escritura de reportes individuales, además del tiempo de arranque del programa.
+Los resultados se guardan en JSON para poder compararlos entre versiones:
+
+    python benchmark.py --tamanos 100 1000 10000 --salida bench.json
+    python benchmark.py --tamanos 100 1000 --comparar bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import openpyxl
+import pandas as pd
+from openpyxl import Workbook
+
+from main import (backends_reporte, calcular_puntuaciones, extensiones_reporte,
+                  leer_respuestas, leer_respuestas_por_bloques, puntuaciones)
+
+# Respuestas de mayor a menor frecuencia del evento (Siempre ... Nunca)
+escala = list(puntuaciones['positivas'])
+
+# Preguntas que solo se contestan si el trabajador atiende clientes o es jefe
+preguntas_clientes = (41, 42, 43)
+preguntas_jefes = (44, 45, 46)
+
+
+def generar_respuestas_sinteticas(archivo, n_trabajadores, semilla=0):
+    """
+    Escribe en `archivo` un libro con `n_trabajadores` respuestas sintéticas, con los
+    mismos encabezados y vocabulario que el formulario (incluido el error de captura
+    'Casi nuca', que se resuelve como 'Casi nunca').
+
+    Cada trabajador tiene una propensión al riesgo propia, de modo que los niveles de
+    riesgo se reparten de forma parecida a una encuesta real; las preguntas de atención
+    a clientes y de jefes quedan vacías cuando el trabajador responde "No".
+    """
+    rng = np.random.default_rng(semilla)
+
+    # Probabilidad de cada respuesta de la escala según la propensión del trabajador
+    propension = rng.beta(2, 3, size=n_trabajadores)
+    centros = np.arange(len(escala))
+    pesos = np.exp(-((centros[None, :] - (1 - propension[:, None]) * 4) ** 2) / 2)
+    pesos /= pesos.sum(axis=1, keepdims=True)
+    acumulado = pesos.cumsum(axis=1)
+
+    # Índice de respuesta por pregunta: en las preguntas positivas la escala se invierte
+    sorteo = rng.random((n_trabajadores, 46))
+    indices = (sorteo[:, :, None] > acumulado[:, None, :]).sum(axis=2).clip(0, 4)
+    positivas = np.array([not (1 <= i <= 17 or 34 <= i <= 46) for i in range(1, 47)])
+    indices[:, positivas] = 4 - indices[:, positivas]
+    respuestas = np.array(escala, dtype=object)[indices]
+
+    # Errores de captura: 'Casi nuca' en lugar de 'Casi nunca' y algunas respuestas vacías
+    respuestas[(respuestas == 'Casi nunca') & (rng.random(respuestas.shape) < 0.02)] = 'Casi nuca'
+    respuestas[rng.random(respuestas.shape) < 0.002] = None
+
+    atiende_clientes = rng.random(n_trabajadores) < 0.6
+    es_jefe = rng.random(n_trabajadores) < 0.2
+    for p in preguntas_clientes:
+        respuestas[~atiende_clientes, p - 1] = None
+    for p in preguntas_jefes:
+        respuestas[~es_jefe, p - 1] = None
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Respuestas de formulario 1')
+    encabezados = ['Marca temporal', 'Puntuación', 'Nombre Completo del trabajador']
+    for i in range(1, 47):
+        if i == 41:
+            encabezados.append('En mi trabajo debo brindar servicio a cliente o usuarios.')
+        if i == 44:
+            encabezados.append('Soy jefe de otros trabajadores.')
+        encabezados.append(f'{i}. Pregunta {i} del cuestionario.')
+    ws.append(encabezados)
+
+    inicio = datetime(2025, 1, 6, 8, 0, 0)
+    for k in range(n_trabajadores):
+        fila = [inicio + timedelta(minutes=7 * k), 0.0, f'Trabajador Sintético {k + 1:06d}']
+        for i in range(1, 47):
+            if i == 41:
+                fila.append('Si' if atiende_clientes[k] else 'No')
+            if i == 44:
+                fila.append('Si' if es_jefe[k] else 'No')
+            fila.append(respuestas[k, i - 1])
+        ws.append(fila)
+    wb.save(archivo)
+
+
+def medir(funcion, *args, **kwargs):
+    """
+    Ejecuta la función y devuelve su resultado y el tiempo transcurrido en segundos.
+    """
+    inicio = time.perf_counter()
+    resultado = funcion(*args, **kwargs)
+    return resultado, time.perf_counter() - inicio
+
+
+def medir_tamano(n_trabajadores, carpeta, muestra_reportes=200, tamano_bloque=5000):
+    """
+    Mide cada etapa del proceso para un libro sintético de `n_trabajadores`.
+
+    La escritura de reportes individuales se mide sobre una muestra de
+    `muestra_reportes` trabajadores por backend y se extrapola al total.
+    """
+    archivo = os.path.join(carpeta, f'respuestas_{n_trabajadores}.xlsx')
+    _, t_generacion = medir(generar_respuestas_sinteticas, archivo, n_trabajadores)
+
+    df, t_lectura = medir(leer_respuestas, archivo)
+    bloques, t_lectura_bloques = medir(
+        lambda: sum(len(b) for b in leer_respuestas_por_bloques(archivo, tamano_bloque)))
+    assert bloques == len(df)
+
+    (resultados, detalles), t_puntuacion = medir(calcular_puntuaciones, df)
+    _, t_general = medir(resultados.to_excel,
+                         os.path.join(carpeta, 'resultados_evaluacion_psicosocial.xlsx'),
+                         index=False)
+
+    muestra = min(muestra_reportes, len(resultados))
+    filas = list(zip(resultados.head(muestra).to_dict('records'),
+                     detalles.head(muestra).to_dict('records')))
+    fecha = datetime.now().replace(microsecond=0)
+    reportes = {}
+    for nombre, escribir in sorted(backends_reporte.items()):
+        destino = os.path.join(carpeta, 'reporte' + extensiones_reporte.get(nombre, '.xlsx'))
+        _, t = medir(lambda: [escribir(row, det, "Área por definir", destino, fecha)
+                              for row, det in filas])
+        por_reporte = t / muestra if muestra else 0.0
+        reportes[nombre] = {
+            'muestra': muestra,
+            'segundos_por_reporte': round(por_reporte, 6),
+            'segundos_total_estimado': round(por_reporte * len(resultados), 3),
+        }
+
+    tamano_mb = os.path.getsize(archivo) / 2 ** 20
+    os.remove(archivo)
+    return {
+        'trabajadores': n_trabajadores,
+        'tamano_archivo_mb': round(tamano_mb, 2),
+        'generacion_s': round(t_generacion, 3),
+        'lectura_s': round(t_lectura, 3),
+        'lectura_por_bloques_s': round(t_lectura_bloques, 3),
+        'puntuacion_s': round(t_puntuacion, 3),
+        'archivo_general_s': round(t_general, 3),
+        'reportes_individuales': reportes,
+    }
+
+
+def medir_arranque(repeticiones=5):
+    """
+    Mide, en procesos nuevos, cuánto tarda en cargarse main.py (lo que espera la ventana
+    antes de aparecer) y cuánto más en quedar listos pandas y openpyxl. Devuelve la
+    mediana de `repeticiones` arranques.
+    """
+    codigo = ("import main, json; main.precargar_bibliotecas(); "
+              "print(json.dumps(main.tiempos_arranque))")
+    carpeta = os.path.dirname(os.path.abspath(__file__))
+    muestras = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        salida = subprocess.run([sys.executable, '-c', codigo], cwd=carpeta, check=True,
+                                capture_output=True, text=True).stdout
+        total = time.perf_counter() - inicio
+        muestras.append({**json.loads(salida.strip().splitlines()[-1]), 'proceso': total})
+    return {clave: round(float(np.median([m[clave] for m in muestras])), 3)
+            for clave in muestras[0]}
+
+
+def comparar(actual, anterior):
+    """
+    Imprime, por tamaño y etapa, la relación entre el tiempo actual y el de una medición anterior.
+    """
+    for etapa, segundos in actual.get('arranque', {}).items():
+        previo = anterior.get('arranque', {}).get(etapa)
+        if previo:
+            print(f"{'arranque':>7} {etapa:<24} {previo:>9.3f}s -> {segundos:>9.3f}s  "
+                  f"x{segundos / previo:.2f}")
+    previos = {r['trabajadores']: r for r in anterior['resultados']}
+    etapas = ['lectura_s', 'lectura_por_bloques_s', 'puntuacion_s', 'archivo_general_s']
+    for r in actual['resultados']:
+        previo = previos.get(r['trabajadores'])
+        if previo is None:
+            continue
+        for etapa in etapas:
+            if previo.get(etapa):
+                print(f"{r['trabajadores']:>7} {etapa:<24} {previo[etapa]:>9.3f}s -> "
+                      f"{r[etapa]:>9.3f}s  x{r[etapa] / previo[etapa]:.2f}")
+        for backend, datos in r['reportes_individuales'].items():
+            dato_previo = previo['reportes_individuales'].get(backend)
+            if dato_previo and dato_previo['segundos_por_reporte']:
+                print(f"{r['trabajadores']:>7} reporte {backend:<16} "
+                      f"{dato_previo['segundos_por_reporte']:>9.4f}s -> "
+                      f"{datos['segundos_por_reporte']:>9.4f}s  "
+                      f"x{datos['segundos_por_reporte'] / dato_previo['segundos_por_reporte']:.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tamanos', type=int, nargs='+', default=[100, 1000, 10000, 100000],
+                        help='número de trabajadores de cada libro sintético')
+    parser.add_argument('--muestra-reportes', type=int, default=200,
+                        help='reportes individuales escritos por tamaño y backend')
+    parser.add_argument('--tamano-bloque', type=int, default=5000,
+                        help='filas por bloque en la lectura por bloques')
+    parser.add_argument('--salida', help='archivo JSON donde guardar los resultados')
+    parser.add_argument('--comparar', help='archivo JSON de una medición anterior')
+    args = parser.parse_args(argv)
+
+    medicion = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'openpyxl': openpyxl.__version__,
+        'numpy': np.__version__,
+        'procesador': platform.processor() or platform.machine(),
+        'arranque': medir_arranque(),
+        'resultados': [],
+    }
+    print(json.dumps({'arranque': medicion['arranque']}), flush=True)
+    with tempfile.TemporaryDirectory() as carpeta:
+        for n in args.tamanos:
+            resultado = medir_tamano(n, carpeta, args.muestra_reportes, args.tamano_bloque)
+            medicion['resultados'].append(resultado)
+            print(json.dumps(resultado, ensure_ascii=False), flush=True)
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(medicion, f, ensure_ascii=False, indent=2)
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            comparar(medicion, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+"""
+Escritor mínimo de documentos PDF en Python puro, para los reportes individuales en PDF.
+
+Solo cubre lo que necesitan los reportes: páginas de tamaño fijo, texto en Helvetica
+(normal y negrita, con codificación WinAnsi, que incluye acentos y ñ), rectángulos con
+relleno y borde, y ajuste de texto a un ancho dado. Las fuentes son de las 14 estándar
+de PDF, así que no se incrustan y el archivo queda pequeño.
+
+Las coordenadas se miden en puntos (1/72 de pulgada) desde la esquina superior izquierda
+de la página; `y` es la línea base del texto o el borde superior del rectángulo.
+"""
+import unicodedata
+import zlib
+
+# Tamaño de una hoja A4 horizontal, en puntos
+a4_horizontal = (842, 595)
+
+# Ancho de los caracteres ASCII imprimibles (32 a 126) en milésimas del tamaño de letra,
+# según las métricas de Adobe de Helvetica y Helvetica-Bold
+anchos_helvetica = [
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+]
+anchos_helvetica_negrita = [
+    278, 333, 474, 556, 556, 889, 722, 238, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 333, 333, 584, 584, 584, 611,
+    975, 722, 722, 722, 722, 667, 611, 778, 722, 278, 556, 722, 611, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 333, 278, 333, 584, 556,
+    333, 556, 611, 556, 611, 556, 333, 611, 611, 278, 278, 556, 278, 889, 611, 611,
+    611, 611, 389, 556, 333, 611, 556, 778, 556, 556, 500, 389, 280, 389, 584,
+]
+# Otros caracteres frecuentes en español (las letras acentuadas miden lo mismo que su
+# letra base); cualquier otro se mide como una cifra
+anchos_otros = {'¿': (611, 611), '¡': (333, 333), 'º': (365, 365), 'ª': (370, 370),
+                '°': (400, 400), '«': (556, 556), '»': (556, 556), '–': (556, 556),
+                '—': (1000, 1000), '“': (333, 500), '”': (333, 500), '’': (222, 278),
+                '•': (350, 350), '€': (556, 556)}
+
+
+def _ancho_caracter(caracter, negrita):
+    codigo = ord(caracter)
+    if 32 <= codigo <= 126:
+        return (anchos_helvetica_negrita if negrita else anchos_helvetica)[codigo - 32]
+    if caracter in anchos_otros:
+        return anchos_otros[caracter][negrita]
+    base = unicodedata.normalize('NFD', caracter)[0]
+    if base != caracter:
+        return _ancho_caracter(base, negrita)
+    return 556
+
+
+def ancho_texto(texto, tamano, negrita=False):
+    """
+    Ancho en puntos de `texto` en Helvetica de `tamano` puntos.
+    """
+    return sum(_ancho_caracter(c, negrita) for c in texto) * tamano / 1000
+
+
+def dividir_lineas(texto, ancho, tamano, negrita=False):
+    """
+    Divide `texto` en líneas que caben en `ancho` puntos, cortando entre palabras (y
+    dentro de una palabra solo si no cabe sola). Los saltos de línea se respetan.
+    """
+    lineas = []
+    for parrafo in str(texto).split("\n"):
+        actual = ""
+        for palabra in parrafo.split():
+            propuesta = f"{actual} {palabra}" if actual else palabra
+            if ancho_texto(propuesta, tamano, negrita) <= ancho:
+                actual = propuesta
+                continue
+            if actual:
+                lineas.append(actual)
+            # Una palabra más larga que el ancho se corta donde haga falta
+            while ancho_texto(palabra, tamano, negrita) > ancho and len(palabra) > 1:
+                corte = len(palabra) - 1
+                while corte > 1 and ancho_texto(palabra[:corte], tamano, negrita) > ancho:
+                    corte -= 1
+                lineas.append(palabra[:corte])
+                palabra = palabra[corte:]
+            actual = palabra
+        lineas.append(actual)
+    return lineas
+
+
+def color_rgb(color):
+    """
+    Convierte un color "RRGGBB" en la tupla (r, g, b) de 0 a 1 que usa PDF.
+    """
+    return tuple(int(color[i:i + 2], 16) / 255 for i in (0, 2, 4))
+
+
+def _numero(valor):
+    texto = f"{valor:.2f}".rstrip('0').rstrip('.')
+    return texto if texto != "-0" else "0"
+
+
+def _cadena(texto):
+    """
+    Texto como cadena literal de PDF en codificación WinAnsi (cp1252).
+    """
+    datos = str(texto).encode('cp1252', errors='replace')
+    return b"(" + datos.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+class DocumentoPDF:
+    """
+    Documento PDF que se construye página por página y se convierte en bytes con
+    `guardar`. El mismo contenido y la misma fecha producen exactamente los mismos bytes.
+    """
+
+    def __init__(self, tamano_pagina=a4_horizontal, titulo=None):
+        self.ancho, self.alto = tamano_pagina
+        self.titulo = titulo
+        self.paginas = []
+
+    def nueva_pagina(self):
+        """
+        Agrega una página en blanco; lo que se dibuje después va en ella.
+        """
+        self.paginas.append([])
+
+    def _agregar(self, comando):
+        if not self.paginas:
+            self.nueva_pagina()
+        self.paginas[-1].append(comando)
+
+    def texto(self, x, y, texto, tamano=10, negrita=False, color="000000"):
+        """
+        Escribe una línea de texto con su línea base en (x, y).
+        """
+        self._agregar(b"BT /%s %s Tf %s %s %s rg %s %s Td %s Tj ET" % (
+            b"F2" if negrita else b"F1", _numero(tamano).encode(),
+            *(_numero(c).encode() for c in color_rgb(color)),
+            _numero(x).encode(), _numero(self.alto - y).encode(), _cadena(texto)))
+
+    def rectangulo(self, x, y, ancho, alto, relleno=None, borde="000000", grosor=0.5):
+        """
+        Dibuja un rectángulo con esquina superior izquierda en (x, y); `relleno` y
+        `borde` son colores "RRGGBB" o None para omitirlos.
+        """
+        if relleno is None and borde is None:
+            return
+        partes = []
+        if relleno is not None:
+            partes.append(b"%s %s %s rg" % tuple(_numero(c).encode() for c in color_rgb(relleno)))
+        if borde is not None:
+            partes.append(b"%s %s %s RG %s w" % (
+                *(_numero(c).encode() for c in color_rgb(borde)), _numero(grosor).encode()))
+        partes.append(b"%s %s %s %s re" % tuple(
+            _numero(v).encode() for v in (x, self.alto - y - alto, ancho, alto)))
+        partes.append(b"B" if relleno is not None and borde is not None
+                      else b"f" if relleno is not None else b"S")
+        self._agregar(b" ".join(partes))
+
+    def guardar(self, fecha=None):
+        """
+        Devuelve el documento como bytes. `fecha` (un datetime) se guarda como fecha de
+        creación.
+        """
+        if not self.paginas:
+            self.nueva_pagina()
+        objetos = [
+            b"<< /Type /Catalog /Pages 2 0 R >>",
+            None,  # Páginas: se llena cuando se conocen los números de objeto
+            b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+            b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold "
+            b"/Encoding /WinAnsiEncoding >>",
+        ]
+        info = [b"/Producer (Evaluador de Riesgos Psicosociales)"]
+        if self.titulo:
+            info.append(b"/Title " + _cadena(self.titulo))
+        if fecha is not None:
+            info.append(b"/CreationDate (D:%s)" % fecha.strftime("%Y%m%d%H%M%S").encode())
+        objetos.append(b"<< " + b" ".join(info) + b" >>")
+
+        hijos = []
+        for comandos in self.paginas:
+            contenido = zlib.compress(b"\n".join(comandos), 6)
+            objetos.append(b"<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream"
+                           % (len(contenido), contenido))
+            objetos.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %s %s] "
+                           b"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> "
+                           b"/Contents %d 0 R >>"
+                           % (_numero(self.ancho).encode(), _numero(self.alto).encode(),
+                              len(objetos)))
+            hijos.append(len(objetos))
+        objetos[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+            b" ".join(b"%d 0 R" % n for n in hijos), len(hijos))
+
+        salida = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        posiciones = []
+        for numero, objeto in enumerate(objetos, start=1):
+            posiciones.append(len(salida))
+            salida += b"%d 0 obj\n%s\nendobj\n" % (numero, objeto)
+        inicio_xref = len(salida)
+        salida += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1)
+        salida += b"".join(b"%010d 00000 n \n" % posicion for posicion in posiciones)
+        salida += b"trailer\n<< /Size %d /Root 1 0 R /Info 5 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+            len(objetos) + 1, inicio_xref)
+        return bytes(salida)
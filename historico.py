@@ -0,0 +1,209 @@
+"""
+Histórico de evaluaciones en formato columnar (Parquet), para consultar resultados de
+varias ejecuciones sin volver a leer los archivos de Excel.
+
+Cada ejecución se guarda en dos conjuntos de datos particionados por empresa y fecha de
+evaluación:
+
+    historico/resultados/empresa=<empresa>/fecha=<AAAA-MM-DD>/parte-00000.parquet
+    historico/detalles/empresa=<empresa>/fecha=<AAAA-MM-DD>/parte-00000.parquet
+
+Las respuestas, el nivel de riesgo y las columnas de texto se guardan con codificación
+de diccionario (categorías), de modo que cada respuesta ocupa un índice pequeño. Las
+consultas solo leen las columnas y particiones necesarias.
+
+Requiere pyarrow (`pip install pyarrow`), que solo se importa al usar el histórico.
+"""
+import os
+import shutil
+from urllib.parse import quote
+
+import pandas as pd
+
+# Niveles de riesgo que se cuentan como "alto o superior" en las comparaciones por grupo
+niveles_altos = ('Alto', 'Muy alto')
+
+
+def _pyarrow():
+    """
+    Importa pyarrow solo cuando se usa el histórico.
+    """
+    try:
+        import pyarrow
+        import pyarrow.dataset
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError(
+            "El histórico en Parquet requiere pyarrow: pip install pyarrow") from e
+    return pyarrow
+
+
+def _particionado(pa):
+    """
+    Esquema de las particiones (empresa y fecha como texto, estilo Hive).
+    """
+    return pa.dataset.partitioning(
+        pa.schema([('empresa', pa.string()), ('fecha', pa.string())]), flavor='hive')
+
+
+def ruta_particion(carpeta_historico, tabla, empresa, fecha):
+    """
+    Carpeta de la partición de una empresa y fecha de evaluación dentro de `tabla`
+    ('resultados' o 'detalles').
+    """
+    return os.path.join(carpeta_historico, tabla, f"empresa={quote(str(empresa), safe='')}",
+                        f"fecha={fecha:%Y-%m-%d}")
+
+
+def _tabla_compacta(pa, df):
+    """
+    Convierte un DataFrame en tabla de Arrow con las columnas de texto como diccionario
+    (índices de 32 bits en todas las partes, para que el esquema sea el mismo).
+    """
+    columnas = {}
+    for columna in df.columns:
+        valores = df[columna]
+        if valores.dtype == object or isinstance(valores.dtype, pd.CategoricalDtype):
+            columnas[columna] = pa.array(valores.astype(str).where(valores.notna(), None),
+                                         type=pa.string()).dictionary_encode().cast(
+                pa.dictionary(pa.int32(), pa.string()))
+        else:
+            columnas[columna] = pa.array(valores.to_numpy())
+    return pa.table(columnas)
+
+
+class EscritorHistorico:
+    """
+    Guarda en el histórico los resultados de una ejecución, bloque por bloque.
+
+    Las partes se escriben en carpetas ocultas y solo al llamar `cerrar` reemplazan a
+    las de una ejecución anterior de la misma empresa y fecha; `descartar` las borra
+    (por ejemplo, si se cancela el proceso).
+    """
+
+    def __init__(self, carpeta_historico, empresa, fecha):
+        self.pa = _pyarrow()
+        self.particiones = {}
+        for tabla in ('resultados', 'detalles'):
+            destino = ruta_particion(carpeta_historico, tabla, empresa, fecha)
+            # Las carpetas que empiezan con "." no se leen en las consultas
+            temporal = os.path.join(os.path.dirname(destino),
+                                    "." + os.path.basename(destino) + ".tmp")
+            shutil.rmtree(temporal, ignore_errors=True)
+            os.makedirs(temporal)
+            self.particiones[tabla] = (temporal, destino)
+        self.partes = 0
+
+    def agregar(self, resultados, detalles_preguntas):
+        """
+        Escribe un bloque de resultados y sus respuestas por pregunta.
+        """
+        for tabla, df in (('resultados', resultados), ('detalles', detalles_preguntas)):
+            temporal, _ = self.particiones[tabla]
+            self.pa.parquet.write_table(
+                _tabla_compacta(self.pa, df),
+                os.path.join(temporal, f"parte-{self.partes:05d}.parquet"))
+        self.partes += 1
+
+    def cerrar(self):
+        """
+        Publica las partes escritas en lugar de las de una ejecución anterior.
+        """
+        for temporal, destino in self.particiones.values():
+            shutil.rmtree(destino, ignore_errors=True)
+            os.replace(temporal, destino)
+
+    def descartar(self):
+        """
+        Borra las partes escritas sin tocar el histórico existente.
+        """
+        for temporal, _ in self.particiones.values():
+            shutil.rmtree(temporal, ignore_errors=True)
+
+
+def leer_historico(carpeta_historico, tabla='resultados', columnas=None, empresa=None,
+                   desde=None, hasta=None):
+    """
+    Lee del histórico solo las `columnas` indicadas (todas si es None) de las
+    particiones de `empresa` entre las fechas `desde` y `hasta` (inclusive, 'AAAA-MM-DD').
+    El resultado incluye siempre las columnas 'empresa' y 'fecha'.
+    """
+    pa = _pyarrow()
+    ds = pa.dataset
+    ruta = os.path.join(carpeta_historico, tabla)
+    if not os.path.isdir(ruta):
+        return pd.DataFrame(columns=[*(columnas or []), 'empresa', 'fecha'])
+    datos = ds.dataset(ruta, format='parquet', partitioning=_particionado(pa))
+
+    filtro = None
+    condiciones = []
+    if empresa is not None:
+        condiciones.append(ds.field('empresa') == str(empresa))
+    if desde is not None:
+        condiciones.append(ds.field('fecha') >= str(desde))
+    if hasta is not None:
+        condiciones.append(ds.field('fecha') <= str(hasta))
+    for condicion in condiciones:
+        filtro = condicion if filtro is None else filtro & condicion
+
+    if columnas is not None:
+        columnas = list(dict.fromkeys([*columnas, 'empresa', 'fecha']))
+    return datos.to_table(columns=columnas, filter=filtro).to_pandas()
+
+
+def comparar_anios(carpeta_historico, empresa, por='Nombre',
+                   columnas=('Puntuación Total',), desde=None, hasta=None):
+    """
+    Compara año contra año los resultados de una empresa por trabajador (`por='Nombre'`)
+    o por una columna de grupo (por ejemplo, `por='Área'`).
+
+    De cada año se toma la última evaluación. Por trabajador se devuelven las
+    `columnas` y el nivel de riesgo de cada año; por grupo, el número de trabajadores,
+    el promedio de las `columnas` y el porcentaje con nivel alto o superior. En ambos
+    casos se agrega el cambio respecto al año anterior de cada columna numérica.
+
+    Los trabajadores con el mismo nombre en un año se numeran en el orden en que
+    aparecen, con la misma clave que en el manifiesto del modo incremental ("Ana Pérez",
+    "Ana Pérez (2)", ...), y se marcan en la columna 'Nombre repetido': entre un año y
+    otro solo se emparejan por ese orden, así que conviene revisarlos.
+
+    El resultado tiene una fila por trabajador o grupo y columnas (medida, año).
+    """
+    columnas = list(columnas)
+    df = leer_historico(carpeta_historico, 'resultados',
+                        columnas=[por, 'Nivel de Riesgo', *columnas],
+                        empresa=empresa, desde=desde, hasta=hasta)
+    if df.empty:
+        return pd.DataFrame()
+    df[por] = df[por].astype(str)
+    df['Nivel de Riesgo'] = df['Nivel de Riesgo'].astype(str)
+    df['Año'] = df['fecha'].str[:4]
+
+    # Última evaluación de cada año
+    ultima = df.groupby('Año')['fecha'].transform('max')
+    df = df[df['fecha'] == ultima]
+
+    repetidos = None
+    if por == 'Nombre':
+        orden = df.groupby(['Año', 'Nombre']).cumcount() + 1
+        repetidos = df['Nombre'].isin(df.loc[orden > 1, 'Nombre'])
+        df = df.assign(Nombre=df['Nombre'].where(
+            orden == 1, df['Nombre'] + ' (' + orden.astype(str) + ')'))
+        repetidos = repetidos.groupby(df['Nombre']).any()
+        tabla = df.pivot(index='Nombre', columns='Año', values=[*columnas, 'Nivel de Riesgo'])
+        medidas = columnas
+    else:
+        df = df.assign(**{'% Alto o superior': 100.0 * df['Nivel de Riesgo'].isin(niveles_altos),
+                          'Trabajadores': 1})
+        agregados = {'Trabajadores': 'sum', '% Alto o superior': 'mean',
+                     **{columna: 'mean' for columna in columnas}}
+        tabla = df.groupby([por, 'Año']).agg(agregados).round(2).unstack('Año')
+        medidas = ['Trabajadores', *columnas, '% Alto o superior']
+
+    for medida in medidas:
+        cambio = tabla[medida].astype(float).diff(axis=1).iloc[:, 1:]
+        for anio in cambio.columns:
+            tabla[(f"Cambio {medida}", anio)] = cambio[anio].round(2)
+    if repetidos is not None:
+        tabla[('Nombre repetido', '')] = repetidos.reindex(tabla.index)
+    return tabla
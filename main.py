@@ -1,14 +1,73 @@
-from tkinter import Tk, Label, Button, filedialog, messagebox, StringVar, Frame, Text, Scrollbar, RIGHT, Y, END
-from openpyxl import Workbook
-import pandas as pd
-from openpyxl import load_workbook, Workbook
-from openpyxl.styles import PatternFill, Border, Side, Alignment, Font
-from openpyxl.utils import get_column_letter
+import time
+
+# Momento en que empezó a cargarse el programa, para medir el tiempo de arranque
+inicio_arranque = time.perf_counter()
+
 import os
+import re
+import sys
+import glob
+import argparse
+import importlib
+import json
+import html
+import hashlib
+import traceback
+import unicodedata
+import multiprocessing
+import queue
+import threading
+from difflib import SequenceMatcher
 from datetime import datetime
-import tkinter as tk
-from tkinter import filedialog
-from tkinter import Tk, Label, Button, filedialog, messagebox, StringVar, Frame
+from functools import lru_cache
+from contextlib import contextmanager
+from bisect import bisect_right
+from copy import copy
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from zipfile import ZipFile, ZipInfo, ZIP_DEFLATED, ZIP_STORED
+from io import BytesIO
+import numpy as np
+
+
+class ModuloDiferido:
+    """
+    Módulo que se importa la primera vez que se usa uno de sus atributos.
+
+    pandas tarda en importarse (sobre todo desde el ejecutable de un solo archivo), así
+    que se carga al leer el primer archivo o en segundo plano cuando la ventana ya está
+    abierta (ver `precargar_bibliotecas`). openpyxl se importa dentro de las funciones
+    que lo usan por la misma razón. numpy sí se importa al cargar el módulo: las matrices
+    de puntuación de `cuestionario_guia_ii` se preparan en ese momento.
+    """
+
+    def __init__(self, nombre):
+        self._nombre = nombre
+        self._modulo = None
+
+    def __getattr__(self, atributo):
+        modulo = self._modulo
+        if modulo is None:
+            modulo = self._modulo = importlib.import_module(self._nombre)
+        return getattr(modulo, atributo)
+
+
+pd = ModuloDiferido('pandas')
+
+# Tiempos de arranque en segundos desde `inicio_arranque`: 'modulo' (definiciones de
+# main.py cargadas), 'ventana' (interfaz visible) y 'bibliotecas' (pandas y openpyxl
+# listos). Se agregan al reporte de ejecución.
+tiempos_arranque = {}
+
+
+def precargar_bibliotecas():
+    """
+    Importa pandas y openpyxl (por ejemplo, en un hilo mientras la ventana ya se muestra)
+    para que el primer archivo no tenga que esperarlos.
+    """
+    for modulo in ('pandas', 'openpyxl', 'openpyxl.styles', 'openpyxl.writer.excel'):
+        importlib.import_module(modulo)
+    tiempos_arranque.setdefault('bibliotecas', round(time.perf_counter() - inicio_arranque, 3))
+
 
 # Diccionario de mapeo de respuestas a puntuaciones según tipo de pregunta
 puntuaciones = {
@@ -17,8 +76,7 @@ puntuaciones = {
         'Casi siempre': 3,
         'Algunas veces': 2,
         'Casi nunca': 1,
-        'Nunca': 0,
-        'Casi nuca': 1  # Posible error de dedo, pero se mantiene por si aparece en los datos
+        'Nunca': 0
     },
     'positivas': {
         'Siempre': 0,
@@ -29,6 +87,12 @@ puntuaciones = {
     }
 }
 
+# Errores de captura conocidos y la respuesta que corresponde a cada uno; se resuelven
+# antes que cualquier otra corrección y puntúan según el tipo de pregunta
+alias_respuestas = {
+    'Casi nuca': 'Casi nunca',
+}
+
 # Diccionario de categorías y subcategorías según el cuestionario
 categorias = {
     'Ambiente de trabajo': [1, 2, 3],
@@ -67,62 +131,99 @@ def determinar_nivel_riesgo(puntuacion):
         return "Muy alto"
 
 
-def calcular_puntuaciones(df):
+def calcular_puntuaciones(df, cuestionario=None, registro_respuestas=None):
     """
     Calcula las puntuaciones totales y por categoría para cada trabajador.
     Devuelve dos DataFrames: uno con los resultados generales y otro con los detalles por pregunta.
+
+    Las respuestas de las 46 preguntas se convierten en una sola matriz de
+    puntuaciones (la polaridad de cada pregunta se aplica como máscara de columnas)
+    y los totales por categoría, subcategoría, dimensión ('Dimensión - ...') y dominio
+    ('Dominio - ...') se obtienen como reducciones de esa matriz. Cada categoría y
+    dominio se califica con los cortes de la NOM-035 ('Nivel de la categoría - ...' y
+    'Nivel del dominio - ...'); los reportes individuales solo muestran estos valores.
+    `cuestionario` es la guía de referencia a usar (por defecto, la Guía II).
+
+    Solo los valores distintos de la hoja se comparan con las respuestas conocidas
+    (ver `Cuestionario.resolver_respuesta`), de modo que variantes como "casi  nunca "
+    o "Algunas vez" puntúan como su respuesta; en los detalles queda la respuesta
+    corregida. Si se pasa el diccionario `registro_respuestas`, se acumulan en él las
+    correcciones ('corregidas': valor -> respuesta) y los valores sin resolver con su
+    número de apariciones ('no_resueltas': valor -> n), que puntúan 0.
     """
-    resultados = []
-    detalles_por_pregunta = []
-
-    for _, row in df.iterrows():
-        puntuacion_total = 0
-        detalles = {'Nombre': row['Nombre Completo del trabajador']}
-        detalles_preguntas = {'Nombre': row['Nombre Completo del trabajador']}
-
-        # Recorre todas las preguntas (1 a 46)
-        for i in range(1, 47):
-            col_name = f"{i}" if i < 0 else f"{i}"
-            if col_name in row.index:
-                respuesta = row[col_name]
-                # Si la respuesta está vacía o es NaN, tratar como "Nunca"
-                if pd.isna(respuesta) or respuesta == "":
-                    respuesta = "Nunca"
-                tipo = 'negativas' if (
-                    1 <= i <= 17 or 34 <= i <= 46) else 'positivas'
-                puntuacion = puntuaciones[tipo].get(respuesta, 0)
-                puntuacion_total += puntuacion
-                detalles[f"P{i}"] = puntuacion
-                # Guardar la respuesta original (ya como "Nunca" si estaba vacía)
-                detalles_preguntas[f"P{i}"] = respuesta
-
-        nivel_riesgo = determinar_nivel_riesgo(puntuacion_total)
-
-        # Calcular puntuaciones por categoría y subcategoría
-        categorias_puntuacion = {}
-        cat = 'Ambiente de trabajo'
-        preguntas = categorias[cat]
-        punt_cat = sum(detalles.get(f"P{p}", 0) for p in preguntas)
-        categorias_puntuacion[cat] = punt_cat
-
-        for cat, subcats in [k for k in categorias.items() if isinstance(k[1], dict)]:
-            punt_cat_total = 0
-            for subcat, preguntas in subcats.items():
-                punt_subcat = sum(detalles.get(f"P{p}", 0) for p in preguntas)
-                categorias_puntuacion[f"{cat} - {subcat}"] = punt_subcat
-                punt_cat_total += punt_subcat
-            categorias_puntuacion[cat] = punt_cat_total
-
-        resultados.append({
-            'Nombre': detalles['Nombre'],
-            'Puntuación Total': puntuacion_total,
-            'Nivel de Riesgo': nivel_riesgo,
-            **categorias_puntuacion
-        })
-
-        detalles_por_pregunta.append(detalles_preguntas)
-
-    return pd.DataFrame(resultados), pd.DataFrame(detalles_por_pregunta)
+    cuestionario = cuestionario or cuestionario_guia_ii
+    if len(df) == 0:
+        return pd.DataFrame(), pd.DataFrame()
+
+    nombres = df['Nombre Completo del trabajador'].tolist()
+
+    # Preguntas presentes en el archivo
+    preguntas = [i for i in cuestionario.preguntas if f"{i}" in df.columns]
+    indices = np.array(preguntas, dtype=np.intp) - 1
+
+    # Matriz de respuestas; si la respuesta está vacía o es NaN, tratar como "Nunca"
+    respuestas = df[[f"{i}" for i in preguntas]].to_numpy(dtype=object)
+    respuestas[pd.isna(respuestas) | (respuestas == "")] = "Nunca"
+
+    # Cada respuesta distinta se resuelve una vez y se puntúa según el tipo de pregunta
+    codigos, valores = pd.factorize(respuestas.ravel())
+    # (las que solo tienen espacios cuentan como vacías)
+    resueltas = ["Nunca" if isinstance(v, str) and not v.strip()
+                 else cuestionario.resolver_respuesta(v) for v in valores]
+    desconocida = cuestionario.tabla.shape[1] - 1
+    columnas_tabla = np.array(
+        [desconocida if r is None else cuestionario.vocabulario[r] for r in resueltas],
+        dtype=np.intp)
+    matriz = cuestionario.tabla[cuestionario.negativas[indices][np.newaxis, :],
+                                columnas_tabla[codigos].reshape(respuestas.shape)]
+
+    corregidas = {v: r for v, r in zip(valores, resueltas) if r is not None and r != v}
+    if corregidas:
+        respuestas = np.array([corregidas.get(v, v) for v in valores],
+                              dtype=object)[codigos].reshape(respuestas.shape)
+    if registro_respuestas is not None:
+        registro_respuestas.setdefault('corregidas', {}).update(
+            {str(v): r for v, r in corregidas.items()})
+        no_resueltas = registro_respuestas.setdefault('no_resueltas', {})
+        apariciones = np.bincount(codigos, minlength=len(valores))
+        for v, r, n in zip(valores, resueltas, apariciones):
+            if r is None:
+                no_resueltas[str(v)] = no_resueltas.get(str(v), 0) + int(n)
+
+    puntuacion_total = matriz.sum(axis=1)
+    niveles = {t: cuestionario.nivel_riesgo(t) for t in np.unique(puntuacion_total)}
+
+    # Totales por categoría, subcategoría, dimensión y dominio (en el orden de las
+    # columnas); las dimensiones y dominios sin preguntas en el archivo se omiten
+    pertenencia = cuestionario.pertenencia[indices]
+    sumas = matriz @ pertenencia
+    presentes = {nombre for nombre, presente in
+                 zip(cuestionario.columnas_puntuacion, pertenencia.any(axis=0)) if presente}
+    grupos = len(cuestionario.grupos)
+    columnas = {nombre: sumas[:, k] for k, nombre in enumerate(cuestionario.columnas_puntuacion)
+                if k < grupos or nombre in presentes}
+
+    # Nivel de cada categoría y dominio (con preguntas en el archivo) según sus cortes
+    nombres_nivel = np.array(niveles_riesgo, dtype=object)
+    for columna, cortes, columna_nivel in cuestionario.calificaciones:
+        if columna in presentes:
+            columnas[columna_nivel] = nombres_nivel[
+                np.searchsorted(cortes, columnas[columna], side='right')]
+
+    resultados = pd.DataFrame({
+        'Nombre': nombres,
+        'Puntuación Total': puntuacion_total,
+        'Nivel de Riesgo': [niveles[t] for t in puntuacion_total],
+        **columnas
+    })
+
+    # Guardar la respuesta (ya como "Nunca" si estaba vacía y corregida si estaba mal escrita)
+    detalles_por_pregunta = pd.DataFrame({
+        'Nombre': nombres,
+        **{f"P{p}": respuestas[:, j].tolist() for j, p in enumerate(preguntas)}
+    })
+
+    return resultados, detalles_por_pregunta
 
 
 def generar_recomendaciones(nivel):
@@ -139,10 +240,434 @@ def generar_recomendaciones(nivel):
     return recomendaciones.get(nivel, "Nivel de riesgo no reconocido.")
 
 
-def crear_reporte_individual(row, detalles_preguntas, area_adscrita):
+# Mapeo de preguntas a dimensiones (para mostrar resultados por dimensión)
+mapeo_dimensiones = {
+    # Ambiente de trabajo
+    "Condiciones peligrosas e inseguras": [1],
+    "Condiciones deficientes e insalubres": [2],
+    "Trabajos peligrosos": [3],
+    # Factores propios de la actividad - Carga de trabajo
+    "Cargas cuantitativas": [4, 5],
+    "Ritmos de trabajo acelerado": [6],
+    "Carga mental": [7, 8, 9],
+    "Cargas psicológicas emocionales": [41, 42, 43],
+    "Cargas de alta responsabilidad": [10, 11],
+    "Cargas contradictorias o inconsistentes": [12, 13],
+    # Factores propios de la actividad - Falta de control
+    "Falta de control y autonomía sobre el trabajo": [20, 21, 22],
+    "Limitada o nula posibilidad de desarrollo": [18, 19],
+    "Limitada o inexistente capacitación": [26, 27],
+    # Organización del tiempo de trabajo - Jornada
+    "Jornadas de trabajo extensas": [14, 15],
+    # Organización del tiempo de trabajo - Interferencia
+    "Influencia del trabajo fuera del centro laboral": [16],
+    "Influencia de las responsabilidades familiares": [17],
+    # Liderazgo y relaciones - Liderazgo
+    "Escasa claridad de funciones": [23, 24, 25],
+    "Características del liderazgo": [28, 29],
+    # Liderazgo y relaciones - Relaciones
+    "Relaciones sociales en el trabajo": [30, 31, 32, 33],
+    "Deficiente relación con los colaboradores que supervisa": [44, 45, 46],
+    # Liderazgo y relaciones - Violencia
+    "Violencia laboral": [34, 35, 36, 37, 38, 39, 40]
+}
+
+# Datos de las categorías y dimensiones (para mostrar en la tabla)
+categorias_data = [
+    # Ambiente de trabajo
+    ["Ambiente de trabajo", "Condiciones en el ambiente de trabajo",
+        "Condiciones peligrosas e inseguras"],
+    ["", "", "Condiciones deficientes e insalubres"],
+    ["", "", "Trabajos peligrosos"],
+
+    # Factores propios de la actividad - Carga de trabajo
+    ["Factores propios de la actividad",
+        "Carga de trabajo", "Cargas cuantitativas"],
+    ["", "", "Ritmos de trabajo acelerado"],
+    ["", "", "Carga mental"],
+    ["", "", "Cargas psicológicas emocionales"],
+    ["", "Cargas de alta responsabilidad", "Cargas de alta responsabilidad"],
+    ["", "Cargas contradictorias o inconsistentes",
+        "Cargas contradictorias o inconsistentes"],
+
+    # Factores propios de la actividad - Falta de control
+    ["", "Falta de control sobre el trabajo",
+        "Falta de control y autonomía sobre el trabajo"],
+    ["", "", "Limitada o nula posibilidad de desarrollo"],
+    ["", "", "Limitada o inexistente capacitación"],
+
+    # Organización del tiempo de trabajo - Jornada
+    ["Organización del tiempo de trabajo",
+        "Jornada de trabajo", "Jornadas de trabajo extensas"],
+
+    # Organización del tiempo de trabajo - Interferencia
+    ["", "Interferencia en la relación trabajo-familia",
+        "Influencia del trabajo fuera del centro laboral"],
+    ["", "", "Influencia de las responsabilidades familiares"],
+
+    # Liderazgo y relaciones - Liderazgo
+    ["Liderazgo y relaciones en el trabajo",
+        "Liderazgo", "Escasa claridad de funciones"],
+    ["", "", "Características del liderazgo"],
+
+    # Liderazgo y relaciones - Relaciones
+    ["", "Relaciones en el trabajo", "Relaciones sociales en el trabajo"],
+    ["", "", "Deficiente relación con los colaboradores que supervisa"],
+
+    # Liderazgo y relaciones - Violencia
+    ["", "Violencia", "Violencia laboral"]
+]
+
+# Dominios de la NOM-035 (Guía II) con sus dimensiones, para calificarlos
+dominios = {
+    "Condiciones en el ambiente de trabajo": [
+        "Condiciones peligrosas e inseguras", "Condiciones deficientes e insalubres",
+        "Trabajos peligrosos"],
+    "Carga de trabajo": [
+        "Cargas cuantitativas", "Ritmos de trabajo acelerado", "Carga mental",
+        "Cargas psicológicas emocionales", "Cargas de alta responsabilidad",
+        "Cargas contradictorias o inconsistentes"],
+    "Falta de control sobre el trabajo": [
+        "Falta de control y autonomía sobre el trabajo",
+        "Limitada o nula posibilidad de desarrollo", "Limitada o inexistente capacitación"],
+    "Jornada de trabajo": ["Jornadas de trabajo extensas"],
+    "Interferencia en la relación trabajo-familia": [
+        "Influencia del trabajo fuera del centro laboral",
+        "Influencia de las responsabilidades familiares"],
+    "Liderazgo": ["Escasa claridad de funciones", "Características del liderazgo"],
+    "Relaciones en el trabajo": [
+        "Relaciones sociales en el trabajo",
+        "Deficiente relación con los colaboradores que supervisa"],
+    "Violencia": ["Violencia laboral"],
+}
+
+# Puntuación a partir de la cual empieza cada nivel (Bajo, Medio, Alto y Muy alto) en
+# cada dominio y categoría, según la NOM-035
+cortes_dominio = {
+    "Condiciones en el ambiente de trabajo": [3, 5, 7, 9],
+    "Carga de trabajo": [12, 16, 20, 24],
+    "Falta de control sobre el trabajo": [5, 8, 11, 14],
+    "Jornada de trabajo": [1, 2, 4, 6],
+    "Interferencia en la relación trabajo-familia": [1, 2, 4, 6],
+    "Liderazgo": [3, 5, 8, 11],
+    "Relaciones en el trabajo": [5, 8, 11, 14],
+    "Violencia": [7, 10, 13, 16],
+}
+cortes_categoria = {
+    "Ambiente de trabajo": [3, 5, 7, 9],
+    "Factores propios de la actividad": [10, 20, 30, 40],
+    "Organización del tiempo de trabajo": [4, 6, 9, 12],
+    "Liderazgo y relaciones en el trabajo": [10, 18, 28, 38],
+}
+
+# Color de relleno del nivel de riesgo en el reporte individual
+colores_nivel = {
+    "Nulo o despreciable": "C6EFCE",
+    "Bajo": "D9EAD3",
+    "Medio": "FFF2CC",
+    "Alto": "FCE5CD",
+    "Muy alto": "F4CCCC"
+}
+
+# Encabezados y anchos de las columnas A a G de la tabla del reporte individual
+encabezados_tabla_reporte = [
+    "Categoría", "Dominio", "Dimensión",
+    "Puntuación de dimensión",
+    "Resultado del cuestionario",
+    "Calificación de la categoría",
+    "Resultado por dominio"
+]
+anchos_columnas_reporte = [25, 25, 35, 20, 25, 25, 25]
+
+
+# Niveles de riesgo, de menor a mayor
+niveles_riesgo = ["Nulo o despreciable", "Bajo", "Medio", "Alto", "Muy alto"]
+
+# Parecido mínimo (0 a 1) para aceptar una respuesta mal escrita como la respuesta conocida
+# más parecida; por debajo, la respuesta queda sin resolver y puntúa 0
+similitud_minima_respuesta = 0.8
+
+
+def canonizar_respuesta(valor):
+    """
+    Forma canónica de una respuesta para compararla: sin acentos, en minúsculas, sin
+    signos de puntuación y con un solo espacio entre palabras ("  Casi  NUNCA." -> "casi nunca").
+    """
+    texto = unicodedata.normalize('NFKD', str(valor))
+    texto = "".join(c for c in texto if not unicodedata.combining(c)).lower()
+    return " ".join(re.sub(r"[^\w\s]", " ", texto).split())
+
+
+class Cuestionario:
+    """
+    Guía de referencia de la NOM-035 precompilada para puntuar y generar reportes.
+
+    Se construye una sola vez y reúne la polaridad de cada pregunta, la tabla de
+    puntuaciones por respuesta, el índice pregunta -> dimensión -> dominio -> categoría
+    y las filas de la tabla del reporte individual, de modo que el trabajo por
+    trabajador se reduce a búsquedas en arreglos.
+    """
+
+    def __init__(self, nombre, n_preguntas, preguntas_positivas, puntuaciones,
+                 categorias, dimensiones, filas_reporte, cortes_nivel, dominios=None,
+                 cortes_dominio=None, cortes_categoria=None, alias=None):
+        # Huella de la definición completa de la guía (ver `huella_puntuacion`)
+        definicion = {
+            'nombre': nombre, 'preguntas': n_preguntas,
+            'preguntas_positivas': sorted(preguntas_positivas), 'puntuaciones': puntuaciones,
+            'categorias': categorias, 'dimensiones': dimensiones, 'filas_reporte': filas_reporte,
+            'cortes_nivel': cortes_nivel, 'dominios': dominios, 'cortes_dominio': cortes_dominio,
+            'cortes_categoria': cortes_categoria, 'alias': alias,
+        }
+        self.huella = hashlib.blake2b(
+            json.dumps(definicion, sort_keys=True, ensure_ascii=False, default=list).encode('utf-8'),
+            digest_size=16).hexdigest()
+        self.nombre = nombre
+        self.n_preguntas = n_preguntas
+        self.preguntas = list(range(1, n_preguntas + 1))
+        self.puntuaciones = puntuaciones
+        self.categorias = categorias
+        self.dimensiones = dimensiones
+        self.filas_reporte = [tuple(fila) for fila in filas_reporte]
+        # Puntuación total a partir de la cual empieza cada nivel (después del primero)
+        self.cortes_nivel = list(cortes_nivel)
+        # Dominios con sus dimensiones y cortes de nivel de cada dominio y categoría
+        # (los que no tienen cortes se puntúan pero no se califican)
+        self.dominios = {dominio: list(dims) for dominio, dims in (dominios or {}).items()}
+        self.cortes_dominio = {d: list(c) for d, c in (cortes_dominio or {}).items()}
+        self.cortes_categoria = {c: list(v) for c, v in (cortes_categoria or {}).items()}
+
+        # Polaridad: 1 si la pregunta se puntúa con la tabla 'negativas', 0 con 'positivas'
+        positivas = set(preguntas_positivas)
+        self.tipo = {p: 'positivas' if p in positivas else 'negativas' for p in self.preguntas}
+        self.negativas = np.array([self.tipo[p] == 'negativas' for p in self.preguntas],
+                                  dtype=np.intp)
+
+        # Tabla de puntuaciones: fila 0 'positivas', fila 1 'negativas'; una columna por
+        # respuesta conocida y una última columna (con 0) para cualquier otra respuesta
+        self.vocabulario = {}
+        for tabla in puntuaciones.values():
+            for respuesta in tabla:
+                self.vocabulario.setdefault(respuesta, len(self.vocabulario))
+        self.tabla = np.zeros((2, len(self.vocabulario) + 1), dtype=np.int64)
+        for fila, tipo in enumerate(('positivas', 'negativas')):
+            for respuesta, valor in puntuaciones[tipo].items():
+                self.tabla[fila, self.vocabulario[respuesta]] = valor
+
+        # Respuestas conocidas por su forma canónica y respuestas ya resueltas (cada valor
+        # distinto de los archivos se resuelve una sola vez, ver `resolver_respuesta`)
+        self.canonicas = {}
+        for respuesta in self.vocabulario:
+            self.canonicas.setdefault(canonizar_respuesta(respuesta), respuesta)
+        # Los alias (errores de captura conocidos) se buscan igual que las respuestas
+        self.alias = dict(alias or {})
+        for variante, respuesta in self.alias.items():
+            if respuesta not in self.vocabulario:
+                raise ValueError(f"El alias {variante!r} apunta a una respuesta desconocida: "
+                                 f"{respuesta!r}")
+            self.canonicas.setdefault(canonizar_respuesta(variante), respuesta)
+        self._resueltas = {}
+
+        # Columnas de resultados por categoría y subcategoría y su matriz de pertenencia
+        self.grupos = []
+        for cat, contenido in categorias.items():
+            if isinstance(contenido, dict):
+                for subcat, preguntas_subcat in contenido.items():
+                    self.grupos.append((f"{cat} - {subcat}", list(preguntas_subcat)))
+                self.grupos.append(
+                    (cat, [p for preguntas_subcat in contenido.values() for p in preguntas_subcat]))
+            else:
+                self.grupos.append((cat, list(contenido)))
+        # Después van las columnas por dimensión y por dominio, que se calculan en la misma
+        # multiplicación de matrices
+        self.columnas_detalle = [(f"Dimensión - {dimension}", list(preguntas))
+                                 for dimension, preguntas in dimensiones.items()]
+        self.columnas_detalle += [
+            (f"Dominio - {dominio}", [p for dimension in dims for p in dimensiones.get(dimension, [])])
+            for dominio, dims in self.dominios.items()]
+        columnas = self.grupos + self.columnas_detalle
+        self.columnas_puntuacion = [nombre for nombre, _ in columnas]
+        self.pertenencia = np.zeros((n_preguntas, len(columnas)), dtype=np.int64)
+        for k, (_, preguntas_grupo) in enumerate(columnas):
+            for p in preguntas_grupo:
+                self.pertenencia[p - 1, k] += 1
+
+        # Calificaciones: (columna de puntuación, cortes, columna del nivel)
+        nombres_grupos = {nombre for nombre, _ in self.grupos}
+        self.calificaciones = [
+            (cat, np.array(cortes), f"Nivel de la categoría - {cat}")
+            for cat, cortes in self.cortes_categoria.items() if cat in nombres_grupos]
+        self.calificaciones += [
+            (f"Dominio - {dominio}", np.array(cortes), f"Nivel del dominio - {dominio}")
+            for dominio, cortes in self.cortes_dominio.items() if dominio in self.dominios]
+
+        # Índice dimensión -> dominio -> categoría (las celdas vacías de las filas del
+        # reporte continúan el dominio o la categoría de la fila anterior)
+        self.dominio = {}
+        self.categoria = {}
+        cat_actual = dominio_actual = ""
+        for cat, dominio, dimension in self.filas_reporte:
+            cat_actual = cat or cat_actual
+            dominio_actual = dominio or dominio_actual
+            self.dominio[dimension] = dominio_actual
+            self.categoria[dimension] = cat_actual
+        self.dimension_de_pregunta = {p: dimension for dimension, preguntas in dimensiones.items()
+                                      for p in preguntas}
+        dominio_calificado = {dimension: dominio for dominio, dims in self.dominios.items()
+                              for dimension in dims}
+
+        # Lo que llena cada fila de la tabla del reporte: columna de la puntuación de la
+        # dimensión, preguntas (para el texto de las respuestas) y columnas de la
+        # calificación de la categoría y del dominio, en la primera fila de cada uno
+        calificadas = {nivel: (puntuacion, nivel) for puntuacion, _, nivel in self.calificaciones}
+        self.columnas_fila = []
+        vistas = set()
+        for _, _, dimension in self.filas_reporte:
+            categoria = calificadas.get(f"Nivel de la categoría - {self.categoria[dimension]}")
+            dominio = calificadas.get(f"Nivel del dominio - {dominio_calificado.get(dimension)}")
+            if categoria in vistas:
+                categoria = None
+            if dominio in vistas:
+                dominio = None
+            vistas.update((categoria, dominio))
+            self.columnas_fila.append((f"Dimensión - {dimension}",
+                                       [f"P{p}" for p in dimensiones.get(dimension, [])],
+                                       categoria, dominio))
+
+        # Posición de la tabla del reporte individual
+        self.fila_inicio_tabla = 8
+        self.fila_fin_tabla = self.fila_inicio_tabla + len(self.filas_reporte) - 1
+
+    # Dos guías con la misma definición son iguales aunque sean objetos distintos (por
+    # ejemplo, la copia que recibe cada proceso con cada lote), así que comparten las
+    # plantillas compiladas en caché
+    def __eq__(self, otro):
+        return isinstance(otro, Cuestionario) and self.huella == otro.huella
+
+    def __hash__(self):
+        return hash(self.huella)
+
+    @classmethod
+    def desde_json(cls, archivo):
+        """
+        Carga una guía de referencia desde un archivo JSON (ver guias/guia_ii.json).
+        """
+        with open(archivo, encoding='utf-8') as f:
+            datos = json.load(f)
+        return cls(
+            nombre=datos['nombre'],
+            n_preguntas=datos['preguntas'],
+            preguntas_positivas=datos['preguntas_positivas'],
+            puntuaciones=datos['puntuaciones'],
+            categorias=datos['categorias'],
+            dimensiones=datos['dimensiones'],
+            filas_reporte=datos['filas_reporte'],
+            cortes_nivel=datos['cortes_nivel'],
+            dominios=datos.get('dominios'),
+            cortes_dominio=datos.get('cortes_dominio'),
+            cortes_categoria=datos.get('cortes_categoria'),
+            alias=datos.get('alias'),
+        )
+
+    def nivel_riesgo(self, puntuacion):
+        """
+        Nivel de riesgo de una puntuación total según los cortes de la guía.
+        """
+        return niveles_riesgo[bisect_right(self.cortes_nivel, puntuacion)]
+
+    def resolver_respuesta(self, valor):
+        """
+        Respuesta conocida que corresponde a `valor`, o None si no se reconoce.
+
+        Se busca primero el texto exacto (o un alias, como 'Casi nuca'), luego su forma
+        canónica (espacios, mayúsculas, acentos y puntuación) y por último la respuesta conocida más parecida, siempre
+        que el parecido llegue a `similitud_minima_respuesta` y no empate con otra
+        respuesta que puntúe distinto. El resultado se memoriza por valor.
+        """
+        try:
+            return self._resueltas[valor]
+        except KeyError:
+            pass
+        except TypeError:  # Valores no hashables: se comparan como texto
+            valor = str(valor)
+
+        if isinstance(valor, str) and valor in self.vocabulario:
+            resuelta = valor
+        elif isinstance(valor, str) and valor in self.alias:
+            resuelta = self.alias[valor]
+        else:
+            canonica = canonizar_respuesta(valor)
+            resuelta = self.canonicas.get(canonica)
+            if resuelta is None and canonica:
+                parecidos = sorted(
+                    ((SequenceMatcher(None, canonica, c).ratio(), c) for c in self.canonicas),
+                    reverse=True)
+                (mejor, candidata), *resto = parecidos
+                empate = [c for parecido, c in resto if mejor - parecido < 0.05]
+                if mejor >= similitud_minima_respuesta and all(
+                        (self.tabla[:, self.vocabulario[self.canonicas[c]]] ==
+                         self.tabla[:, self.vocabulario[self.canonicas[candidata]]]).all()
+                        for c in empate):
+                    resuelta = self.canonicas[candidata]
+        self._resueltas[valor] = resuelta
+        return resuelta
+
+    def filas_tabla(self, row, detalles_preguntas):
+        """
+        Puntuación de la dimensión ("" si ninguna de sus preguntas está en el archivo),
+        texto de las respuestas y calificación de la categoría y del dominio de cada fila
+        de la tabla del reporte individual. Las puntuaciones y niveles se toman de `row`
+        (una fila de los resultados de `calcular_puntuaciones`), sin volver a calcularlos.
+        """
+        filas = []
+        for columna, claves, categoria, dominio in self.columnas_fila:
+            respuestas = (detalles_preguntas.get(clave, "") for clave in claves)
+            filas.append((row.get(columna, ""), ", ".join(str(r) for r in respuestas if r),
+                          _calificacion(row, categoria), _calificacion(row, dominio)))
+        return filas
+
+
+def _calificacion(row, columnas):
+    """
+    Texto "nivel (puntuación)" de una categoría o dominio calificado en `row`;
+    "" si no corresponde a la fila o no se calculó.
+    """
+    if columnas is None or columnas[1] not in row:
+        return ""
+    puntuacion, nivel = columnas
+    return f"{row[nivel]} ({row[puntuacion]})"
+
+
+# Guía de referencia II (46 preguntas), construida una sola vez a partir de las tablas anteriores
+cuestionario_guia_ii = Cuestionario(
+    nombre="Guía de referencia II",
+    n_preguntas=46,
+    preguntas_positivas=range(18, 34),
+    puntuaciones=puntuaciones,
+    categorias=categorias,
+    dimensiones=mapeo_dimensiones,
+    filas_reporte=categorias_data,
+    cortes_nivel=[20, 45, 70, 90],
+    dominios=dominios,
+    cortes_dominio=cortes_dominio,
+    cortes_categoria=cortes_categoria,
+    alias=alias_respuestas,
+)
+
+
+def crear_reporte_individual(row, detalles_preguntas, area_adscrita, fecha=None,
+                             cuestionario=None):
     """
     Crea un archivo Excel con el reporte individual de un trabajador.
+    `fecha` fija el mes del encabezado (por defecto, la fecha actual) y `cuestionario`
+    la guía de referencia (por defecto, la Guía II).
     """
+    from openpyxl import Workbook
+    from openpyxl.styles import PatternFill, Border, Side, Alignment, Font
+    from openpyxl.utils import get_column_letter
+    cuestionario = cuestionario or cuestionario_guia_ii
+    fin = cuestionario.fila_fin_tabla
+
     # Crear un nuevo libro de Excel
     wb = Workbook()
     ws = wb.active
@@ -159,16 +684,10 @@ def crear_reporte_individual(row, detalles_preguntas, area_adscrita):
     white_font = Font(color="FFFFFF", bold=True)
 
     # Color según nivel de riesgo
-    color_nivel = {
-        "Nulo o despreciable": "C6EFCE",
-        "Bajo": "D9EAD3",
-        "Medio": "FFF2CC",
-        "Alto": "FCE5CD",
-        "Muy alto": "F4CCCC"
-    }.get(row['Nivel de Riesgo'], "FFFFFF")
+    color_nivel = colores_nivel.get(row['Nivel de Riesgo'], "FFFFFF")
 
     # Encabezado del reporte
-    mes_actual = datetime.now().strftime("%B %Y").upper()
+    mes_actual = (fecha or datetime.now()).strftime("%B %Y").upper()
     ws.merge_cells('A1:G1')
     ws['A1'] = f"RESULTADOS DE EVALUACIÓN DE RIESGOS PSICOSOCIALES ({mes_actual})"
     ws['A1'].font = Font(bold=True, size=14)
@@ -184,101 +703,18 @@ def crear_reporte_individual(row, detalles_preguntas, area_adscrita):
         start_color=color_nivel, end_color=color_nivel, fill_type="solid")
 
     # Encabezado de la tabla de resultados
-    encabezados = [
-        "Categoría", "Dominio", "Dimensión",
-        "Puntuación de dimensión",
-        "Resultado del cuestionario",
-        "Calificación de la categoría",
-        "Resultado por dominio"
-    ]
-
-    for col, encabezado in enumerate(encabezados, start=1):
+    for col, encabezado in enumerate(encabezados_tabla_reporte, start=1):
         cell = ws.cell(row=7, column=col, value=encabezado)
         cell.font = white_font
         cell.fill = header_fill
         cell.alignment = center_alignment
         cell.border = border
 
-    # Mapeo de preguntas a dimensiones (para mostrar resultados por dimensión)
-    mapeo_dimensiones = {
-        # Ambiente de trabajo
-        "Condiciones peligrosas e inseguras": [1],
-        "Condiciones deficientes e insalubres": [2],
-        "Trabajos peligrosos": [3],
-        # Factores propios de la actividad - Carga de trabajo
-        "Cargas cuantitativas": [4, 5],
-        "Ritmos de trabajo acelerado": [6],
-        "Carga mental": [7, 8, 9],
-        "Cargas psicológicas emocionales": [41, 42, 43],
-        "Cargas de alta responsabilidad": [10, 11],
-        "Cargas contradictorias o inconsistentes": [12, 13],
-        # Factores propios de la actividad - Falta de control
-        "Falta de control y autonomía sobre el trabajo": [20, 21, 22],
-        "Limitada o nula posibilidad de desarrollo": [18, 19],
-        "Limitada o inexistente capacitación": [26, 27],
-        # Organización del tiempo de trabajo - Jornada
-        "Jornadas de trabajo extensas": [14, 15],
-        # Organización del tiempo de trabajo - Interferencia
-        "Influencia del trabajo fuera del centro laboral": [16],
-        "Influencia de las responsabilidades familiares": [17],
-        # Liderazgo y relaciones - Liderazgo
-        "Escasa claridad de funciones": [23, 24, 25],
-        "Características del liderazgo": [28, 29],
-        # Liderazgo y relaciones - Relaciones
-        "Relaciones sociales en el trabajo": [30, 31, 32, 33],
-        "Deficiente relación con los colaboradores que supervisa": [44, 45, 46],
-        # Liderazgo y relaciones - Violencia
-        "Violencia laboral": [34, 35, 36, 37, 38, 39, 40]
-    }
-
-    # Datos de las categorías y dimensiones (para mostrar en la tabla)
-    categorias_data = [
-        # Ambiente de trabajo
-        ["Ambiente de trabajo", "Condiciones en el ambiente de trabajo",
-            "Condiciones peligrosas e inseguras"],
-        ["", "", "Condiciones deficientes e insalubres"],
-        ["", "", "Trabajos peligrosos"],
-
-        # Factores propios de la actividad - Carga de trabajo
-        ["Factores propios de la actividad",
-            "Carga de trabajo", "Cargas cuantitativas"],
-        ["", "", "Ritmos de trabajo acelerado"],
-        ["", "", "Carga mental"],
-        ["", "", "Cargas psicológicas emocionales"],
-        ["", "Cargas de alta responsabilidad", "Cargas de alta responsabilidad"],
-        ["", "Cargas contradictorias o inconsistentes",
-            "Cargas contradictorias o inconsistentes"],
-
-        # Factores propios de la actividad - Falta de control
-        ["", "Falta de control sobre el trabajo",
-            "Falta de control y autonomía sobre el trabajo"],
-        ["", "", "Limitada o nula posibilidad de desarrollo"],
-        ["", "", "Limitada o inexistente capacitación"],
-
-        # Organización del tiempo de trabajo - Jornada
-        ["Organización del tiempo de trabajo",
-            "Jornada de trabajo", "Jornadas de trabajo extensas"],
-
-        # Organización del tiempo de trabajo - Interferencia
-        ["", "Interferencia en la relación trabajo-familia",
-            "Influencia del trabajo fuera del centro laboral"],
-        ["", "", "Influencia de las responsabilidades familiares"],
-
-        # Liderazgo y relaciones - Liderazgo
-        ["Liderazgo y relaciones en el trabajo",
-            "Liderazgo", "Escasa claridad de funciones"],
-        ["", "", "Características del liderazgo"],
-
-        # Liderazgo y relaciones - Relaciones
-        ["", "Relaciones en el trabajo", "Relaciones sociales en el trabajo"],
-        ["", "", "Deficiente relación con los colaboradores que supervisa"],
-
-        # Liderazgo y relaciones - Violencia
-        ["", "Violencia", "Violencia laboral"]
-    ]
-
-    # Llenar datos con puntuaciones reales
-    for row_idx, (cat, dominio, dimension) in enumerate(categorias_data, start=8):
+    # Llenar datos con las puntuaciones y calificaciones ya calculadas
+    filas = zip(cuestionario.filas_reporte, cuestionario.filas_tabla(row, detalles_preguntas))
+    for row_idx, ((cat, dominio, dimension),
+                  (puntuacion, respuestas, calificacion, resultado_dominio)) in enumerate(
+            filas, start=cuestionario.fila_inicio_tabla):
         # Celda de categoría
         ws.cell(row=row_idx, column=1, value=cat).border = border
         if cat == "":  # Si está vacío, sombrear
@@ -294,59 +730,1712 @@ def crear_reporte_individual(row, detalles_preguntas, area_adscrita):
         # Celda de dimensión
         ws.cell(row=row_idx, column=3, value=dimension).border = border
 
-        # Puntuación de dimensión (calcula con el tipo de pregunta y respuesta real)
-        preguntas = mapeo_dimensiones.get(dimension, [])
-        puntuacion = 0
-        respuestas = []
-        for p in preguntas:
-            respuesta = detalles_preguntas.get(f"P{p}", "")
-            respuestas.append(respuesta)
-            tipo = 'negativas' if (1 <= p <= 17 or 34 <=
-                                   p <= 46) else 'positivas'
-            if respuesta:  # Solo suma si hay respuesta
-                puntuacion += puntuaciones[tipo].get(respuesta, 0)
-        ws.cell(row=row_idx, column=4, value=puntuacion if respuestas and any(
-            respuestas) else "").border = border
-
-        # Resultado del cuestionario (respuestas, muestra vacío si no hay)
-        ws.cell(row=row_idx, column=5, value=", ".join(
-            [r for r in respuestas if r])).border = border
-
-        # Calificación de la categoría (para filas de categoría principal)
-        if cat and not dominio and not dimension:
-            pass  # Implementar lógica para categorías principales si es necesario
-
-        # Resultado por dominio (para filas de dominio principal)
-        if dominio and not dimension:
-            pass  # Implementar lógica para dominios principales si es necesario
+        # Puntuación de dimensión y resultado del cuestionario (respuestas)
+        ws.cell(row=row_idx, column=4, value=puntuacion).border = border
+        ws.cell(row=row_idx, column=5, value=respuestas).border = border
+
+        # Calificación de la categoría y resultado por dominio (en la primera fila de cada uno)
+        ws.cell(row=row_idx, column=6, value=calificacion).border = border
+        ws.cell(row=row_idx, column=7, value=resultado_dominio).border = border
 
     # Fórmula de suma total
-    ws['D28'] = f"=SUM(D8:D27)"
-    ws['D28'].border = border
+    ws[f'D{fin + 1}'] = f"=SUM(D{cuestionario.fila_inicio_tabla}:D{fin})"
+    ws[f'D{fin + 1}'].border = border
 
     # Recomendaciones finales
-    ws.merge_cells('A30:G35')
+    ws.merge_cells(f'A{fin + 3}:G{fin + 8}')
     recomendacion = generar_recomendaciones(row['Nivel de Riesgo'])
-    ws['A30'] = f"RECOMENDACIONES:\n\n{recomendacion}"
-    ws['A30'].alignment = Alignment(wrap_text=True, vertical='top')
-    ws['A30'].font = Font(bold=True)
+    ws[f'A{fin + 3}'] = f"RECOMENDACIONES:\n\n{recomendacion}"
+    ws[f'A{fin + 3}'].alignment = Alignment(wrap_text=True, vertical='top')
+    ws[f'A{fin + 3}'].font = Font(bold=True)
 
     # Ajustar anchos de columna
-    column_widths = [25, 25, 35, 20, 25, 25, 25]
-    for i, width in enumerate(column_widths, start=1):
+    for i, width in enumerate(anchos_columnas_reporte, start=1):
         ws.column_dimensions[get_column_letter(i)].width = width
 
     return wb
 
 
+@lru_cache(maxsize=None)
+def _estilos_reporte():
+    """
+    Combinaciones de estilos del reporte individual, creadas una sola vez y
+    compartidas por todos los reportes.
+    """
+    from openpyxl.styles import PatternFill, Border, Side, Alignment, Font
+    borde = Border(left=Side(style='thin'), right=Side(style='thin'),
+                   top=Side(style='thin'), bottom=Side(style='thin'))
+    centrado = Alignment(horizontal='center', vertical='center', wrap_text=True)
+    vacio = PatternFill(start_color="D9D9D9", end_color="D9D9D9", fill_type="solid")
+    estilos = {
+        'titulo': {'font': Font(bold=True, size=14), 'alignment': centrado},
+        'encabezado': {'font': Font(color="FFFFFF", bold=True), 'border': borde, 'alignment': centrado,
+                       'fill': PatternFill(start_color="4F81BD", end_color="4F81BD", fill_type="solid")},
+        'tabla': {'border': borde},
+        'tabla_vacia': {'border': borde, 'fill': vacio},
+        'recomendaciones': {'font': Font(bold=True),
+                            'alignment': Alignment(wrap_text=True, vertical='top')},
+    }
+    for nivel, color in {**colores_nivel, None: "FFFFFF"}.items():
+        estilos[('nivel', nivel)] = {'fill': PatternFill(
+            start_color=color, end_color=color, fill_type="solid")}
+    return estilos
+
+
+def _registrar_estilos(ws):
+    """
+    Registra cada combinación de estilos una sola vez en el libro de `ws` y
+    devuelve su índice de estilo, para asignarlo a las celdas sin volver a buscarlo.
+    """
+    from openpyxl.cell import WriteOnlyCell
+    registrados = {}
+    for nombre, atributos in _estilos_reporte().items():
+        cell = WriteOnlyCell(ws)
+        for atributo, valor in atributos.items():
+            setattr(cell, atributo, valor)
+        registrados[nombre] = cell._style
+    return registrados
+
+
+def _celda(ws, valor, estilo):
+    """
+    Crea una celda de solo escritura con un estilo ya registrado.
+    """
+    from openpyxl.cell import WriteOnlyCell
+    cell = WriteOnlyCell(ws, value=valor)
+    cell._style = copy(estilo)
+    return cell
+
+
+def escribir_reporte_individual(row, detalles_preguntas, area_adscrita, archivo, fecha=None,
+                                cuestionario=None):
+    """
+    Escribe el reporte individual de un trabajador directamente en `archivo`.
+
+    Usa el modo de solo escritura de openpyxl: las filas se envían al archivo a medida
+    que se generan y cada combinación de estilos se registra una sola vez, por lo que el
+    tiempo y la memoria por reporte no crecen. El resultado es visualmente igual al de
+    `crear_reporte_individual`.
+    """
+    from openpyxl import Workbook
+    from openpyxl.utils import get_column_letter
+    fecha = fecha or datetime.now()
+    cuestionario = cuestionario or cuestionario_guia_ii
+    fin = cuestionario.fila_fin_tabla
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Reporte Individual")
+    estilos = _registrar_estilos(ws)
+
+    # Los anchos de columna y las celdas combinadas se definen antes de escribir filas
+    for i, width in enumerate(anchos_columnas_reporte, start=1):
+        ws.column_dimensions[get_column_letter(i)].width = width
+    ws.merged_cells.add('A1:G1')
+    ws.merged_cells.add(f'A{fin + 3}:G{fin + 8}')
+
+    # Encabezado del reporte (filas 1 a 6)
+    mes_actual = fecha.strftime("%B %Y").upper()
+    ws.append([_celda(ws, f"RESULTADOS DE EVALUACIÓN DE RIESGOS PSICOSOCIALES ({mes_actual})",
+                      estilos['titulo'])])
+    ws.append([])
+    ws.append(["Trabajador", row['Nombre']])
+    ws.append(["Área adscrita", area_adscrita])
+    nivel = row['Nivel de Riesgo']
+    ws.append(["Nivel de riesgo", _celda(
+        ws, nivel, estilos.get(('nivel', nivel), estilos[('nivel', None)]))])
+    ws.append([])
+
+    # Encabezado de la tabla de resultados (fila 7)
+    ws.append([_celda(ws, encabezado, estilos['encabezado'])
+               for encabezado in encabezados_tabla_reporte])
+
+    # Tabla de resultados (filas 8 a 27 en la Guía II); las celdas vacías de categoría y
+    # dominio se sombrean
+    filas = zip(cuestionario.filas_reporte, cuestionario.filas_tabla(row, detalles_preguntas))
+    for (cat, dominio, dimension), (puntuacion, respuestas, calificacion, resultado_dominio) in filas:
+        ws.append([
+            _celda(ws, cat, estilos['tabla'] if cat else estilos['tabla_vacia']),
+            _celda(ws, dominio, estilos['tabla'] if dominio else estilos['tabla_vacia']),
+            _celda(ws, dimension, estilos['tabla']),
+            _celda(ws, puntuacion, estilos['tabla']),
+            _celda(ws, respuestas, estilos['tabla']),
+            _celda(ws, calificacion, estilos['tabla']),
+            _celda(ws, resultado_dominio, estilos['tabla']),
+        ])
+
+    # Fórmula de suma total
+    ws.append([None, None, None, _celda(
+        ws, f"=SUM(D{cuestionario.fila_inicio_tabla}:D{fin})", estilos['tabla'])])
+    ws.append([])
+
+    # Recomendaciones finales
+    recomendacion = generar_recomendaciones(nivel)
+    ws.append([_celda(ws, f"RECOMENDACIONES:\n\n{recomendacion}",
+                      estilos['recomendaciones'])])
+
+    guardar_reporte(wb, archivo, fecha)
+
+
+def _escribir_reporte_openpyxl(row, detalles_preguntas, area_adscrita, archivo, fecha=None,
+                               cuestionario=None):
+    """
+    Genera el reporte con `crear_reporte_individual` y lo guarda en `archivo`.
+    """
+    fecha = fecha or datetime.now()
+    wb = crear_reporte_individual(
+        row, detalles_preguntas, area_adscrita=area_adscrita, fecha=fecha,
+        cuestionario=cuestionario)
+    guardar_reporte(wb, archivo, fecha)
+
+
+# Plantilla del reporte individual: libro de Excel con el formato del reporte, en el que
+# los datos de cada trabajador se indican con campos {{campo}}
+ruta_plantilla_reporte = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'plantilla_reporte.xlsx')
+campo_plantilla = re.compile(r"\{\{\s*([\w.]+)\s*\}\}")
+
+# Campos que dependen solo de la guía; se resuelven una vez al compilar la plantilla
+campos_fijos_plantilla = ('fila_inicio_tabla', 'fila_fin_tabla',
+                          'tabla.categoria', 'tabla.dominio', 'tabla.dimension')
+# Campos que cambian con cada trabajador
+campos_trabajador_plantilla = ('mes', 'nombre', 'area', 'nivel', 'puntuacion_total',
+                               'recomendaciones', 'tabla.puntuacion', 'tabla.respuestas',
+                               'tabla.calificacion_categoria', 'tabla.resultado_dominio')
+
+
+@lru_cache(maxsize=4)
+def _leer_plantilla(ruta, modificado):
+    """
+    Lee la hoja de la plantilla: valor e índice de estilo de cada celda, estilos
+    distintos, celdas combinadas, anchos de columna y altos de fila.
+    `modificado` (la fecha del archivo) hace que se vuelva a leer si la plantilla cambia.
+    """
+    from openpyxl import load_workbook
+    from openpyxl.cell.cell import MergedCell
+    from openpyxl.utils import get_column_letter
+    wb = load_workbook(ruta)
+    ws = wb["Reporte Individual"] if "Reporte Individual" in wb.sheetnames else wb.worksheets[0]
+
+    estilos, indices, filas = [], {}, []
+    for fila in ws.iter_rows():
+        celdas = []
+        for cell in fila:
+            # Las celdas cubiertas por una combinación no se escriben
+            if isinstance(cell, MergedCell) or (cell.value is None and not cell.has_style):
+                celdas.append(None)
+                continue
+            estilo = None
+            if cell.has_style:
+                clave = tuple(cell._style)
+                if clave not in indices:
+                    indices[clave] = len(estilos)
+                    estilos.append({'font': copy(cell.font), 'fill': copy(cell.fill),
+                                    'border': copy(cell.border),
+                                    'alignment': copy(cell.alignment),
+                                    'protection': copy(cell.protection),
+                                    'number_format': cell.number_format})
+                estilo = indices[clave]
+            celdas.append((cell.value, estilo))
+        while celdas and celdas[-1] is None:
+            celdas.pop()
+        filas.append(celdas)
+
+    anchos = {}
+    for dimension in ws.column_dimensions.values():
+        if dimension.customWidth:
+            for columna in range(dimension.min, dimension.max + 1):
+                anchos[get_column_letter(columna)] = dimension.width
+    altos = {r: dimension.height for r, dimension in ws.row_dimensions.items()
+             if dimension.height is not None}
+    # Las filas vacías del final solo se conservan si tienen un alto propio
+    while filas and not filas[-1] and len(filas) not in altos:
+        filas.pop()
+    return {'titulo': ws.title, 'filas': filas, 'estilos': estilos, 'anchos': anchos,
+            'altos': altos, 'combinadas': [rango.coord for rango in ws.merged_cells.ranges]}
+
+
+def _compilar_celda(valor, estilo, fijos, fila_tabla):
+    """
+    Convierte una celda de la plantilla en (tipo, dato, estilo, fila_tabla):
+    'fijo' con el valor final, 'campo' con el campo del trabajador que ocupa toda la
+    celda o 'texto' con las partes de un texto que mezcla literales y campos.
+    El estilo es (índice, variante): la variante 'vacia' sombrea la celda y 'nivel'
+    la colorea según el nivel de riesgo del trabajador.
+    """
+    if not isinstance(valor, str) or "{{" not in valor:
+        return ('fijo', valor, (estilo, None), fila_tabla)
+
+    partes = campo_plantilla.split(valor)
+    desconocidos = [campo for campo in partes[1::2]
+                    if campo not in campos_fijos_plantilla + campos_trabajador_plantilla]
+    if desconocidos:
+        raise ValueError("Campos desconocidos en la plantilla del reporte: " +
+                         ", ".join("{{%s}}" % campo for campo in desconocidos))
+
+    if len(partes) == 3 and partes[0] == partes[2] == "":
+        campo = partes[1]
+        if campo in fijos:
+            # Categoría y dominio vacíos se sombrean, como en el formato original
+            vacia = campo in ('tabla.categoria', 'tabla.dominio') and fijos[campo] == ""
+            return ('fijo', fijos[campo], (estilo, 'vacia' if vacia else None), fila_tabla)
+        return ('campo', campo, (estilo, 'nivel' if campo == 'nivel' else None), fila_tabla)
+
+    if all(campo in fijos for campo in partes[1::2]):
+        texto = "".join(str(fijos[parte]) if i % 2 else parte for i, parte in enumerate(partes))
+        return ('fijo', texto, (estilo, None), fila_tabla)
+    # Los campos del trabajador quedan como tuplas de un elemento
+    partes = [(parte,) if i % 2 and parte not in fijos else
+              str(fijos[parte]) if i % 2 else parte for i, parte in enumerate(partes)]
+    return ('texto', partes, (estilo, None), fila_tabla)
+
+
+@lru_cache(maxsize=8)
+def _compilar_plantilla(ruta, modificado, cuestionario):
+    """
+    Prepara la plantilla para una guía de referencia: repite la fila de la tabla (la que
+    tiene campos `tabla.*`) una vez por cada fila de la guía, resuelve los campos fijos
+    y desplaza las filas, combinaciones y altos que quedan debajo de la tabla. Así, al
+    generar cada reporte solo se llenan los campos del trabajador.
+    """
+    from openpyxl.utils import get_column_letter, range_boundaries
+    plantilla = _leer_plantilla(ruta, modificado)
+    filas = plantilla['filas']
+    indice_tabla = next((i for i, fila in enumerate(filas)
+                         if any(celda is not None and isinstance(celda[0], str)
+                                and any(campo.startswith('tabla.')
+                                        for campo in campo_plantilla.findall(celda[0]))
+                                for celda in fila)), None)
+    repeticiones = len(cuestionario.filas_reporte) if indice_tabla is not None else 1
+    inicio = (indice_tabla or 0) + 1
+    fijos = {'fila_inicio_tabla': inicio, 'fila_fin_tabla': inicio + repeticiones - 1}
+
+    compiladas = []
+    for i, fila in enumerate(filas):
+        if i != indice_tabla:
+            compiladas.append([None if celda is None else _compilar_celda(*celda, fijos, None)
+                               for celda in fila])
+            continue
+        for k, dimension in enumerate(cuestionario.filas_reporte):
+            fijos_fila = {**fijos, **dict(zip(
+                ('tabla.categoria', 'tabla.dominio', 'tabla.dimension'), dimension))}
+            compiladas.append([None if celda is None else _compilar_celda(*celda, fijos_fila, k)
+                               for celda in fila])
+
+    def desplazar(fila):
+        if indice_tabla is not None and fila > indice_tabla + 1:
+            return fila + repeticiones - 1
+        return fila
+
+    combinadas = []
+    for coordenadas in plantilla['combinadas']:
+        min_col, min_fila, max_col, max_fila = range_boundaries(coordenadas)
+        combinadas.append(f"{get_column_letter(min_col)}{desplazar(min_fila)}:"
+                          f"{get_column_letter(max_col)}{desplazar(max_fila)}")
+    return {'titulo': plantilla['titulo'], 'filas': compiladas,
+            'estilos': plantilla['estilos'], 'anchos': plantilla['anchos'],
+            'altos': {desplazar(r): alto for r, alto in plantilla['altos'].items()},
+            'combinadas': combinadas}
+
+
+def escribir_reporte_plantilla(row, detalles_preguntas, area_adscrita, archivo, fecha=None,
+                               cuestionario=None):
+    """
+    Escribe el reporte individual de un trabajador a partir de `plantilla_reporte.xlsx`.
+
+    La plantilla se lee y se prepara una sola vez por proceso (y de nuevo si el archivo
+    cambia); para cada trabajador solo se llenan sus campos y se escriben las filas en
+    modo de solo escritura. Así el formato se puede modificar en Excel sin tocar el código.
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    fecha = fecha or datetime.now()
+    cuestionario = cuestionario or cuestionario_guia_ii
+    plantilla = _compilar_plantilla(
+        ruta_plantilla_reporte, os.path.getmtime(ruta_plantilla_reporte), cuestionario)
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(plantilla['titulo'])
+    for letra, ancho in plantilla['anchos'].items():
+        ws.column_dimensions[letra].width = ancho
+    for fila, alto in plantilla['altos'].items():
+        ws.row_dimensions[fila].height = alto
+    for rango in plantilla['combinadas']:
+        ws.merged_cells.add(rango)
+
+    nivel = row['Nivel de Riesgo']
+    filas_tabla = cuestionario.filas_tabla(row, detalles_preguntas)
+    valores = {
+        'mes': fecha.strftime("%B %Y").upper(),
+        'nombre': row['Nombre'],
+        'area': area_adscrita,
+        'nivel': nivel,
+        'puntuacion_total': row['Puntuación Total'],
+        'recomendaciones': generar_recomendaciones(nivel),
+        'tabla.puntuacion': [fila[0] for fila in filas_tabla],
+        'tabla.respuestas': [fila[1] for fila in filas_tabla],
+        'tabla.calificacion_categoria': [fila[2] for fila in filas_tabla],
+        'tabla.resultado_dominio': [fila[3] for fila in filas_tabla],
+    }
+
+    # Cada combinación de estilo y variante se registra una sola vez en el libro
+    registrados = {}
+
+    def estilo_celda(indice, variante):
+        clave = (indice, nivel if variante == 'nivel' else variante)
+        if clave not in registrados:
+            cell = WriteOnlyCell(ws)
+            for atributo, valor in (plantilla['estilos'][indice] if indice is not None
+                                    else {}).items():
+                setattr(cell, atributo, valor)
+            if variante == 'vacia':
+                cell.fill = _estilos_reporte()['tabla_vacia']['fill']
+            elif variante == 'nivel':
+                estilos = _estilos_reporte()
+                cell.fill = estilos.get(('nivel', nivel), estilos[('nivel', None)])['fill']
+            registrados[clave] = cell._style
+        return registrados[clave]
+
+    def valor_campo(campo, fila_tabla):
+        valor = valores[campo]
+        return valor[fila_tabla] if campo.startswith('tabla.') else valor
+
+    for fila in plantilla['filas']:
+        celdas = []
+        for celda in fila:
+            if celda is None:
+                celdas.append(None)
+                continue
+            tipo, dato, (indice, variante), fila_tabla = celda
+            if tipo == 'campo':
+                valor = valor_campo(dato, fila_tabla)
+            elif tipo == 'texto':
+                valor = "".join(str(valor_campo(parte[0], fila_tabla))
+                                if isinstance(parte, tuple) else parte for parte in dato)
+            else:
+                valor = dato
+            if indice is None and variante is None:
+                celdas.append(valor)
+            else:
+                celdas.append(_celda(ws, valor, estilo_celda(indice, variante)))
+        ws.append(celdas)
+
+    guardar_reporte(wb, archivo, fecha)
+
+
+def contenido_reporte(row, detalles_preguntas, area_adscrita, fecha=None, cuestionario=None):
+    """
+    Contenido del reporte individual de un trabajador para los formatos HTML y PDF: los
+    campos del trabajador y las filas de la tabla como (categoría, dominio, dimensión,
+    puntuación, respuestas, calificación de la categoría, resultado por dominio).
+    """
+    fecha = fecha or datetime.now()
+    cuestionario = cuestionario or cuestionario_guia_ii
+    nivel = row['Nivel de Riesgo']
+    return {
+        'mes': fecha.strftime("%B %Y").upper(),
+        'nombre': row['Nombre'],
+        'area': area_adscrita,
+        'nivel': nivel,
+        'color_nivel': colores_nivel.get(nivel, "FFFFFF"),
+        'puntuacion_total': row['Puntuación Total'],
+        'recomendaciones': generar_recomendaciones(nivel),
+        'tabla': [(*dimension, *fila) for dimension, fila in zip(
+            cuestionario.filas_reporte, cuestionario.filas_tabla(row, detalles_preguntas))],
+    }
+
+
+def _guardar_bytes(datos, archivo):
+    """
+    Escribe `datos` en `archivo` (una ruta o un archivo abierto en modo binario).
+    """
+    inicio = time.perf_counter()
+    if hasattr(archivo, 'write'):
+        archivo.write(datos)
+    else:
+        with open(archivo, 'wb') as f:
+            f.write(datos)
+    tiempo_guardado.segundos += time.perf_counter() - inicio
+
+
+# Plantilla del reporte individual en HTML: la fila <tr> con campos `tabla.*` se repite
+# una vez por cada fila de la tabla
+ruta_plantilla_html = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'plantilla_reporte.html')
+fila_plantilla_html = re.compile(r"<tr\b.*?</tr>", re.DOTALL | re.IGNORECASE)
+campos_html = ('mes', 'nombre', 'area', 'nivel', 'color_nivel', 'puntuacion_total',
+               'recomendaciones')
+campos_tabla_html = ('tabla.categoria', 'tabla.dominio', 'tabla.dimension', 'tabla.puntuacion',
+                     'tabla.respuestas', 'tabla.calificacion_categoria',
+                     'tabla.resultado_dominio')
+
+
+def _partes_html(texto, permitidos):
+    """
+    Divide un texto de la plantilla HTML en textos fijos y campos (tuplas de un elemento).
+    """
+    partes = campo_plantilla.split(texto)
+    desconocidos = [campo for campo in partes[1::2] if campo not in permitidos]
+    if desconocidos:
+        raise ValueError("Campos desconocidos en la plantilla HTML del reporte: " +
+                         ", ".join("{{%s}}" % campo for campo in desconocidos))
+    return [(parte,) if i % 2 else parte for i, parte in enumerate(partes) if i % 2 or parte]
+
+
+@lru_cache(maxsize=4)
+def _compilar_plantilla_html(ruta, modificado):
+    """
+    Lee la plantilla HTML y la divide una sola vez por proceso (y de nuevo si el archivo
+    cambia) en lo que va antes de la fila de la tabla, la fila y lo que va después.
+    """
+    with open(ruta, encoding='utf-8') as f:
+        texto = f.read()
+    fila = next((m for m in fila_plantilla_html.finditer(texto)
+                 if any(campo.startswith('tabla.')
+                        for campo in campo_plantilla.findall(m.group()))), None)
+    if fila is None:
+        return {'antes': _partes_html(texto, campos_html), 'fila': [], 'despues': []}
+    return {'antes': _partes_html(texto[:fila.start()], campos_html),
+            'fila': _partes_html(fila.group(), campos_html + campos_tabla_html),
+            'despues': _partes_html(texto[fila.end():], campos_html)}
+
+
+def generar_reporte_html(contenido):
+    """
+    Texto HTML del reporte individual a partir de `contenido_reporte`.
+    """
+    plantilla = _compilar_plantilla_html(
+        ruta_plantilla_html, os.path.getmtime(ruta_plantilla_html))
+    valores = {campo: html.escape(str(contenido[campo])) for campo in campos_html}
+
+    def llenar(partes, valores):
+        return "".join(valores[parte[0]] if isinstance(parte, tuple) else parte
+                       for parte in partes)
+
+    filas = [llenar(plantilla['fila'], {**valores, **{
+        campo: html.escape(str(valor)) for campo, valor in zip(campos_tabla_html, fila)}})
+        for fila in contenido['tabla']]
+    return (llenar(plantilla['antes'], valores) + "".join(filas) +
+            llenar(plantilla['despues'], valores))
+
+
+def escribir_reporte_html(row, detalles_preguntas, area_adscrita, archivo, fecha=None,
+                          cuestionario=None):
+    """
+    Escribe el reporte individual de un trabajador en HTML a partir de
+    `plantilla_reporte.html`, que se prepara una sola vez por proceso.
+    """
+    contenido = contenido_reporte(row, detalles_preguntas, area_adscrita, fecha, cuestionario)
+    _guardar_bytes(generar_reporte_html(contenido).encode('utf-8'), archivo)
+
+
+# Margen, tamaño de letra e interlineado de la tabla del reporte en PDF (en puntos)
+margen_pdf = 36
+tamano_texto_pdf = 8
+interlineado_pdf = 10
+
+
+@lru_cache(maxsize=8)
+def _maqueta_pdf(cuestionario):
+    """
+    Lo que en el reporte en PDF solo depende de la guía, calculado una vez por proceso:
+    posición y ancho de cada columna de la tabla y líneas ya divididas del encabezado y
+    de las celdas de categoría, dominio y dimensión.
+    """
+    import documento_pdf
+    ancho_pagina, _ = documento_pdf.a4_horizontal
+    util = ancho_pagina - 2 * margen_pdf
+    anchos = [util * ancho / sum(anchos_columnas_reporte) for ancho in anchos_columnas_reporte]
+    posiciones = [margen_pdf + sum(anchos[:k]) for k in range(len(anchos))]
+
+    def lineas(texto, k, negrita=False):
+        return documento_pdf.dividir_lineas(texto, anchos[k] - 6, tamano_texto_pdf, negrita)
+
+    return {'x': posiciones, 'anchos': anchos,
+            'encabezado': [lineas(texto, k, True)
+                           for k, texto in enumerate(encabezados_tabla_reporte)],
+            'filas': [[lineas(texto, k) for k, texto in enumerate(fila)]
+                      for fila in cuestionario.filas_reporte]}
+
+
+def generar_reporte_pdf(contenido, fecha=None, cuestionario=None):
+    """
+    Bytes del reporte individual en PDF (A4 horizontal) a partir de `contenido_reporte`:
+    los datos del trabajador, el nivel de riesgo con su color, la tabla de resultados
+    (que continúa en otra página, con su encabezado, si no cabe) y las recomendaciones.
+    """
+    import documento_pdf
+    maqueta = _maqueta_pdf(cuestionario or cuestionario_guia_ii)
+    dividir = documento_pdf.dividir_lineas
+    ancho_pagina, alto_pagina = documento_pdf.a4_horizontal
+    limite = alto_pagina - margen_pdf
+    doc = documento_pdf.DocumentoPDF(titulo=f"Reporte individual - {contenido['nombre']}")
+    doc.nueva_pagina()
+
+    titulo = f"RESULTADOS DE EVALUACIÓN DE RIESGOS PSICOSOCIALES ({contenido['mes']})"
+    doc.texto((ancho_pagina - documento_pdf.ancho_texto(titulo, 14, True)) / 2,
+              margen_pdf + 14, titulo, 14, True)
+    y = margen_pdf + 44
+    for etiqueta, campo in (("Trabajador", 'nombre'), ("Área adscrita", 'area'),
+                            ("Nivel de riesgo", 'nivel')):
+        valor = str(contenido[campo])
+        if campo == 'nivel':
+            doc.rectangulo(margen_pdf + 96, y - 11, documento_pdf.ancho_texto(valor, 10) + 8, 15,
+                           relleno=contenido['color_nivel'], borde=None)
+        doc.texto(margen_pdf, y, etiqueta, 10, True)
+        doc.texto(margen_pdf + 100, y, valor, 10)
+        y += 18
+    y += 8
+
+    def alto_fila(celdas):
+        return max(len(lineas) for lineas in celdas if lineas is not None) * interlineado_pdf + 6
+
+    def fila(celdas, y, rellenos=None, negrita=False, color="000000"):
+        # Las celdas en None no se dibujan
+        alto = alto_fila(celdas)
+        for k, lineas in enumerate(celdas):
+            if lineas is None:
+                continue
+            x = maqueta['x'][k]
+            doc.rectangulo(x, y, maqueta['anchos'][k], alto,
+                           relleno=rellenos[k] if rellenos else None)
+            for i, linea in enumerate(lineas):
+                doc.texto(x + 3, y + 3 + tamano_texto_pdf + i * interlineado_pdf, linea,
+                          tamano_texto_pdf, negrita, color)
+        return y + alto
+
+    def encabezado(y):
+        return fila(maqueta['encabezado'], y, ["4F81BD"] * len(maqueta['encabezado']),
+                    True, "FFFFFF")
+
+    y = encabezado(y)
+    for fijas, (categoria, dominio, _, *variables) in zip(maqueta['filas'], contenido['tabla']):
+        celdas = fijas + [dividir(str(valor), maqueta['anchos'][k] - 6, tamano_texto_pdf)
+                          for k, valor in enumerate(variables, start=len(fijas))]
+        if y + alto_fila(celdas) > limite:
+            doc.nueva_pagina()
+            y = encabezado(margen_pdf)
+        # Categoría y dominio vacíos se sombrean, como en el reporte en Excel
+        rellenos = ["D9D9D9" if categoria == "" else None,
+                    "D9D9D9" if dominio == "" else None] + [None] * (len(celdas) - 2)
+        y = fila(celdas, y, rellenos)
+
+    total = [None, None, ["Puntuación total"], [str(contenido['puntuacion_total'])]]
+    y = fila(total + [None] * (len(maqueta['anchos']) - len(total)), y, negrita=True)
+
+    # Recomendaciones finales
+    lineas = ["RECOMENDACIONES:", ""] + dividir(
+        contenido['recomendaciones'], ancho_pagina - 2 * margen_pdf, 10, True)
+    y += 24
+    for linea in lineas:
+        if y > limite:
+            doc.nueva_pagina()
+            y = margen_pdf + 10
+        doc.texto(margen_pdf, y, linea, 10, True)
+        y += 13
+    return doc.guardar(fecha)
+
+
+def escribir_reporte_pdf(row, detalles_preguntas, area_adscrita, archivo, fecha=None,
+                         cuestionario=None):
+    """
+    Escribe el reporte individual de un trabajador en PDF, con el escritor en Python
+    puro de `documento_pdf` (sin dependencias adicionales).
+    """
+    fecha = fecha or datetime.now()
+    contenido = contenido_reporte(row, detalles_preguntas, area_adscrita, fecha, cuestionario)
+    _guardar_bytes(generar_reporte_pdf(contenido, fecha, cuestionario), archivo)
+
+
+# Formas disponibles de escribir el reporte individual en un archivo
+backends_reporte = {
+    'streaming': escribir_reporte_individual,
+    'openpyxl': _escribir_reporte_openpyxl,
+    'plantilla': escribir_reporte_plantilla,
+    'html': escribir_reporte_html,
+    'pdf': escribir_reporte_pdf,
+}
+
+# Extensión del archivo que escribe cada backend (los que no aparecen escriben Excel)
+extensiones_reporte = {'html': '.html', 'pdf': '.pdf'}
+
+
+class _ZipReproducible(ZipFile):
+    """
+    ZipFile que asigna la misma fecha a todos sus miembros, para que un mismo
+    libro guardado dos veces produzca exactamente los mismos bytes.
+    """
+
+    def __init__(self, archivo, fecha):
+        super().__init__(archivo, 'w', ZIP_DEFLATED, allowZip64=True)
+        self.fecha_miembros = fecha.timetuple()[:6]
+
+    def writestr(self, zinfo_or_arcname, data, *args, **kwargs):
+        if not isinstance(zinfo_or_arcname, ZipInfo):
+            zinfo_or_arcname = ZipInfo(
+                zinfo_or_arcname, date_time=self.fecha_miembros)
+            zinfo_or_arcname.compress_type = self.compression
+            zinfo_or_arcname.external_attr = 0o600 << 16
+        super().writestr(zinfo_or_arcname, data, *args, **kwargs)
+
+    def write(self, filename, arcname=None, *args, **kwargs):
+        # openpyxl escribe las hojas en archivos temporales y luego los agrega al zip
+        with open(filename, 'rb') as f:
+            self.writestr(arcname or os.path.basename(filename), f.read())
+
+
+def guardar_reporte(wb, archivo, fecha):
+    """
+    Guarda el libro en `archivo` con `fecha` como fecha de creación y modificación,
+    de modo que el resultado no depende del momento en que se guarda.
+    """
+    from openpyxl.writer.excel import ExcelWriter
+    inicio = time.perf_counter()
+    wb.properties.created = fecha
+    wb.properties.modified = fecha
+    ExcelWriter(wb, _ZipReproducible(archivo, fecha)).save()
+    tiempo_guardado.segundos += time.perf_counter() - inicio
+
+
+# Caracteres que no se permiten en nombres de archivo de Windows
+caracteres_invalidos_archivo = re.compile(r'[<>:"/\\|?*\x00-\x1f]')
+
+# Longitud máxima del nombre del trabajador dentro del nombre del archivo
+longitud_maxima_nombre_archivo = 120
+
+
+def nombre_archivo_reporte(nombre, extension='.xlsx'):
+    """
+    Nombre del archivo del reporte individual de un trabajador, válido en Windows: los
+    espacios y los caracteres no permitidos se cambian por "_" y se quitan los puntos y
+    espacios finales. `extension` depende del backend (ver `extensiones_reporte`).
+    """
+    texto = unicodedata.normalize('NFC', str(nombre)).strip()
+    texto = caracteres_invalidos_archivo.sub('_', texto).replace(' ', '_')
+    texto = texto[:longitud_maxima_nombre_archivo].rstrip('. ') or 'sin_nombre'
+    return f"Reporte_{texto}{extension}"
+
+
+def ruta_reporte(carpeta_individuales, nombre, extension='.xlsx'):
+    """
+    Ruta del archivo del reporte individual de un trabajador (sin tomar en cuenta otros
+    trabajadores con el mismo nombre; para eso, ver `GestorSalida`).
+    """
+    return os.path.join(carpeta_individuales, nombre_archivo_reporte(nombre, extension))
+
+
+class GestorSalida:
+    """
+    Asigna a cada trabajador de una ejecución una clave y un archivo de reporte únicos.
+
+    El primer trabajador con un nombre conserva el archivo de siempre; los siguientes
+    con el mismo nombre (o con uno que da el mismo archivo, sin distinguir mayúsculas,
+    como en Windows) reciben el sufijo _2, _3, ... en el orden en que aparecen, así que
+    la asignación no cambia al volver a procesar el mismo archivo. La clave (el nombre,
+    o "nombre (2)", ...) identifica al trabajador en el manifiesto del modo incremental.
+    """
+
+    def __init__(self, carpeta_individuales, extension='.xlsx'):
+        self.carpeta_individuales = carpeta_individuales
+        self.extension = extension
+        self.asignados = {}
+        self.archivos = set()
+
+    def asignar(self, nombre):
+        """
+        Devuelve (clave, ruta del reporte) para el siguiente trabajador llamado `nombre`.
+        """
+        nombre = str(nombre)
+        raiz, extension = os.path.splitext(nombre_archivo_reporte(nombre, self.extension))
+        clave, archivo, k = nombre, raiz + extension, 1
+        while clave in self.asignados or archivo.casefold() in self.archivos:
+            k += 1
+            clave, archivo = f"{nombre} ({k})", f"{raiz}_{k}{extension}"
+        self.archivos.add(archivo.casefold())
+        self.asignados[clave] = os.path.join(self.carpeta_individuales, archivo)
+        return clave, self.asignados[clave]
+
+    def limpiar_temporales(self):
+        """
+        Borra de la carpeta los temporales de reportes ("<reporte>.<pid>.tmp", ver
+        `_generar_lote`) que dejó una ejecución interrumpida. Devuelve cuántos borró.
+        """
+        borrados = 0
+        for archivo in glob.glob(os.path.join(glob.escape(self.carpeta_individuales), '*.tmp')):
+            if re.search(r"\.\d+\.tmp$", archivo):
+                try:
+                    os.remove(archivo)
+                    borrados += 1
+                except FileNotFoundError:
+                    pass
+        return borrados
+
+
+# Archivo con todos los reportes individuales en el modo de salida 'zip'
+nombre_zip_reportes = 'resultados_individuales.zip'
+
+
+def abrir_zip_reportes(archivo, fecha):
+    """
+    Abre el archivo zip que reúne los reportes individuales. Los reportes ya vienen
+    comprimidos, así que se guardan sin volver a comprimir.
+    """
+    archivo_zip = _ZipReproducible(archivo, fecha)
+    archivo_zip.compression = ZIP_STORED
+    return archivo_zip
+
+
+def extraer_reporte(archivo_zip, nombre, carpeta_destino):
+    """
+    Extrae del zip de reportes el reporte individual de un trabajador y devuelve su ruta.
+    `nombre` es el nombre del trabajador o el del archivo dentro del zip (el que aparece
+    en la hoja 'Índice', para trabajadores con el mismo nombre).
+    """
+    with ZipFile(archivo_zip) as zf:
+        if nombre not in zf.namelist():
+            # El reporte puede estar en cualquiera de los formatos (ver `extensiones_reporte`)
+            raiz = os.path.splitext(nombre_archivo_reporte(nombre))[0]
+            nombre = next((n for n in zf.namelist() if os.path.splitext(n)[0] == raiz),
+                          nombre_archivo_reporte(nombre))
+        return zf.extract(nombre, carpeta_destino)
+
+
+def _generar_lote(lote, fecha, backend, cuestionario=None, en_memoria=False):
+    """
+    Genera y guarda los reportes de un lote de (row, detalles, archivo, área) trabajadores.
+    Devuelve una lista de (nombre, archivo, error, contenido, medidas) con error en None
+    si el archivo se generó. Con `en_memoria`, los reportes no se escriben en disco y
+    `contenido` trae los bytes de cada archivo. `medidas` es (segundos, segundos de
+    guardado, proceso, memoria pico del proceso).
+    """
+    escribir = backends_reporte[backend]
+    resultado = []
+    for row, detalles, archivo, area_adscrita in lote:
+        inicio, guardado = time.perf_counter(), tiempo_guardado.segundos
+        # En disco se escribe en un temporal propio del proceso y se renombra al final,
+        # para no dejar reportes a medias ni pisar el de otro proceso
+        destino = BytesIO() if en_memoria else f"{archivo}.{os.getpid()}.tmp"
+        try:
+            escribir(row, detalles, area_adscrita, destino, fecha, cuestionario)
+            if en_memoria:
+                contenido = destino.getvalue()
+            else:
+                contenido = None
+                os.replace(destino, archivo)
+            error = None
+        except Exception as e:
+            contenido, error = None, str(e)
+            if not en_memoria and os.path.exists(destino):
+                os.remove(destino)
+        medidas = (time.perf_counter() - inicio, tiempo_guardado.segundos - guardado,
+                   os.getpid(), memoria_proceso()[1])
+        resultado.append((row['Nombre'], archivo, error, contenido, medidas))
+    return resultado
+
+
+def generar_reportes_individuales(resultados, detalles_preguntas, carpeta_individuales,
+                                  area_adscrita="Área por definir", procesos=None,
+                                  tamano_lote=25, fecha=None, al_completar=None,
+                                  backend='plantilla', executor=None, cancelar=None,
+                                  cuestionario=None, archivo_zip=None, columna_area=None,
+                                  medicion=None, archivos=None):
+    """
+    Genera los reportes individuales de todos los trabajadores en `carpeta_individuales`,
+    en lotes de `tamano_lote` repartidos entre `procesos` procesos (o en `executor`).
+    `archivos` son las rutas de cada fila (por defecto las asigna un `GestorSalida`);
+    con `archivo_zip` los reportes se agregan a ese zip en lugar de escribirse sueltos.
+    Devuelve un diccionario con las listas 'generados' (rutas) y 'errores'.
+    """
+    fecha = fecha or datetime.now().replace(microsecond=0)
+    procesos = procesos or os.cpu_count() or 1
+
+    def area(row):
+        valor = row.get(columna_area) if columna_area else None
+        return area_adscrita if valor is None or pd.isna(valor) or valor == "" else valor
+
+    if archivos is None:
+        gestor = GestorSalida(carpeta_individuales, extensiones_reporte.get(backend, '.xlsx'))
+        archivos = [gestor.asignar(nombre)[1] for nombre in resultados.get('Nombre', [])]
+    tareas = [
+        (row, detalles, archivo, area(row))
+        for row, detalles, archivo in zip(resultados.to_dict('records'),
+                                          detalles_preguntas.to_dict('records'), archivos)
+    ]
+    lotes = [tareas[i:i + tamano_lote]
+             for i in range(0, len(tareas), tamano_lote)]
+
+    resumen = {'generados': [], 'errores': []}
+
+    en_memoria = archivo_zip is not None
+
+    def registrar(resultado_lote):
+        for nombre, archivo, error, contenido, medidas in resultado_lote:
+            if medicion is not None and medidas is not None:
+                medicion.registrar_reporte(nombre, *medidas)
+            if error is None and en_memoria:
+                archivo = os.path.basename(archivo)
+                archivo_zip.writestr(archivo, contenido)
+            if error is None:
+                resumen['generados'].append(archivo)
+            else:
+                resumen['errores'].append(
+                    {'nombre': nombre, 'archivo': archivo, 'error': error})
+            if al_completar:
+                al_completar(nombre, archivo, error)
+
+    def enviar(executor):
+        futuros = {executor.submit(_generar_lote, lote, fecha, backend, cuestionario,
+                                   en_memoria): lote
+                   for lote in lotes}
+        for futuro in as_completed(futuros):
+            if cancelar is not None and cancelar.is_set():
+                for pendiente in futuros:
+                    pendiente.cancel()
+            if futuro.cancelled():
+                continue
+            try:
+                registrar(futuro.result())
+            except Exception as e:
+                # Falla del proceso completo: se marcan todos los archivos del lote
+                registrar([(row['Nombre'], archivo, str(e), None, None)
+                           for row, _, archivo, _ in futuros[futuro]])
+
+    if executor is not None:
+        enviar(executor)
+    elif procesos == 1 or len(lotes) <= 1:
+        # En serie se revisa la cancelación antes de cada reporte
+        for tarea in tareas:
+            if cancelar is not None and cancelar.is_set():
+                break
+            registrar(_generar_lote([tarea], fecha, backend, cuestionario, en_memoria))
+    else:
+        with ProcessPoolExecutor(max_workers=min(procesos, len(lotes))) as executor:
+            enviar(executor)
+
+    return resumen
+
+
+def normalizar_columnas(columnas):
+    """
+    Deja solo el número de la pregunta en los encabezados ("1. Mi trabajo..." -> "1").
+    """
+    return [col.split('.')[0] if '.' in str(col) else col for col in columnas]
+
+
+def leer_respuestas(archivo_excel, sheet_name='Respuestas de formulario 1'):
+    """
+    Lee la hoja de respuestas completa con los encabezados normalizados.
+    """
+    df = pd.read_excel(archivo_excel, sheet_name=sheet_name)
+    df.columns = normalizar_columnas(df.columns)
+    return df
+
+
+def leer_respuestas_por_bloques(archivo_excel, tamano_bloque=5000,
+                                sheet_name='Respuestas de formulario 1'):
+    """
+    Lee la hoja de respuestas por bloques de `tamano_bloque` filas y devuelve cada
+    bloque como DataFrame con los encabezados normalizados.
+
+    Los archivos .xlsx se recorren fila por fila en modo de solo lectura, sin cargar
+    la hoja completa; los encabezados se normalizan una sola vez. Las filas
+    completamente vacías se omiten.
+    """
+    from openpyxl import load_workbook
+    if not str(archivo_excel).lower().endswith(('.xlsx', '.xlsm')):
+        # Otros formatos (.xls) no se pueden leer por filas con openpyxl
+        df = leer_respuestas(archivo_excel, sheet_name=sheet_name)
+        for inicio in range(0, len(df), tamano_bloque):
+            yield df.iloc[inicio:inicio + tamano_bloque].reset_index(drop=True)
+        return
+
+    wb = load_workbook(archivo_excel, read_only=True, data_only=True)
+    try:
+        filas = wb[sheet_name].iter_rows(values_only=True)
+        encabezado = next(filas, None)
+        if encabezado is None:
+            return
+        columnas = normalizar_columnas(
+            [f"Unnamed: {i}" if col is None else col for i, col in enumerate(encabezado)])
+        ancho = len(columnas)
+
+        bloque = []
+        for fila in filas:
+            if all(valor is None for valor in fila):
+                continue
+            fila = tuple(fila[:ancho]) + (None,) * (ancho - len(fila))
+            bloque.append(fila)
+            if len(bloque) == tamano_bloque:
+                yield pd.DataFrame(bloque, columns=columnas)
+                bloque = []
+        if bloque:
+            yield pd.DataFrame(bloque, columns=columnas)
+    finally:
+        wb.close()
+
+
+def contar_filas(archivo_excel, sheet_name='Respuestas de formulario 1'):
+    """
+    Número aproximado de trabajadores en la hoja de respuestas, según las dimensiones
+    guardadas en el archivo (sin leer las filas). Devuelve None si no se puede saber.
+    """
+    from openpyxl import load_workbook
+    if not str(archivo_excel).lower().endswith(('.xlsx', '.xlsm')):
+        return None
+    wb = load_workbook(archivo_excel, read_only=True)
+    try:
+        filas = wb[sheet_name].max_row
+        return max(filas - 1, 0) if filas else None
+    finally:
+        wb.close()
+
+
+# Archivo, dentro de la carpeta de destino, con el índice del modo incremental
+nombre_manifiesto = 'manifiesto_reportes.json'
+
+# Versión del cálculo de puntuaciones y de las columnas de resultados; se incrementa
+# cuando cambian, para que el modo incremental no reutilice resultados anteriores
+version_puntuacion = 2
+
+
+def huella_puntuacion(cuestionario=None):
+    """
+    Huella de lo que, además de las respuestas, determina los resultados de cada
+    trabajador: la guía, la versión del cálculo y el parecido mínimo de las correcciones.
+    """
+    cuestionario = cuestionario or cuestionario_guia_ii
+    return f"{version_puntuacion}:{cuestionario.huella}:{similitud_minima_respuesta}"
+
+
+def huellas_respuestas(df, cuestionario=None, columnas_extra=()):
+    """
+    Calcula una huella (hash) de las 46 respuestas de cada trabajador y de las
+    `columnas_extra` (por ejemplo, el área), si se indican.
+    """
+    cuestionario = cuestionario or cuestionario_guia_ii
+    columnas = [f"{i}" for i in cuestionario.preguntas if f"{i}" in df.columns]
+    columnas += list(columnas_extra)
+    return [hashlib.blake2b("\x1f".join(fila).encode('utf-8'), digest_size=16).hexdigest()
+            for fila in df[columnas].astype(str).to_numpy()]
+
+
+def cargar_manifiesto(carpeta_destino):
+    """
+    Carga el manifiesto del modo incremental de `carpeta_destino` (vacío si no existe).
+    """
+    archivo = os.path.join(carpeta_destino, nombre_manifiesto)
+    if not os.path.exists(archivo):
+        return {'trabajadores': {}, 'ejecuciones': []}
+    with open(archivo, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def guardar_json(archivo, datos):
+    """
+    Escribe `datos` en JSON en un temporal y lo renombra a `archivo`, para no dejarlo a
+    medias.
+    """
+    temporal = archivo + '.tmp'
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(datos, f, ensure_ascii=False, indent=1, default=str)
+    os.replace(temporal, archivo)
+
+
+def guardar_manifiesto(carpeta_destino, manifiesto):
+    """
+    Guarda el manifiesto en un archivo temporal y lo renombra, para no dejarlo a medias.
+    """
+    guardar_json(os.path.join(carpeta_destino, nombre_manifiesto), manifiesto)
+
+
+# Columna derivada de 'Marca temporal' que se puede usar para agrupar por periodo (año-mes)
+columna_periodo = 'Periodo'
+
+# Niveles a partir de los cuales se cuenta a un trabajador por encima del umbral
+umbrales_agregado = ('Medio', 'Alto')
+
+
+def columnas_de_grupo(df, columnas_grupo, columna_area=None):
+    """
+    Toma del formulario las columnas usadas para agrupar a los trabajadores y la del
+    área adscrita, en el orden de `df`. 'Periodo' se obtiene del año y mes de la
+    'Marca temporal' si el formulario no la trae. Los valores quedan como texto, con ""
+    para los vacíos.
+    """
+    grupos = {}
+    faltantes = []
+    for columna in dict.fromkeys([*columnas_grupo, *([columna_area] if columna_area else [])]):
+        if columna in df.columns:
+            valores = df[columna]
+        elif columna == columna_periodo and 'Marca temporal' in df.columns:
+            valores = pd.to_datetime(df['Marca temporal'], errors='coerce').dt.strftime('%Y-%m')
+        else:
+            faltantes.append(columna)
+            continue
+        grupos[columna] = valores.where(valores.notna(), "").astype(str).str.strip().to_numpy()
+    if faltantes:
+        mensajes = []
+        de_grupo = [columna for columna in faltantes if columna in columnas_grupo]
+        if de_grupo:
+            mensajes.append("El archivo no tiene las columnas para agrupar (--agrupar): "
+                            + ", ".join(de_grupo))
+        if columna_area in faltantes:
+            mensajes.append("El archivo no tiene la columna del área adscrita "
+                            f"(--columna-area): {columna_area}")
+        raise ValueError("; ".join(mensajes))
+    return pd.DataFrame(grupos, index=df.index)
+
+
+def agregar_resultados(resultados, columnas_grupo, cuestionario=None):
+    """
+    Resume los resultados por grupo de trabajadores para la auditoría: número de
+    trabajadores, promedio de la puntuación total y de cada categoría y dominio,
+    distribución por nivel de riesgo y porcentaje con nivel medio o superior y alto o
+    superior, y porcentaje de trabajadores en cada nivel de cada categoría y dominio
+    ('Nivel del dominio - Liderazgo: % Alto'), como en los reportes individuales.
+
+    Los dominios son los de la NOM-035 ('Dominio - ...'); con una guía que no los define
+    se usan las subcategorías de `categorias`.
+
+    Los grupos se forman con los prefijos de `columnas_grupo` (por ejemplo, centro de
+    trabajo y luego centro de trabajo y área). Las filas se recorren una sola vez, al
+    sumar por el grupo más detallado; los demás niveles se obtienen de esas sumas.
+
+    Devuelve un diccionario {nombre de hoja: DataFrame} con 'General' y un resumen por
+    cada prefijo, con el nombre de su última columna ('Por Área'). Los trabajadores sin
+    valor en una columna se agrupan como "Sin dato".
+    """
+    cuestionario = cuestionario or cuestionario_guia_ii
+    columnas_grupo = list(columnas_grupo)
+    if cuestionario.dominios:
+        puntajes = ['Puntuación Total', *cuestionario.categorias,
+                    *(f"Dominio - {dominio}" for dominio in cuestionario.dominios)]
+    else:
+        puntajes = ['Puntuación Total', *(nombre for nombre, _ in cuestionario.grupos)]
+    puntajes = [columna for columna in puntajes if columna in resultados.columns]
+    calificadas = [columna_nivel for _, _, columna_nivel in cuestionario.calificaciones
+                   if columna_nivel in resultados.columns]
+
+    def indicadores(columna):
+        codigos = pd.Categorical(resultados[columna], categories=niveles_riesgo).codes
+        return codigos, {nivel: (codigos == k).astype(np.int64)
+                         for k, nivel in enumerate(niveles_riesgo)}
+
+    codigos, por_nivel = indicadores('Nivel de Riesgo')
+    sumas = pd.DataFrame({
+        **{columna: resultados[columna].fillna("").astype(str).replace("", "Sin dato")
+           for columna in columnas_grupo},
+        'Trabajadores': np.ones(len(resultados), dtype=np.int64),
+        **{columna: resultados[columna].to_numpy(dtype=float) for columna in puntajes},
+        **por_nivel,
+        **{f"{nivel} o superior": (codigos >= niveles_riesgo.index(nivel)).astype(np.int64)
+           for nivel in umbrales_agregado},
+        **{f"{columna}: {nivel}": valores for columna in calificadas
+           for nivel, valores in indicadores(columna)[1].items()},
+    })
+    if columnas_grupo:
+        sumas = sumas.groupby(columnas_grupo, sort=True).sum()
+
+    def resumen(sumas_grupo):
+        n = sumas_grupo['Trabajadores']
+        tabla = {'Trabajadores': n}
+        for columna in puntajes:
+            tabla[f"Promedio {columna}"] = (sumas_grupo[columna] / n).round(2)
+        for nivel in niveles_riesgo:
+            tabla[nivel] = sumas_grupo[nivel]
+        for nivel in niveles_riesgo:
+            tabla[f"% {nivel}"] = (100 * sumas_grupo[nivel] / n).round(1)
+        for nivel in umbrales_agregado:
+            tabla[f"% {nivel} o superior"] = (100 * sumas_grupo[f"{nivel} o superior"] / n).round(1)
+        for columna in calificadas:
+            for nivel in niveles_riesgo:
+                tabla[f"{columna}: % {nivel}"] = (
+                    100 * sumas_grupo[f"{columna}: {nivel}"] / n).round(1)
+        return pd.DataFrame(tabla)
+
+    general = sumas.groupby(np.zeros(len(sumas), dtype=np.intp)).sum()
+    hojas = {'General': resumen(general).reset_index(drop=True)}
+    for k in range(1, len(columnas_grupo) + 1):
+        nivel = sumas if k == len(columnas_grupo) else sumas.groupby(level=list(range(k))).sum()
+        # Los nombres de hoja de Excel tienen como máximo 31 caracteres
+        nombre = re.sub(r"[\[\]:*?/\\]", "-", f"Por {columnas_grupo[k - 1]}")[:28]
+        if nombre in hojas:
+            nombre = f"{nombre} {k}"
+        hojas[nombre] = resumen(nivel).reset_index()
+    return hojas
+
+
+# Hoja del archivo general con el archivo del reporte de cada trabajador
+hoja_indice = 'Índice'
+
+
+def guardar_archivo_general(archivo, resultados, agregados=None, indice=(), enlaces=True):
+    """
+    Escribe el archivo general: los resultados de cada trabajador, una hoja por cada
+    tabla de `agregados` y la hoja 'Índice' con el archivo del reporte individual de
+    cada trabajador (`indice` son tuplas (nombre, archivo, generado)). La columna
+    'Archivo' guarda la ruta relativa al archivo general como texto; con `enlaces`, la
+    columna 'Vínculo' abre el reporte desde Excel.
+
+    Se escribe en un temporal que se renombra al final, para no dejar el archivo a medias.
+    """
+    temporal = os.path.splitext(archivo)[0] + '.tmp.xlsx'
+    try:
+        with pd.ExcelWriter(temporal, engine='openpyxl') as writer:
+            resultados.to_excel(writer, index=False)
+            for hoja, tabla in (agregados or {}).items():
+                tabla.to_excel(writer, sheet_name=hoja, index=False)
+            if indice:
+                # Los vínculos son fórmulas HIPERVINCULO: mucho más rápidas de escribir
+                # que los hipervínculos de openpyxl en archivos grandes. Las fórmulas no
+                # tienen valor guardado (pandas las lee vacías), por eso la ruta va
+                # también como texto en 'Archivo'
+                filas = []
+                for nombre, ruta, generado in indice:
+                    ruta = ruta.replace(os.sep, '/')
+                    fila = (nombre, ruta, 'Generado' if generado else 'Error')
+                    if enlaces:
+                        fila += (f'=HYPERLINK("{ruta}", "Abrir")' if generado else None,)
+                    filas.append(fila)
+                columnas = ['Nombre', 'Archivo', 'Estado'] + (['Vínculo'] if enlaces else [])
+                pd.DataFrame(filas, columns=columnas).to_excel(
+                    writer, sheet_name=hoja_indice, index=False)
+        os.replace(temporal, archivo)
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+
+
+# Nombre del reporte de ejecución que se escribe junto a los resultados
+nombre_reporte_ejecucion = 'reporte_ejecucion.json'
+
+class _TiempoGuardado(threading.local):
+    """
+    Tiempo acumulado en guardar libros (compresión y escritura) en el hilo actual; cada
+    hilo tiene el suyo, así que los trabajos del planificador que corren en hilos del
+    mismo proceso no suman los guardados de los demás.
+    """
+    segundos = 0.0
+
+
+tiempo_guardado = _TiempoGuardado()
+
+
+def memoria_proceso():
+    """
+    Devuelve (memoria actual, memoria pico) del proceso en bytes; cualquiera de las dos
+    es None si el sistema no permite medirla.
+    """
+    if sys.platform == 'win32':
+        import ctypes
+        from ctypes import wintypes
+
+        class ContadoresMemoria(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                        ('PeakWorkingSetSize', ctypes.c_size_t),
+                        ('WorkingSetSize', ctypes.c_size_t),
+                        ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                        ('PagefileUsage', ctypes.c_size_t),
+                        ('PeakPagefileUsage', ctypes.c_size_t)]
+
+        contadores = ContadoresMemoria()
+        contadores.cb = ctypes.sizeof(contadores)
+        proceso = ctypes.windll.kernel32.GetCurrentProcess()
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(
+                proceso, ctypes.byref(contadores), contadores.cb):
+            return None, None
+        return contadores.WorkingSetSize, contadores.PeakWorkingSetSize
+
+    import resource
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss está en bytes en macOS y en kilobytes en Linux
+    pico = pico if sys.platform == 'darwin' else pico * 1024
+    try:
+        with open('/proc/self/statm') as f:
+            actual = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        actual = None
+    return actual, pico
+
+
+def _mb(n_bytes):
+    """
+    Convierte bytes a megabytes con un decimal.
+    """
+    return None if n_bytes is None else round(n_bytes / 2 ** 20, 1)
+
+
+class Medicion:
+    """
+    Instrumentación de una ejecución: tiempo, número de veces y memoria pico de cada
+    etapa, contadores, tiempo de cada reporte individual y de cada proceso, y
+    opcionalmente un perfil de cProfile o de tracemalloc (`perfil`).
+
+    La memoria se muestrea en un hilo cada `intervalo_memoria` segundos y se asigna a
+    la etapa en curso. El perfil solo cubre el proceso principal; para incluir la
+    escritura de reportes, usar un solo proceso.
+    """
+
+    def __init__(self, perfil=None, intervalo_memoria=0.2):
+        if perfil not in (None, 'cprofile', 'tracemalloc'):
+            raise ValueError(f"Perfil desconocido: {perfil}")
+        self.perfil = perfil
+        self.intervalo_memoria = intervalo_memoria
+        self.etapas = {}
+        self.contadores = {}
+        self.reportes = []
+        self.procesos = {}
+        self.etapa_actual = None
+        self.memoria_pico = 0
+        self.muestras = 0
+        self._detener = threading.Event()
+        self._perfilador = None
+
+    def iniciar(self):
+        """
+        Empieza a medir: arranca el muestreo de memoria y el perfil, si se pidió.
+        """
+        self.inicio = time.perf_counter()
+        self.fecha = datetime.now().replace(microsecond=0)
+        self._hilo = threading.Thread(target=self._muestrear, daemon=True)
+        self._hilo.start()
+        if self.perfil == 'cprofile':
+            import cProfile
+            self._perfilador = cProfile.Profile()
+            self._perfilador.enable()
+        elif self.perfil == 'tracemalloc':
+            import tracemalloc
+            tracemalloc.start(10)
+
+    def detener(self):
+        """
+        Deja de medir y guarda el tiempo total.
+        """
+        self.total = time.perf_counter() - self.inicio
+        self._detener.set()
+        self._hilo.join()
+        if self.perfil == 'cprofile':
+            self._perfilador.disable()
+        elif self.perfil == 'tracemalloc':
+            import tracemalloc
+            self._instantanea = tracemalloc.take_snapshot()
+            self._memoria_rastreada = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    def _muestrear(self):
+        """
+        Toma muestras de memoria hasta que se llama `detener` (en un hilo aparte).
+        """
+        while True:
+            actual, pico = memoria_proceso()
+            memoria = actual or pico or 0
+            self.memoria_pico = max(self.memoria_pico, memoria, pico or 0)
+            self.muestras += 1
+            etapa = self.etapas.get(self.etapa_actual)
+            if etapa is not None:
+                etapa['memoria_pico'] = max(etapa['memoria_pico'], memoria)
+            if self._detener.wait(self.intervalo_memoria):
+                break
+
+    @contextmanager
+    def etapa(self, nombre):
+        """
+        Acumula el tiempo del bloque `with` en la etapa `nombre`.
+        """
+        etapa = self.etapas.setdefault(nombre, {'segundos': 0.0, 'veces': 0, 'memoria_pico': 0})
+        anterior, self.etapa_actual = self.etapa_actual, nombre
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            etapa['segundos'] += time.perf_counter() - inicio
+            etapa['veces'] += 1
+            # Una muestra al terminar, para las etapas más cortas que el intervalo
+            actual, pico = memoria_proceso()
+            etapa['memoria_pico'] = max(etapa['memoria_pico'], actual or pico or 0)
+            self.etapa_actual = anterior
+
+    def contar(self, nombre, cantidad=1):
+        """
+        Suma `cantidad` al contador `nombre`.
+        """
+        self.contadores[nombre] = self.contadores.get(nombre, 0) + cantidad
+
+    def registrar_reporte(self, nombre, segundos, segundos_guardado, proceso, memoria_pico):
+        """
+        Registra el tiempo de un reporte individual y el proceso que lo escribió.
+        """
+        self.reportes.append((segundos, segundos_guardado, str(nombre)))
+        datos = self.procesos.setdefault(
+            proceso, {'reportes': 0, 'segundos': 0.0, 'memoria_pico': 0})
+        datos['reportes'] += 1
+        datos['segundos'] += segundos
+        datos['memoria_pico'] = max(datos['memoria_pico'], memoria_pico or 0)
+
+    def tiempos(self):
+        """
+        Segundos de cada etapa y el total, redondeados.
+        """
+        total = getattr(self, 'total', time.perf_counter() - self.inicio)
+        return {**{nombre: round(etapa['segundos'], 3) for nombre, etapa in self.etapas.items()},
+                'total': round(total, 3)}
+
+    def _resumen_reportes(self):
+        if not self.reportes:
+            return {'cantidad': 0}
+        segundos = np.array([r[0] for r in self.reportes])
+        guardado = float(sum(r[1] for r in self.reportes))
+        return {
+            'cantidad': len(self.reportes),
+            'segundos_total': round(float(segundos.sum()), 3),
+            'segundos_guardado': round(guardado, 3),
+            'segundos_promedio': round(float(segundos.mean()), 4),
+            'segundos_p50': round(float(np.percentile(segundos, 50)), 4),
+            'segundos_p95': round(float(np.percentile(segundos, 95)), 4),
+            'segundos_max': round(float(segundos.max()), 4),
+            'mas_lentos': [{'nombre': nombre, 'segundos': round(s, 4)}
+                           for s, _, nombre in sorted(self.reportes, reverse=True)[:10]],
+        }
+
+    def _resumen_perfil(self, carpeta_destino):
+        if self.perfil == 'cprofile':
+            import pstats
+            archivo = os.path.join(carpeta_destino, 'perfil_ejecucion.prof')
+            self._perfilador.dump_stats(archivo)
+            estadisticas = pstats.Stats(self._perfilador).stats
+            funciones = sorted(estadisticas.items(), key=lambda e: e[1][3], reverse=True)[:30]
+            return {'tipo': 'cprofile', 'archivo': archivo, 'funciones': [
+                {'funcion': f"{os.path.basename(archivo_fuente)}:{linea}({nombre})",
+                 'llamadas': llamadas, 'segundos_propios': round(propio, 4),
+                 'segundos_acumulados': round(acumulado, 4)}
+                for (archivo_fuente, linea, nombre), (_, llamadas, propio, acumulado, _)
+                in funciones]}
+        if self.perfil == 'tracemalloc':
+            return {'tipo': 'tracemalloc', 'pico_mb': _mb(self._memoria_rastreada), 'lineas': [
+                {'lugar': str(estadistica.traceback[0]), 'kb': round(estadistica.size / 1024, 1),
+                 'bloques': estadistica.count}
+                for estadistica in self._instantanea.statistics('lineno')[:30]]}
+        return None
+
+    def escribir(self, carpeta_destino, **datos):
+        """
+        Escribe el reporte de ejecución en JSON en `carpeta_destino` y devuelve su ruta.
+        `datos` se agrega al reporte (estado, parámetros, errores, etc.).
+        """
+        from openpyxl import __version__ as openpyxl_version
+        reporte = {
+            'fecha': self.fecha.isoformat(),
+            **datos,
+            'entorno': {'python': sys.version.split()[0], 'plataforma': sys.platform,
+                        'pandas': pd.__version__, 'numpy': np.__version__,
+                        'openpyxl': openpyxl_version, 'nucleos': os.cpu_count(),
+                        'ejecutable': getattr(sys, 'frozen', False),
+                        'arranque_s': dict(tiempos_arranque)},
+            'tiempos': self.tiempos(),
+            'etapas': {nombre: {'segundos': round(etapa['segundos'], 3), 'veces': etapa['veces'],
+                                'memoria_pico_mb': _mb(etapa['memoria_pico'])}
+                       for nombre, etapa in self.etapas.items()},
+            'contadores': self.contadores,
+            'reportes_individuales': self._resumen_reportes(),
+            'procesos': {str(proceso): {'reportes': d['reportes'],
+                                        'segundos': round(d['segundos'], 3),
+                                        'memoria_pico_mb': _mb(d['memoria_pico'])}
+                         for proceso, d in self.procesos.items()},
+            'memoria': {'pico_mb': _mb(self.memoria_pico), 'muestras': self.muestras},
+            'perfil': self._resumen_perfil(carpeta_destino),
+        }
+        os.makedirs(carpeta_destino, exist_ok=True)
+        archivo = os.path.join(carpeta_destino, nombre_reporte_ejecucion)
+        guardar_json(archivo, reporte)
+        return archivo
+
+
+def procesar_archivo(archivo_excel, carpeta_destino, sheet_name='Respuestas de formulario 1',
+                     tamano_bloque=5000, procesos=None, backend='plantilla',
+                     al_completar=None, incremental=False, cancelar=None,
+                     cuestionario=None, modo_salida='archivos', columnas_grupo=(),
+                     columna_area=None, carpeta_historico=None, empresa=None,
+                     fecha_evaluacion=None, perfil=None, executor=None):
+    """
+    Lee las respuestas por bloques de `tamano_bloque` filas, calcula las puntuaciones y
+    genera el archivo general, los reportes individuales y `reporte_ejecucion.json` en
+    `carpeta_destino` (ver "Uso en modo consola" en el README para cada opción).
+    Devuelve un diccionario con los resultados generales, las rutas generadas, los
+    errores, las respuestas corregidas y sin resolver, y el tiempo de cada etapa.
+    """
+    if modo_salida not in ('archivos', 'zip'):
+        raise ValueError(f"Modo de salida desconocido: {modo_salida}")
+    if modo_salida == 'zip' and incremental:
+        raise ValueError("El modo incremental requiere modo_salida='archivos'")
+    if carpeta_historico and incremental:
+        raise ValueError("El histórico no se puede guardar en modo incremental")
+
+    medicion = Medicion(perfil)
+    medicion.iniciar()
+    inicio = time.perf_counter()
+    fecha = medicion.fecha
+    resumen = {'generados': [], 'errores': [], 'cancelado': False,
+               'respuestas': {'corregidas': {}, 'no_resueltas': {}}}
+    estado, error = 'error', None
+    try:
+        if tamano_bloque:
+            bloques = leer_respuestas_por_bloques(
+                archivo_excel, tamano_bloque=tamano_bloque, sheet_name=sheet_name)
+        else:
+            with medicion.etapa('lectura'):
+                bloques = [leer_respuestas(archivo_excel, sheet_name=sheet_name)]
+
+        # Crear carpeta para archivos individuales dentro de la carpeta destino
+        carpeta_individuales = os.path.join(
+            carpeta_destino, "resultados_individuales")
+        archivo_zip = None
+        if modo_salida == 'zip':
+            # Se escribe en un archivo temporal y se renombra solo si el proceso termina
+            ruta_zip = os.path.join(carpeta_destino, nombre_zip_reportes)
+            os.makedirs(carpeta_destino, exist_ok=True)
+            archivo_zip = abrir_zip_reportes(ruta_zip + '.tmp', fecha)
+        else:
+            os.makedirs(carpeta_individuales, exist_ok=True)
+
+        historico = None
+        if carpeta_historico:
+            from historico import EscritorHistorico
+            historico = EscritorHistorico(
+                carpeta_historico,
+                empresa or os.path.splitext(os.path.basename(archivo_excel))[0],
+                fecha_evaluacion or fecha)
+
+        procesos = procesos or os.cpu_count() or 1
+        executor_propio = executor is None and procesos > 1
+        if executor_propio:
+            executor = ProcessPoolExecutor(max_workers=procesos)
+
+        gestor = GestorSalida(carpeta_individuales, extensiones_reporte.get(backend, '.xlsx'))
+        # Temporales de reportes de una ejecución anterior que se interrumpió
+        temporales = gestor.limpiar_temporales() if modo_salida == 'archivos' else 0
+        if temporales:
+            medicion.contar('temporales_borrados', temporales)
+        indice = []
+
+        if incremental:
+            manifiesto = cargar_manifiesto(carpeta_destino)
+            trabajadores = manifiesto['trabajadores']
+            # Con otra guía u otra versión del cálculo (o un manifiesto anterior que no la
+            # registra) ningún resultado guardado sirve: todos se vuelven a generar, pero
+            # se conservan sus archivos para borrar los de trabajadores que ya no están
+            puntuacion = huella_puntuacion(cuestionario)
+            if manifiesto.get('puntuacion') != puntuacion:
+                for trabajador in trabajadores.values():
+                    trabajador['huella'] = None
+                manifiesto['puntuacion'] = puntuacion
+            conteos = {'nuevos': 0, 'modificados': 0, 'sin_cambios': 0, 'eliminados': 0}
+            orden = []
+            # Reportes anteriores que se reemplazaron por uno con otro nombre (otro backend)
+            reemplazados = set()
+
+        columnas_formulario = list(dict.fromkeys(
+            [*columnas_grupo, *([columna_area] if columna_area else [])]))
+
+        resultados_bloques = []
+        bloques = iter(bloques)
+        try:
+            while True:
+                with medicion.etapa('lectura'):
+                    df = next(bloques, None)
+                if df is None or (cancelar is not None and cancelar.is_set()):
+                    break
+                medicion.contar('bloques')
+                medicion.contar('filas_leidas', len(df))
+                if columnas_formulario:
+                    df = df.assign(**columnas_de_grupo(df, columnas_grupo, columna_area))
+                # Clave y archivo únicos de cada trabajador (ver GestorSalida)
+                asignados = [gestor.asignar(nombre)
+                             for nombre in df['Nombre Completo del trabajador']]
+
+                if incremental:
+                    # Solo se procesan los trabajadores nuevos o con respuestas distintas
+                    huellas = huellas_respuestas(df, cuestionario, columnas_formulario)
+                    pendientes = []
+                    for k, ((clave, archivo), huella) in enumerate(zip(asignados, huellas)):
+                        orden.append(clave)
+                        previo = trabajadores.get(clave)
+                        # (si cambió el backend, el archivo esperado es otro y se regenera)
+                        if (previo and previo['huella'] == huella
+                                and previo['archivo'] == os.path.relpath(archivo, carpeta_destino)
+                                and os.path.exists(archivo)):
+                            conteos['sin_cambios'] += 1
+                            continue
+                        conteos['nuevos' if previo is None else 'modificados'] += 1
+                        pendientes.append(k)
+                    df = df.iloc[pendientes].reset_index(drop=True)
+                    huellas = [huellas[k] for k in pendientes]
+                    asignados = [asignados[k] for k in pendientes]
+
+                with medicion.etapa('puntuacion'):
+                    resultados, detalles_preguntas = calcular_puntuaciones(
+                        df, cuestionario, registro_respuestas=resumen['respuestas'])
+                if resultados.empty:
+                    continue
+                medicion.contar('trabajadores_puntuados', len(resultados))
+                for k, columna in enumerate(columnas_formulario, start=1):
+                    resultados.insert(k, columna, df[columna].to_numpy())
+                if historico is not None:
+                    with medicion.etapa('historico'):
+                        historico.agregar(resultados, detalles_preguntas)
+
+                with medicion.etapa('reportes'):
+                    resumen_bloque = generar_reportes_individuales(
+                        resultados, detalles_preguntas, carpeta_individuales,
+                        area_adscrita="Área por definir", procesos=procesos, fecha=fecha,
+                        al_completar=al_completar, backend=backend, executor=executor,
+                        cancelar=cancelar, cuestionario=cuestionario, archivo_zip=archivo_zip,
+                        columna_area=columna_area, medicion=medicion,
+                        archivos=[archivo for _, archivo in asignados])
+                resumen['generados'].extend(resumen_bloque['generados'])
+                resumen['errores'].extend(resumen_bloque['errores'])
+
+                fallidos = {e['archivo'] for e in resumen_bloque['errores']}
+                if incremental:
+                    for row, huella, (clave, archivo) in zip(
+                            resultados.to_dict('records'), huellas, asignados):
+                        anterior = trabajadores.get(clave, {}).get('archivo')
+                        if anterior and archivo not in fallidos and anterior != os.path.relpath(
+                                archivo, carpeta_destino):
+                            reemplazados.add(anterior)
+                        trabajadores[clave] = {
+                            'huella': huella,
+                            # Sin archivo, el reporte se vuelve a intentar en la siguiente ejecución
+                            'archivo': (None if archivo in fallidos
+                                        else os.path.relpath(archivo, carpeta_destino)),
+                            'resultado': row,
+                        }
+                else:
+                    resultados_bloques.append(resultados)
+                    indice.extend(
+                        (nombre, os.path.relpath(archivo, carpeta_destino)
+                         if archivo_zip is None else os.path.basename(archivo),
+                         archivo not in fallidos)
+                        for nombre, (_, archivo) in zip(resultados['Nombre'], asignados))
+        except BaseException:
+            if historico is not None:
+                historico.descartar()
+            raise
+        finally:
+            if executor_propio:
+                executor.shutdown(cancel_futures=True)
+            if archivo_zip is not None:
+                archivo_zip.close()
+
+        resumen['cancelado'] = cancelar is not None and cancelar.is_set()
+        if historico is not None:
+            if resumen['cancelado']:
+                historico.descartar()
+            else:
+                historico.cerrar()
+        if archivo_zip is not None:
+            if resumen['cancelado']:
+                os.remove(archivo_zip.filename)
+            else:
+                os.replace(archivo_zip.filename, ruta_zip)
+                resumen['archivo_zip'] = ruta_zip
+        if resumen['cancelado']:
+            if incremental:
+                # Los reportes ya generados quedan registrados para la siguiente ejecución
+                guardar_manifiesto(carpeta_destino, manifiesto)
+            estado = 'cancelado'
+            return resumen
+
+        if incremental:
+            # Borrar los reportes de los trabajadores que ya no están en el archivo
+            presentes = set(orden)
+            en_uso = {trabajadores[clave]['archivo'] for clave in presentes}
+            for clave in [c for c in trabajadores if c not in presentes]:
+                archivo = trabajadores.pop(clave)['archivo']
+                if (archivo and archivo not in en_uso
+                        and os.path.exists(os.path.join(carpeta_destino, archivo))):
+                    os.remove(os.path.join(carpeta_destino, archivo))
+                conteos['eliminados'] += 1
+            for archivo in reemplazados - en_uso:
+                if os.path.exists(os.path.join(carpeta_destino, archivo)):
+                    os.remove(os.path.join(carpeta_destino, archivo))
+            claves = list(dict.fromkeys(orden))
+            resultados_bloques.append(pd.DataFrame(
+                [trabajadores[clave]['resultado'] for clave in claves]))
+            indice = [(trabajadores[clave]['resultado']['Nombre'],
+                       trabajadores[clave]['archivo'] or os.path.relpath(
+                           gestor.asignados[clave], carpeta_destino),
+                       trabajadores[clave]['archivo'] is not None)
+                      for clave in claves]
+
+        resultados = (pd.concat(resultados_bloques, ignore_index=True)
+                      if resultados_bloques else pd.DataFrame())
+
+        with medicion.etapa('agregados'):
+            agregados = (agregar_resultados(resultados, columnas_grupo, cuestionario)
+                         if not resultados.empty else {})
+
+        # Guardar archivo general con todos los resultados, una hoja por cada agregado y
+        # el índice de reportes individuales
+        archivo_general = os.path.join(
+            carpeta_destino, 'resultados_evaluacion_psicosocial.xlsx')
+        with medicion.etapa('archivo_general'):
+            guardar_archivo_general(archivo_general, resultados, agregados, indice,
+                                    enlaces=archivo_zip is None)
+
+        if incremental:
+            conteos['errores'] = len(resumen['errores'])
+            manifiesto['ejecuciones'] = manifiesto['ejecuciones'][-99:] + [{
+                'fecha': fecha.isoformat(),
+                'archivo_excel': os.path.abspath(archivo_excel),
+                'duracion_s': round(time.perf_counter() - inicio, 3),
+                'trabajadores': len(trabajadores),
+                **conteos,
+            }]
+            guardar_manifiesto(carpeta_destino, manifiesto)
+            resumen['incremental'] = conteos
+
+        resumen['resultados'] = resultados
+        resumen['agregados'] = agregados
+        resumen['archivo_general'] = archivo_general
+        resumen['indice'] = indice
+        estado = 'completado'
+        return resumen
+    except BaseException:
+        error = traceback.format_exc()
+        raise
+    finally:
+        # El reporte de ejecución se escribe siempre, también si el proceso falla
+        medicion.detener()
+        resumen['tiempos'] = medicion.tiempos()
+        resumen['reporte_ejecucion'] = medicion.escribir(
+            carpeta_destino, estado=estado, error=error,
+            archivo_excel=os.path.abspath(archivo_excel),
+            parametros={'hoja': sheet_name, 'tamano_bloque': tamano_bloque,
+                        'procesos': procesos, 'backend': backend,
+                        'incremental': incremental, 'modo_salida': modo_salida,
+                        'columnas_grupo': list(columnas_grupo), 'columna_area': columna_area,
+                        'historico': carpeta_historico, 'perfil': perfil,
+                        'guia': (cuestionario or cuestionario_guia_ii).nombre},
+            trabajadores=len(resumen.get('resultados', ())),
+            generados=len(resumen['generados']),
+            errores=resumen['errores'],
+            respuestas_corregidas=resumen['respuestas']['corregidas'],
+            respuestas_no_resueltas=resumen['respuestas']['no_resueltas'],
+            incremental=resumen.get('incremental'))
+
+
 def main():
     """
     Función principal: pide al usuario seleccionar el archivo de entrada y la carpeta de salida,
     procesa los datos y genera los reportes.
     """
+    from tkinter import Tk, filedialog
+
     try:
         # Seleccionar archivo Excel de entrada
-        root = tk.Tk()
+        root = Tk()
         root.withdraw()
         archivo_excel = filedialog.askopenfilename(
             title="Selecciona el archivo Excel a evaluar",
@@ -364,60 +2453,202 @@ def main():
             print("No se seleccionó ninguna carpeta de destino.")
             return
 
-        # Leer datos de entrada
-        df = pd.read_excel(
-            archivo_excel, sheet_name='Respuestas de formulario 1')
-        df.columns = [col.split('.')[0] if '.' in str(
-            col) else col for col in df.columns]
+        def al_completar(nombre, archivo, error):
+            if error is None:
+                print(f"Reporte creado para: {nombre}")
 
-        # Calcular puntuaciones y detalles
-        resultados, detalles_preguntas = calcular_puntuaciones(df)
+        # Leer datos, calcular puntuaciones y generar los reportes (en paralelo)
+        resumen = procesar_archivo(
+            archivo_excel, carpeta_destino, al_completar=al_completar)
+        resultados = resumen['resultados']
 
         print("\nResultados de la evaluación de riesgos psicosociales:")
         print(resultados[['Nombre', 'Puntuación Total', 'Nivel de Riesgo']])
 
-        # Guardar archivo general con todos los resultados
-        archivo_general = os.path.join(
-            carpeta_destino, 'resultados_evaluacion_psicosocial.xlsx')
-        resultados.to_excel(archivo_general, index=False)
+        print(f"\nReportes generados: {len(resumen['generados'])}")
+        for error in resumen['errores']:
+            print(f"Error al crear el reporte de {error['nombre']}: {error['error']}")
+        for valor, n in resumen['respuestas']['no_resueltas'].items():
+            print(f"Respuesta no reconocida (puntúa 0): {valor!r} ({n} veces)")
+        print(f"Reporte de ejecución: {resumen['reporte_ejecucion']}")
 
-        # Crear carpeta para archivos individuales dentro de la carpeta destino
-        carpeta_individuales = os.path.join(
-            carpeta_destino, "resultados_individuales")
-        os.makedirs(carpeta_individuales, exist_ok=True)
+    except Exception as e:
+        print(f"Error al procesar los datos: {str(e)}")
+
+
+def emitir_evento(evento, **datos):
+    """
+    Imprime un evento como una línea JSON en la salida estándar.
+    """
+    print(json.dumps({'evento': evento, **datos}, ensure_ascii=False, default=str), flush=True)
 
-        # Crear reportes individuales para cada trabajador
-        for idx, row in resultados.iterrows():
-            nombre = row['Nombre']
-            detalles = detalles_preguntas.iloc[idx]
 
-            # Crear reporte individual
-            wb = crear_reporte_individual(
-                row, detalles, area_adscrita="Área por definir")
+def expandir_entradas(entradas):
+    """
+    Archivos de `entradas` (rutas o patrones glob), sin repetir y en orden.
+    """
+    archivos = []
+    for entrada in entradas:
+        coincidencias = sorted(glob.glob(entrada)) if glob.has_magic(entrada) else [entrada]
+        archivos.extend(a for a in coincidencias if a not in archivos)
+    return archivos
 
-            # Guardar archivo
-            archivo_individual = os.path.join(
-                carpeta_individuales, f"Reporte_{nombre.replace(' ', '_')}.xlsx")
-            wb.save(archivo_individual)
-            print(f"Reporte creado para: {nombre}")
 
-    except Exception as e:
-        print(f"Error al procesar los datos: {str(e)}")
+def ejecutar_desde_consola(argv=None):
+    """
+    Punto de entrada sin interfaz gráfica, para ejecuciones programadas en servidores.
+
+    Procesa uno o varios archivos (o patrones glob) e imprime el avance como líneas JSON
+    en la salida estándar. Devuelve 0 si todo se generó, 1 si algún archivo o reporte
+    falló y 2 si los argumentos no son válidos.
+    """
+    parser = argparse.ArgumentParser(
+        prog="main.py",
+        description="Evalúa riesgos psicosociales y genera los reportes sin interfaz gráfica.")
+    parser.add_argument("entradas", nargs="+",
+                        help="archivos Excel de respuestas o patrones glob (p. ej. 'clientes/*.xlsx')")
+    parser.add_argument("-o", "--salida", required=True,
+                        help="carpeta de destino; con varios archivos se crea una subcarpeta por archivo")
+    parser.add_argument("--hoja", default='Respuestas de formulario 1',
+                        help="nombre de la hoja de respuestas")
+    parser.add_argument("--procesos", type=int, default=None,
+                        help="procesos para generar reportes (por defecto, uno por núcleo)")
+    parser.add_argument("--tamano-bloque", type=int, default=5000,
+                        help="filas leídas por bloque (la memoria depende del bloque y no "
+                             "del archivo); 0 lee la hoja completa")
+    parser.add_argument("--backend", choices=sorted(backends_reporte), default='plantilla',
+                        help="forma de escribir los reportes individuales")
+    parser.add_argument("--incremental", action="store_true",
+                        help="solo procesar trabajadores nuevos o con respuestas distintas "
+                             "y borrar los reportes de los que ya no aparecen")
+    parser.add_argument("--guia", default=None,
+                        help="archivo JSON de la guía de referencia (por defecto, la Guía II)")
+    parser.add_argument("--modo-salida", choices=['archivos', 'zip'], default='archivos',
+                        help="reportes individuales como archivos sueltos o en un solo .zip")
+    parser.add_argument("--agrupar", nargs="+", default=[], metavar="COLUMNA",
+                        help="columnas del formulario para los resultados por grupo, de la más "
+                             "general a la más detallada (p. ej. 'Centro de trabajo' 'Área'); "
+                             "'Periodo' usa el año y mes de la marca temporal")
+    parser.add_argument("--columna-area", default=None,
+                        help="columna del formulario con el área adscrita de cada trabajador")
+    parser.add_argument("--historico", default=None, metavar="CARPETA",
+                        help="guardar también los resultados en un histórico Parquet (requiere pyarrow)")
+    parser.add_argument("--empresa", default=None,
+                        help="empresa de la partición del histórico (por defecto, el nombre del archivo)")
+    parser.add_argument("--perfil", choices=['cprofile', 'tracemalloc'], default=None,
+                        help="agregar al reporte de ejecución un perfil de tiempo o de memoria")
+    parser.add_argument("--fecha-evaluacion", default=None, metavar="AAAA-MM-DD",
+                        type=lambda texto: datetime.strptime(texto, "%Y-%m-%d"),
+                        help="fecha de la evaluación en el histórico (por defecto, hoy)")
+    args = parser.parse_args(argv)
+    if args.incremental and args.modo_salida == 'zip':
+        parser.error("--incremental no se puede combinar con --modo-salida zip")
+    if args.incremental and args.historico:
+        parser.error("--incremental no se puede combinar con --historico")
+    if args.historico:
+        # El ejecutable se genera sin pyarrow (ver main.spec)
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            parser.error("--historico requiere pyarrow (pip install pyarrow), que no está "
+                         "instalado o no se incluye en el ejecutable")
+
+    emitir = emitir_evento
+    archivos = expandir_entradas(args.entradas)
+    faltantes = [a for a in archivos if not os.path.isfile(a)]
+    if not archivos or faltantes:
+        emitir('error', mensaje="No se encontraron los archivos de entrada",
+               entradas=faltantes or args.entradas)
+        return 2
+
+    cuestionario = None
+    if args.guia:
+        try:
+            cuestionario = Cuestionario.desde_json(args.guia)
+        except Exception as e:
+            emitir('error', mensaje="No se pudo cargar la guía de referencia", error=str(e))
+            return 2
+
+    codigo = 0
+    for archivo_excel in archivos:
+        carpeta_destino = args.salida
+        if len(archivos) > 1:
+            carpeta_destino = os.path.join(
+                args.salida, os.path.splitext(os.path.basename(archivo_excel))[0])
+        os.makedirs(carpeta_destino, exist_ok=True)
+        emitir('inicio', archivo=archivo_excel, salida=carpeta_destino)
+
+        avance = {'completados': 0, 'errores': 0, 'ultimo': time.perf_counter()}
+
+        def al_completar(nombre, archivo, error):
+            avance['completados'] += 1
+            if error is not None:
+                avance['errores'] += 1
+                emitir('error_reporte', archivo=archivo_excel, trabajador=nombre, error=error)
+            # Como máximo una línea de avance por segundo
+            if time.perf_counter() - avance['ultimo'] >= 1:
+                avance['ultimo'] = time.perf_counter()
+                emitir('progreso', archivo=archivo_excel,
+                       completados=avance['completados'], errores=avance['errores'])
+
+        try:
+            resumen = procesar_archivo(
+                archivo_excel, carpeta_destino, sheet_name=args.hoja,
+                tamano_bloque=args.tamano_bloque or None, procesos=args.procesos,
+                backend=args.backend, al_completar=al_completar,
+                incremental=args.incremental, cuestionario=cuestionario,
+                modo_salida=args.modo_salida, columnas_grupo=args.agrupar,
+                columna_area=args.columna_area, carpeta_historico=args.historico,
+                empresa=args.empresa, fecha_evaluacion=args.fecha_evaluacion,
+                perfil=args.perfil)
+        except Exception as e:
+            emitir('fallo', archivo=archivo_excel, error=str(e))
+            codigo = 1
+            continue
+
+        if resumen['errores']:
+            codigo = 1
+        emitir('fin', archivo=archivo_excel,
+               trabajadores=len(resumen['resultados']),
+               generados=len(resumen['generados']),
+               errores=len(resumen['errores']),
+               incremental=resumen.get('incremental'),
+               archivo_zip=resumen.get('archivo_zip'),
+               respuestas_no_resueltas=resumen['respuestas']['no_resueltas'],
+               reporte_ejecucion=resumen['reporte_ejecucion'],
+               tiempos=resumen['tiempos'])
+
+    return codigo
 
 
 class App:
     """
     Clase principal de la interfaz gráfica.
     Permite seleccionar archivo, carpeta y procesar los reportes.
+
+    La lectura de la vista previa y el procesamiento se ejecutan en hilos secundarios;
+    estos envían sus avances por una cola que la ventana revisa con `root.after`,
+    de modo que la interfaz sigue respondiendo mientras se generan los reportes.
+
+    tkinter se importa al crear la ventana y no al cargar el módulo, para que el modo
+    consola, el servicio y el planificador funcionen sin él.
     """
 
     def __init__(self, root):
+        from tkinter import (Label, Button, StringVar, Frame, Text, Scrollbar, RIGHT, Y,
+                             BooleanVar, Checkbutton, Entry, ttk)
+
         self.root = root
         self.root.title("Evaluador de Riesgos Psicosociales")
-        self.root.geometry("700x500")
+        self.root.geometry("700x680")
         self.archivo_excel = None
         self.carpeta_destino = None
 
+        # Comunicación con los hilos de trabajo
+        self.cola = queue.Queue()
+        self.evento_cancelar = threading.Event()
+        self.hilo = None
+
         # Etiquetas y botones de la interfaz
         Label(root, text="Evaluador de Riesgos Psicosociales",
               font=("Arial", 16, "bold")).pack(pady=10)
@@ -432,8 +2663,38 @@ class App:
         Button(root, text="Seleccionar carpeta de destino",
                command=self.seleccionar_carpeta).pack(pady=5)
 
-        Button(root, text="Procesar y generar reportes",
-               command=self.procesar, bg="#4F81BD", fg="white").pack(pady=20)
+        # Modo incremental: solo reprocesa trabajadores nuevos o con respuestas distintas
+        self.incremental = BooleanVar(value=False)
+        Checkbutton(root, text="Solo procesar cambios desde la última ejecución",
+                    variable=self.incremental).pack(pady=5)
+        # Reunir los reportes individuales en un solo archivo zip
+        self.salida_zip = BooleanVar(value=False)
+        Checkbutton(root, text="Reunir los reportes individuales en un archivo .zip",
+                    variable=self.salida_zip).pack(pady=5)
+
+        # Columnas del formulario para el área adscrita y los resultados por grupo
+        marco_grupos = Frame(root)
+        marco_grupos.pack(pady=5)
+        self.columna_area = StringVar()
+        self.columnas_grupo = StringVar()
+        Label(marco_grupos, text="Columna del área:").grid(row=0, column=0, sticky='e')
+        Entry(marco_grupos, textvariable=self.columna_area, width=40).grid(row=0, column=1)
+        Label(marco_grupos, text="Agrupar por (separadas por comas):").grid(
+            row=1, column=0, sticky='e')
+        Entry(marco_grupos, textvariable=self.columnas_grupo, width=40).grid(row=1, column=1)
+
+        self.boton_procesar = Button(root, text="Procesar y generar reportes",
+                                     command=self.procesar, bg="#4F81BD", fg="white")
+        self.boton_procesar.pack(pady=10)
+
+        # Avance del procesamiento: barra, trabajadores, velocidad y tiempo restante
+        self.barra_avance = ttk.Progressbar(root, length=500, mode='determinate')
+        self.barra_avance.pack(pady=5)
+        self.label_avance = Label(root, text="")
+        self.label_avance.pack()
+        self.boton_cancelar = Button(root, text="Cancelar", command=self.cancelar,
+                                     state='disabled')
+        self.boton_cancelar.pack(pady=5)
 
         # Área de texto para la vista previa del archivo
         self.text_preview = Text(root, height=10, width=80, wrap="none")
@@ -444,10 +2705,23 @@ class App:
         scrollbar.pack(side=RIGHT, fill=Y)
         self.text_preview['yscrollcommand'] = scrollbar.set
 
+        self.root.protocol("WM_DELETE_WINDOW", self.cerrar)
+        self.root.after(100, self.revisar_cola)
+        self.root.after(0, self.ventana_visible)
+
+    def ventana_visible(self):
+        """
+        Registra el tiempo de arranque y carga pandas y openpyxl en segundo plano.
+        """
+        tiempos_arranque.setdefault('ventana', round(time.perf_counter() - inicio_arranque, 3))
+        threading.Thread(target=precargar_bibliotecas, daemon=True).start()
+
     def seleccionar_archivo(self):
         """
         Permite al usuario seleccionar el archivo Excel de entrada y muestra una vista previa.
         """
+        from tkinter import filedialog
+
         archivo = filedialog.askopenfilename(
             title="Selecciona el archivo Excel a evaluar",
             filetypes=[("Archivos Excel", "*.xlsx *.xls")]
@@ -456,25 +2730,39 @@ class App:
             self.archivo_excel = archivo
             self.label_archivo.config(
                 text=f"Archivo Excel: {os.path.basename(archivo)}")
-            # Mostrar vista previa
-            try:
-                df = pd.read_excel(archivo)
-                preview = df.head(5).to_string(index=False)
-                self.text_preview.config(state='normal')
-                self.text_preview.delete(1.0, END)
-                self.text_preview.insert(END, preview)
-                self.text_preview.config(state='disabled')
-            except Exception as e:
-                self.text_preview.config(state='normal')
-                self.text_preview.delete(1.0, END)
-                self.text_preview.insert(
-                    END, f"Error al leer el archivo: {str(e)}")
-                self.text_preview.config(state='disabled')
+            # Mostrar vista previa (se lee en segundo plano)
+            self.mostrar_vista_previa("Cargando vista previa...")
+            threading.Thread(target=self._leer_vista_previa, args=(archivo,),
+                             daemon=True).start()
+
+    def _leer_vista_previa(self, archivo):
+        """
+        Lee solo las primeras filas del archivo (en un hilo secundario).
+        """
+        try:
+            df = pd.read_excel(archivo, nrows=5)
+            texto = df.to_string(index=False)
+        except Exception as e:
+            texto = f"Error al leer el archivo: {str(e)}"
+        self.cola.put(('vista_previa', archivo, texto))
+
+    def mostrar_vista_previa(self, texto):
+        """
+        Reemplaza el contenido del área de vista previa.
+        """
+        from tkinter import END
+
+        self.text_preview.config(state='normal')
+        self.text_preview.delete(1.0, END)
+        self.text_preview.insert(END, texto)
+        self.text_preview.config(state='disabled')
 
     def seleccionar_carpeta(self):
         """
         Permite al usuario seleccionar la carpeta de destino.
         """
+        from tkinter import filedialog
+
         carpeta = filedialog.askdirectory(
             title="Selecciona la carpeta de destino")
         if carpeta:
@@ -483,43 +2771,184 @@ class App:
 
     def procesar(self):
         """
-        Procesa el archivo seleccionado y genera los reportes.
+        Inicia el procesamiento del archivo seleccionado en un hilo secundario.
         """
+        from tkinter import messagebox
+
         if not self.archivo_excel or not self.carpeta_destino:
             messagebox.showerror(
                 "Error", "Debes seleccionar el archivo y la carpeta de destino.")
             return
+        if self.hilo is not None and self.hilo.is_alive():
+            return
+        if self.incremental.get() and self.salida_zip.get():
+            messagebox.showerror(
+                "Error", "El modo incremental no se puede combinar con la salida en .zip.")
+            return
+
+        self.evento_cancelar.clear()
+        self.avance = {'total': None, 'completados': 0, 'inicio': time.perf_counter()}
+        self.barra_avance.config(mode='indeterminate', value=0)
+        self.barra_avance.start(15)
+        self.label_avance.config(text="Leyendo archivo...")
+        self.boton_procesar.config(state='disabled')
+        self.boton_cancelar.config(state='normal')
+
+        self.hilo = threading.Thread(
+            target=self._procesar_en_segundo_plano,
+            args=(self.archivo_excel, self.carpeta_destino, self.incremental.get(),
+                  'zip' if self.salida_zip.get() else 'archivos',
+                  [c.strip() for c in self.columnas_grupo.get().split(',') if c.strip()],
+                  self.columna_area.get().strip() or None),
+            daemon=True)
+        self.hilo.start()
+
+    def _procesar_en_segundo_plano(self, archivo_excel, carpeta_destino, incremental,
+                                   modo_salida, columnas_grupo, columna_area):
+        """
+        Ejecuta el procesamiento completo (en un hilo secundario) y envía los avances a la cola.
+        """
         try:
-            df = pd.read_excel(self.archivo_excel,
-                               sheet_name='Respuestas de formulario 1')
-            df.columns = [col.split('.')[0] if '.' in str(
-                col) else col for col in df.columns]
-            resultados, detalles_preguntas = calcular_puntuaciones(df)
-
-            archivo_general = os.path.join(
-                self.carpeta_destino, 'resultados_evaluacion_psicosocial.xlsx')
-            resultados.to_excel(archivo_general, index=False)
-
-            carpeta_individuales = os.path.join(
-                self.carpeta_destino, "resultados_individuales")
-            os.makedirs(carpeta_individuales, exist_ok=True)
+            self.cola.put(('total', contar_filas(archivo_excel)))
+
+            def al_completar(nombre, archivo, error):
+                self.cola.put(('reporte', nombre, error))
+
+            resumen = procesar_archivo(archivo_excel, carpeta_destino,
+                                       al_completar=al_completar, incremental=incremental,
+                                       cancelar=self.evento_cancelar,
+                                       modo_salida=modo_salida,
+                                       columnas_grupo=columnas_grupo,
+                                       columna_area=columna_area)
+            self.cola.put(('fin', resumen))
+        except Exception as e:
+            mensaje = str(e)
+            reporte = os.path.join(carpeta_destino, nombre_reporte_ejecucion)
+            if os.path.exists(reporte):
+                mensaje += f"\n\nDetalle en: {reporte}"
+            self.cola.put(('error', mensaje))
 
-            for idx, row in resultados.iterrows():
-                nombre = row['Nombre']
-                detalles = detalles_preguntas.iloc[idx]
-                wb = crear_reporte_individual(
-                    row, detalles, area_adscrita="Área por definir")
-                archivo_individual = os.path.join(
-                    carpeta_individuales, f"Reporte_{nombre.replace(' ', '_')}.xlsx")
-                wb.save(archivo_individual)
+    def cancelar(self):
+        """
+        Pide detener el procesamiento; se detiene al terminar los reportes en curso.
+        """
+        self.evento_cancelar.set()
+        self.boton_cancelar.config(state='disabled')
+        self.label_avance.config(text="Cancelando...")
 
-            messagebox.showinfo("Éxito", "¡Reportes generados correctamente!")
-        except Exception as e:
-            messagebox.showerror("Error", f"Ocurrió un error: {str(e)}")
+    def cerrar(self):
+        """
+        Cancela el procesamiento en curso (si lo hay) y cierra la ventana.
+        """
+        self.evento_cancelar.set()
+        self.root.destroy()
+
+    def revisar_cola(self):
+        """
+        Atiende los mensajes de los hilos de trabajo y vuelve a programarse.
+        """
+        from tkinter import messagebox
+
+        try:
+            while True:
+                mensaje = self.cola.get_nowait()
+                tipo = mensaje[0]
+                if tipo == 'vista_previa':
+                    _, archivo, texto = mensaje
+                    if archivo == self.archivo_excel:
+                        self.mostrar_vista_previa(texto)
+                elif tipo == 'total':
+                    self.avance['total'] = mensaje[1]
+                    if mensaje[1]:
+                        self.barra_avance.stop()
+                        self.barra_avance.config(mode='determinate', maximum=mensaje[1], value=0)
+                elif tipo == 'reporte':
+                    self.avance['completados'] += 1
+                elif tipo == 'fin':
+                    self.terminar(mensaje[1])
+                elif tipo == 'error':
+                    self.terminar(None)
+                    messagebox.showerror("Error", f"Ocurrió un error: {mensaje[1]}")
+        except queue.Empty:
+            pass
+
+        if self.hilo is not None and self.hilo.is_alive() and not self.evento_cancelar.is_set():
+            self.actualizar_avance()
+        self.root.after(100, self.revisar_cola)
+
+    def actualizar_avance(self):
+        """
+        Muestra los trabajadores procesados, la velocidad y el tiempo restante estimado.
+        """
+        completados = self.avance['completados']
+        total = self.avance['total']
+        transcurrido = time.perf_counter() - self.avance['inicio']
+        tasa = completados / transcurrido if transcurrido > 0 else 0
+        texto = f"{completados}" + (f" de {total}" if total else "") + " trabajadores"
+        if tasa > 0:
+            texto += f" · {tasa:.1f} por segundo"
+            if total and total > completados:
+                restante = int((total - completados) / tasa)
+                texto += f" · tiempo restante {restante // 60:02d}:{restante % 60:02d}"
+        if total:
+            self.barra_avance.config(value=min(completados, total))
+        self.label_avance.config(text=texto)
+
+    def terminar(self, resumen):
+        """
+        Restablece los controles al terminar y muestra el resultado del procesamiento.
+        """
+        from tkinter import messagebox
+
+        self.barra_avance.stop()
+        self.boton_procesar.config(state='normal')
+        self.boton_cancelar.config(state='disabled')
+        if resumen is None:
+            self.label_avance.config(text="")
+            return
+
+        self.barra_avance.config(mode='determinate', maximum=1, value=1)
+        self.label_avance.config(
+            text=f"{len(resumen['generados'])} reportes generados "
+                 f"en {time.perf_counter() - self.avance['inicio']:.1f} s")
+        if resumen['cancelado']:
+            messagebox.showinfo(
+                "Cancelado",
+                f"Proceso cancelado. Se generaron {len(resumen['generados'])} reportes.")
+        elif resumen['errores']:
+            detalle = "\n".join(f"{e['nombre']}: {e['error']}"
+                                 for e in resumen['errores'][:10])
+            messagebox.showwarning(
+                "Reportes incompletos",
+                f"Se generaron {len(resumen['generados'])} reportes; "
+                f"{len(resumen['errores'])} fallaron:\n\n{detalle}\n\n"
+                f"Detalle de la ejecución: {resumen['reporte_ejecucion']}")
+        elif resumen['respuestas']['no_resueltas']:
+            detalle = "\n".join(f"{valor!r}: {n} veces" for valor, n in
+                                 list(resumen['respuestas']['no_resueltas'].items())[:10])
+            messagebox.showwarning(
+                "Respuestas no reconocidas",
+                "Se generaron los reportes, pero estas respuestas no se reconocieron "
+                f"y puntuaron 0:\n\n{detalle}\n\n"
+                f"Detalle de la ejecución: {resumen['reporte_ejecucion']}")
+        else:
+            messagebox.showinfo(
+                "Éxito", "¡Reportes generados correctamente!\n\n"
+                         f"Detalle de la ejecución: {resumen['reporte_ejecucion']}")
+
+
+tiempos_arranque['modulo'] = round(time.perf_counter() - inicio_arranque, 3)
 
 
 if __name__ == "__main__":
+    # Necesario para el grupo de procesos en el ejecutable de PyInstaller
+    multiprocessing.freeze_support()
+    # Con argumentos se ejecuta en modo consola, sin interfaz gráfica
+    if len(sys.argv) > 1:
+        sys.exit(ejecutar_desde_consola())
     # Inicia la interfaz gráfica
+    from tkinter import Tk
+
     root = Tk()
     app = App(root)
     root.mainloop()
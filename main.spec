@@ -5,12 +5,20 @@ a = Analysis(
     ['main.py'],
     pathex=[],
     binaries=[],
-    datas=[],
+    datas=[('plantilla_reporte.xlsx', '.'), ('plantilla_reporte.html', '.')],
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    # Módulos que el programa no usa: pruebas y herramientas de pandas/numpy, y
+    # bibliotecas opcionales que pandas importaría si estuvieran instaladas (pyarrow
+    # solo lo usa el histórico, que no está en la interfaz; en consola, --historico
+    # termina con un mensaje que lo indica)
+    excludes=['pandas.tests', 'pandas.io.formats.style', 'pandas.io.clipboard',
+              'numpy.f2py', 'numpy.distutils', 'numpy.testing', 'numpy.typing',
+              'numpy.fft', 'numpy.polynomial', 'pyarrow', 'matplotlib', 'scipy',
+              'jinja2', 'IPython', 'pytest', 'setuptools', 'unittest', 'doctest',
+              'lib2to3', 'xmlrpc', 'pydoc_data'],
     noarchive=False,
     optimize=0,
 )
@@ -0,0 +1,359 @@
+"""
+Planificador de evaluaciones de varias empresas en una sola ejecución.
+
+Procesa una cola de trabajos (archivo de respuestas, carpeta de destino) con un solo
+grupo de procesos para los reportes individuales de todas las empresas, un máximo de
+trabajos simultáneos y un presupuesto de memoria. Los trabajos de mayor prioridad se
+procesan primero.
+
+El estado de cada trabajo se guarda en un registro local (JSON). Si el planificador se
+interrumpe, al volver a ejecutarlo se omiten los trabajos terminados y los demás se
+reanudan; como cada empresa se procesa en modo incremental, solo se generan los
+reportes que faltaban. Al terminar se escribe un resumen consolidado de todas las
+empresas:
+
+    python planificador.py clientes/*.xlsx -o auditoria_2025
+    python planificador.py --trabajos trabajos.csv -o auditoria_2025 --memoria-mb 2048
+"""
+import argparse
+import csv
+import heapq
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+
+from main import (Cuestionario, backends_reporte, emitir_evento, expandir_entradas,
+                  guardar_json, memoria_proceso, niveles_riesgo, procesar_archivo)
+
+# Registro de trabajos y resumen consolidado, en la carpeta de salida del planificador
+nombre_registro = 'registro_planificador.json'
+nombre_resumen_consolidado = 'resumen_consolidado.xlsx'
+
+# Memoria aproximada por fila de un bloque en el proceso del planificador (respuestas
+# leídas y puntuaciones); se usa para repartir el presupuesto de memoria
+memoria_por_fila = 8 * 1024
+
+# Tamaño mínimo de bloque al ajustar los bloques al presupuesto de memoria
+tamano_bloque_minimo = 500
+
+
+def cargar_registro(archivo):
+    """
+    Carga el registro de trabajos (vacío si no existe).
+    """
+    if not os.path.exists(archivo):
+        return {'trabajos': {}}
+    with open(archivo, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def leer_trabajos(archivo_csv):
+    """
+    Lee una lista de trabajos de un CSV con las columnas 'archivo' y, opcionalmente,
+    'salida', 'prioridad' y 'empresa'.
+    """
+    with open(archivo_csv, encoding='utf-8-sig', newline='') as f:
+        return [{clave.strip().lower(): (valor or "").strip() for clave, valor in fila.items()}
+                for fila in csv.DictReader(f)]
+
+
+class Planificador:
+    """
+    Cola de trabajos por empresa con un grupo de procesos compartido.
+
+    Se ejecutan hasta `simultaneos` trabajos a la vez. La lectura y la puntuación de
+    cada trabajo ocurren en este proceso; los reportes individuales de todos se envían
+    al mismo grupo de `procesos` procesos. `memoria_mb` es un límite aproximado de la
+    memoria de este proceso (lectura y puntuación): los bloques se ajustan para que los
+    trabajos simultáneos quepan y no se empieza un trabajo nuevo mientras no quede lugar
+    para otro bloque. No incluye los procesos de reportes, que dependen de `procesos`.
+
+    El estado de los trabajos se guarda en `archivo_registro` cada vez que cambia.
+    `al_evento(evento, **datos)` se llama al empezar y terminar cada trabajo.
+    """
+
+    def __init__(self, archivo_registro, procesos=None, simultaneos=2, memoria_mb=None,
+                 tamano_bloque=5000, backend='plantilla', cuestionario=None, al_evento=None):
+        self.archivo_registro = archivo_registro
+        self.procesos = procesos or os.cpu_count() or 1
+        self.simultaneos = max(1, simultaneos)
+        self.memoria = memoria_mb * 2 ** 20 if memoria_mb else None
+        self.tamano_bloque = tamano_bloque
+        self.backend = backend
+        self.cuestionario = cuestionario
+        self.al_evento = al_evento or (lambda evento, **datos: None)
+        self.condicion = threading.Condition()
+
+        self.registro = cargar_registro(archivo_registro)
+        self.trabajos = self.registro['trabajos']
+        # Trabajos que quedaron a medias en una ejecución anterior
+        for trabajo in self.trabajos.values():
+            if trabajo['estado'] == 'en_proceso':
+                trabajo['estado'] = 'pendiente'
+                trabajo['reanudado'] = True
+
+    def agregar(self, archivo_excel, carpeta_destino, prioridad=0, empresa=None,
+                repetir=False):
+        """
+        Agrega un trabajo a la cola (o actualiza su prioridad si ya estaba en el registro).
+        Los trabajos ya completados no se repiten salvo con `repetir`.
+        """
+        archivo_excel = os.path.abspath(archivo_excel)
+        carpeta_destino = os.path.abspath(carpeta_destino)
+        clave = f"{archivo_excel}|{carpeta_destino}"
+        with self.condicion:
+            trabajo = self.trabajos.get(clave)
+            if trabajo is None:
+                trabajo = self.trabajos[clave] = {
+                    'archivo_excel': archivo_excel,
+                    'carpeta_destino': carpeta_destino,
+                    'empresa': empresa or os.path.splitext(os.path.basename(archivo_excel))[0],
+                    'orden': len(self.trabajos),
+                    'estado': 'pendiente',
+                    'intentos': 0,
+                }
+            elif repetir or trabajo['estado'] == 'error':
+                trabajo['estado'] = 'pendiente'
+            trabajo['prioridad'] = prioridad
+            guardar_json(self.archivo_registro, self.registro)
+        return clave
+
+    def tamano_bloque_efectivo(self):
+        """
+        Filas por bloque: el tamaño pedido, reducido si los bloques de los trabajos
+        simultáneos no caben en el presupuesto de memoria.
+        """
+        if self.memoria is None:
+            return self.tamano_bloque
+        cabe = int(self.memoria / (self.simultaneos * memoria_por_fila))
+        return max(tamano_bloque_minimo, min(self.tamano_bloque, cabe))
+
+    def _hay_memoria(self):
+        """
+        Indica si la memoria actual de este proceso deja lugar para el bloque de otro trabajo.
+        """
+        if self.memoria is None:
+            return True
+        actual = memoria_proceso()[0]
+        if actual is None:
+            return True
+        return actual + self.tamano_bloque_efectivo() * memoria_por_fila <= self.memoria
+
+    def ejecutar(self, cancelar=None):
+        """
+        Procesa los trabajos pendientes por prioridad (y en el orden en que se agregaron)
+        hasta terminarlos o hasta que se active el evento `cancelar`; los trabajos
+        cancelados quedan pendientes para la siguiente ejecución. Devuelve el resumen
+        consolidado (ver `consolidar`).
+        """
+        cola = [(-t['prioridad'], t['orden'], clave) for clave, t in self.trabajos.items()
+                if t['estado'] == 'pendiente']
+        heapq.heapify(cola)
+        cancelar = cancelar or threading.Event()
+        activos = {}
+        executor = (ProcessPoolExecutor(max_workers=self.procesos)
+                    if self.procesos > 1 else None)
+        try:
+            with self.condicion:
+                while cola or activos:
+                    if cancelar.is_set():
+                        cola.clear()
+                    if (cola and len(activos) < self.simultaneos
+                            and (not activos or self._hay_memoria())):
+                        clave = heapq.heappop(cola)[2]
+                        hilo = threading.Thread(target=self._ejecutar_trabajo,
+                                                args=(clave, executor, cancelar, activos),
+                                                daemon=True)
+                        activos[clave] = hilo
+                        hilo.start()
+                        continue
+                    self.condicion.wait(0.5)
+        except BaseException:
+            # Por ejemplo, Ctrl+C: se detienen los trabajos en curso antes de salir
+            cancelar.set()
+            for hilo in list(activos.values()):
+                hilo.join()
+            raise
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+        return self.consolidar()
+
+    def _ejecutar_trabajo(self, clave, executor, cancelar, activos):
+        trabajo = self.trabajos[clave]
+        with self.condicion:
+            trabajo.update(estado='en_proceso', inicio=datetime.now().isoformat(timespec='seconds'),
+                           intentos=trabajo['intentos'] + 1, error=None)
+            trabajo.pop('detalle', None)
+            guardar_json(self.archivo_registro, self.registro)
+        self.al_evento('inicio', empresa=trabajo['empresa'], archivo=trabajo['archivo_excel'],
+                       reanudado=trabajo.get('reanudado', False))
+
+        inicio = time.perf_counter()
+        try:
+            resumen = procesar_archivo(
+                trabajo['archivo_excel'], trabajo['carpeta_destino'],
+                tamano_bloque=self.tamano_bloque_efectivo(), procesos=self.procesos,
+                backend=self.backend, incremental=True, cancelar=cancelar,
+                cuestionario=self.cuestionario, executor=executor)
+        except Exception as e:
+            estado, datos = 'error', {'error': str(e), 'detalle': traceback.format_exc()}
+        else:
+            if resumen['cancelado']:
+                estado, datos = 'pendiente', {}
+            else:
+                general = resumen['agregados'].get('General')
+                estado, datos = 'completado', {
+                    'trabajadores': len(resumen['resultados']),
+                    'generados': len(resumen['generados']),
+                    'errores': len(resumen['errores']),
+                    'incremental': resumen.get('incremental'),
+                    'general': ({columna: valor.item() if hasattr(valor, 'item') else valor
+                                 for columna, valor in general.iloc[0].items()}
+                                if general is not None and len(general) else {}),
+                    'reporte_ejecucion': resumen['reporte_ejecucion'],
+                }
+        datos['duracion_s'] = round(time.perf_counter() - inicio, 3)
+
+        with self.condicion:
+            trabajo.update(estado=estado, fin=datetime.now().isoformat(timespec='seconds'),
+                           **datos)
+            guardar_json(self.archivo_registro, self.registro)
+            activos.pop(clave, None)
+            self.condicion.notify_all()
+        self.al_evento('fin', empresa=trabajo['empresa'], estado=estado,
+                       **{k: v for k, v in datos.items() if k not in ('general', 'detalle')})
+
+    def consolidar(self, archivo=None):
+        """
+        Resumen de todas las empresas del registro (también las de ejecuciones
+        anteriores): estado, trabajadores, reportes, errores y los resultados generales
+        de cada una (promedios, distribución por nivel de riesgo y porcentajes), con una
+        fila 'Total' de todas las empresas completadas.
+
+        Se guarda en `archivo` (por defecto, resumen_consolidado.xlsx junto al registro)
+        y se devuelve como DataFrame.
+        """
+        filas = []
+        for trabajo in sorted(self.trabajos.values(), key=lambda t: t['orden']):
+            filas.append({
+                'Empresa': trabajo['empresa'],
+                'Estado': trabajo['estado'],
+                'Prioridad': trabajo['prioridad'],
+                'Reportes generados': trabajo.get('generados'),
+                'Errores': trabajo.get('errores'),
+                **trabajo.get('general', {}),
+                'Duración (s)': trabajo.get('duracion_s'),
+                'Archivo': trabajo['archivo_excel'],
+                'Carpeta de destino': trabajo['carpeta_destino'],
+                'Error': trabajo.get('error'),
+            })
+        tabla = pd.DataFrame(filas)
+
+        completadas = tabla[tabla['Estado'] == 'completado'] if len(tabla) else tabla
+        if 'Trabajadores' in tabla and completadas['Trabajadores'].sum() > 0:
+            n = completadas['Trabajadores']
+            total = {'Empresa': 'Total', 'Estado': f"{len(completadas)} de {len(tabla)}",
+                     'Trabajadores': n.sum(),
+                     'Reportes generados': completadas['Reportes generados'].sum(),
+                     'Errores': completadas['Errores'].sum()}
+            for columna in tabla.columns:
+                if columna.startswith('Promedio '):
+                    total[columna] = round((completadas[columna] * n).sum() / n.sum(), 2)
+                elif columna in niveles_riesgo:
+                    total[columna] = completadas[columna].sum()
+                elif columna.startswith('% '):
+                    total[columna] = round((completadas[columna] * n).sum() / n.sum(), 1)
+            tabla = pd.concat([tabla, pd.DataFrame([total])], ignore_index=True)
+
+        # Los conteos quedan enteros aunque falten en las empresas sin completar
+        for columna in ['Trabajadores', 'Reportes generados', 'Errores', *niveles_riesgo]:
+            if columna in tabla:
+                tabla[columna] = tabla[columna].astype('Int64')
+
+        archivo = archivo or os.path.join(os.path.dirname(os.path.abspath(self.archivo_registro)),
+                                          nombre_resumen_consolidado)
+        temporal = os.path.splitext(archivo)[0] + '.tmp.xlsx'
+        tabla.to_excel(temporal, index=False, sheet_name='Empresas', engine='openpyxl')
+        os.replace(temporal, archivo)
+        return tabla
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="planificador.py", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("entradas", nargs="*",
+                        help="archivos Excel de respuestas o patrones glob (p. ej. 'clientes/*.xlsx')")
+    parser.add_argument("--trabajos", default=None, metavar="CSV",
+                        help="CSV con las columnas archivo y, opcionalmente, salida, prioridad y empresa")
+    parser.add_argument("-o", "--salida", required=True,
+                        help="carpeta del registro y del resumen consolidado; cada empresa "
+                             "usa una subcarpeta si no se indica otra")
+    parser.add_argument("--prioridad", type=int, default=0,
+                        help="prioridad de las entradas de la línea de comandos (mayor primero)")
+    parser.add_argument("--procesos", type=int, default=None,
+                        help="procesos compartidos para los reportes (por defecto, uno por núcleo)")
+    parser.add_argument("--simultaneos", type=int, default=2,
+                        help="empresas que se procesan al mismo tiempo")
+    parser.add_argument("--memoria-mb", type=int, default=None,
+                        help="límite aproximado en MB de la memoria del proceso del "
+                             "planificador (sin los procesos de reportes)")
+    parser.add_argument("--tamano-bloque", type=int, default=5000,
+                        help="filas leídas por bloque (se reduce si no cabe en la memoria)")
+    parser.add_argument("--backend", choices=sorted(backends_reporte), default='plantilla',
+                        help="forma de escribir los reportes individuales")
+    parser.add_argument("--guia", default=None,
+                        help="archivo JSON de la guía de referencia (por defecto, la Guía II)")
+    parser.add_argument("--repetir", action="store_true",
+                        help="volver a procesar también los trabajos ya completados")
+    args = parser.parse_args(argv)
+
+    emitir = emitir_evento
+    trabajos = [{'archivo': a, 'prioridad': args.prioridad}
+                for a in expandir_entradas(args.entradas)]
+    if args.trabajos:
+        trabajos.extend(leer_trabajos(args.trabajos))
+    faltantes = [t['archivo'] for t in trabajos if not os.path.isfile(t['archivo'])]
+    if faltantes:
+        emitir('error', mensaje="No se encontraron los archivos de entrada", entradas=faltantes)
+        return 2
+
+    cuestionario = Cuestionario.desde_json(args.guia) if args.guia else None
+    os.makedirs(args.salida, exist_ok=True)
+    planificador = Planificador(
+        os.path.join(args.salida, nombre_registro), procesos=args.procesos,
+        simultaneos=args.simultaneos, memoria_mb=args.memoria_mb,
+        tamano_bloque=args.tamano_bloque, backend=args.backend, cuestionario=cuestionario,
+        al_evento=emitir)
+    for trabajo in trabajos:
+        empresa = trabajo.get('empresa') or os.path.splitext(os.path.basename(trabajo['archivo']))[0]
+        planificador.agregar(
+            trabajo['archivo'], trabajo.get('salida') or os.path.join(args.salida, empresa),
+            prioridad=int(trabajo.get('prioridad') or 0), empresa=empresa,
+            repetir=args.repetir)
+    if not planificador.trabajos:
+        emitir('error', mensaje="No hay trabajos que procesar")
+        return 2
+
+    try:
+        tabla = planificador.ejecutar()
+    except KeyboardInterrupt:
+        emitir('interrumpido', registro=planificador.archivo_registro)
+        return 1
+    estados = tabla['Estado'].value_counts().to_dict() if len(tabla) else {}
+    emitir('resumen', registro=planificador.archivo_registro,
+           resumen=os.path.join(args.salida, nombre_resumen_consolidado),
+           estados={k: v for k, v in estados.items() if k in
+                    ('completado', 'error', 'pendiente')})
+    return 0 if all(t['estado'] == 'completado' for t in planificador.trabajos.values()) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,438 @@
+"""
+Servicio HTTP local para puntuar cuestionarios en cuanto se contestan, sin pasar por
+archivos de Excel (por ejemplo, desde el portal de recursos humanos).
+
+Solo usa la biblioteca estándar (asyncio) y la lógica de main.py:
+
+    python servicio.py --puerto 8035
+
+    POST /puntuar            una evaluación (objeto) o varias (lista)
+    POST /puntuar?reporte=1  además devuelve el reporte individual de cada una
+    GET  /salud              estado del servicio y número de lotes puntuados
+
+Cada evaluación es un objeto JSON con el nombre del trabajador, el área (opcional) y
+las respuestas, como lista en el orden de las preguntas o como objeto pregunta ->
+respuesta; también se puede pedir el reporte de una sola evaluación con "reporte": true:
+
+    {"nombre": "Ana Pérez", "area": "Ventas", "respuestas": {"1": "Siempre", "2": "Nunca"}}
+
+Las preguntas que faltan cuentan como vacías ("Nunca"), igual que en la hoja de
+respuestas. Las evaluaciones que llegan casi al mismo tiempo se juntan en un solo lote
+para puntuarlas de una vez con `calcular_puntuaciones`, y los reportes se generan en un
+grupo de procesos, de modo que el servicio sigue atendiendo mientras se escriben.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from io import BytesIO
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from main import (Cuestionario, backends_reporte, calcular_puntuaciones, cuestionario_guia_ii,
+                  extensiones_reporte, generar_recomendaciones, nombre_archivo_reporte)
+
+# Tamaño máximo del cuerpo de una petición
+tamano_maximo_peticion = 16 * 2 ** 20
+
+# Textos de los códigos de estado que devuelve el servicio
+estados_http = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                411: 'Length Required', 413: 'Payload Too Large',
+                500: 'Internal Server Error'}
+
+
+class ErrorPeticion(Exception):
+    """
+    Petición no válida; se responde con `estado` y el mensaje del error.
+    """
+
+    def __init__(self, mensaje, estado=400):
+        super().__init__(mensaje)
+        self.estado = estado
+
+
+# Backend y guía de referencia de cada proceso que genera reportes
+_proceso_reportes = {}
+
+
+def _iniciar_proceso_reportes(backend, cuestionario):
+    """
+    Fija en cada proceso del grupo el backend y la guía con que se generan los reportes.
+    """
+    _proceso_reportes['escribir'] = backends_reporte[backend]
+    _proceso_reportes['cuestionario'] = cuestionario
+
+
+def _generar_reporte(row, detalles, area_adscrita, fecha):
+    """
+    Genera en memoria el reporte individual de un trabajador y lo devuelve en base64.
+    """
+    destino = BytesIO()
+    _proceso_reportes['escribir'](row, detalles, area_adscrita, destino, fecha,
+                                  _proceso_reportes['cuestionario'])
+    return base64.b64encode(destino.getvalue()).decode('ascii')
+
+
+def normalizar_evaluacion(datos, cuestionario):
+    """
+    Valida una evaluación recibida y devuelve (nombre, área, respuestas por pregunta,
+    si pide el reporte). Las claves de las respuestas pueden ser "1", "P1" o 1.
+    """
+    if not isinstance(datos, dict):
+        raise ErrorPeticion("Cada evaluación debe ser un objeto JSON")
+    nombre = datos.get('nombre')
+    if nombre is None or str(nombre).strip() == "":
+        raise ErrorPeticion("Falta el nombre del trabajador")
+    respuestas = datos.get('respuestas')
+    if isinstance(respuestas, list):
+        if len(respuestas) > cuestionario.n_preguntas:
+            raise ErrorPeticion(
+                f"Hay {len(respuestas)} respuestas; la guía tiene {cuestionario.n_preguntas}")
+        por_pregunta = {p: r for p, r in zip(cuestionario.preguntas, respuestas)}
+    elif isinstance(respuestas, dict):
+        por_pregunta = {}
+        for clave, respuesta in respuestas.items():
+            pregunta = str(clave).strip().lstrip('Pp')
+            if not pregunta.isdigit() or not 1 <= int(pregunta) <= cuestionario.n_preguntas:
+                raise ErrorPeticion(f"Pregunta desconocida: {clave}")
+            por_pregunta[int(pregunta)] = respuesta
+    else:
+        raise ErrorPeticion("Las respuestas deben ser una lista o un objeto")
+    for pregunta, respuesta in por_pregunta.items():
+        if respuesta is not None and not isinstance(respuesta, (str, int, float)):
+            raise ErrorPeticion(f"Respuesta no válida en la pregunta {pregunta}")
+    area = datos.get('area') or "Área por definir"
+    return str(nombre), str(area), por_pregunta, bool(datos.get('reporte'))
+
+
+class AgrupadorPuntuaciones:
+    """
+    Junta en lotes las evaluaciones que llegan casi al mismo tiempo y las puntúa de una
+    vez con `calcular_puntuaciones`.
+
+    Un lote se cierra `espera` segundos después de su primera evaluación o al llegar a
+    `maximo` evaluaciones. La puntuación corre en un hilo aparte (uno solo, así los
+    lotes se puntúan en orden) para no detener el bucle de eventos.
+    """
+
+    def __init__(self, cuestionario, espera=0.005, maximo=2000):
+        self.cuestionario = cuestionario
+        self.espera = espera
+        self.maximo = maximo
+        self.cola = asyncio.Queue()
+        self.hilo = ThreadPoolExecutor(max_workers=1)
+        self.lotes = 0
+        self.evaluaciones = 0
+        self.tarea = None
+
+    def iniciar(self):
+        self.tarea = asyncio.get_running_loop().create_task(self._atender())
+
+    async def detener(self):
+        if self.tarea is not None:
+            self.tarea.cancel()
+            try:
+                await self.tarea
+            except asyncio.CancelledError:
+                pass
+        self.hilo.shutdown()
+
+    async def puntuar(self, evaluaciones):
+        """
+        Puntúa una lista de evaluaciones normalizadas (ver `normalizar_evaluacion`) y
+        devuelve, para cada una, (resultado, fila de resultados, detalles por pregunta).
+        """
+        futuro = asyncio.get_running_loop().create_future()
+        await self.cola.put((evaluaciones, futuro))
+        return await futuro
+
+    async def _atender(self):
+        bucle = asyncio.get_running_loop()
+        while True:
+            pendientes = [await self.cola.get()]
+            total = len(pendientes[0][0])
+            limite = bucle.time() + self.espera
+            while total < self.maximo:
+                restante = limite - bucle.time()
+                if restante <= 0:
+                    break
+                try:
+                    pendiente = await asyncio.wait_for(self.cola.get(), restante)
+                except asyncio.TimeoutError:
+                    break
+                pendientes.append(pendiente)
+                total += len(pendiente[0])
+
+            evaluaciones = [e for lote, _ in pendientes for e in lote]
+            try:
+                puntuadas = await bucle.run_in_executor(self.hilo, self._puntuar, evaluaciones)
+            except Exception as e:
+                for _, futuro in pendientes:
+                    if not futuro.done():
+                        futuro.set_exception(e)
+                continue
+            self.lotes += 1
+            self.evaluaciones += len(evaluaciones)
+            inicio = 0
+            for lote, futuro in pendientes:
+                if not futuro.done():
+                    futuro.set_result(puntuadas[inicio:inicio + len(lote)])
+                inicio += len(lote)
+
+    def _puntuar(self, evaluaciones):
+        cuestionario = self.cuestionario
+        df = pd.DataFrame({
+            'Nombre Completo del trabajador': [nombre for nombre, _, _, _ in evaluaciones],
+            **{f"{p}": [respuestas.get(p) for _, _, respuestas, _ in evaluaciones]
+               for p in cuestionario.preguntas}
+        })
+        resultados, detalles_preguntas = calcular_puntuaciones(df, cuestionario)
+        grupos = [nombre for nombre, _ in cuestionario.grupos]
+        puntuadas = []
+        for row, detalles in zip(resultados.to_dict('records'),
+                                 detalles_preguntas.to_dict('records')):
+            nivel = row['Nivel de Riesgo']
+            resultado = {
+                'nombre': row['Nombre'],
+                'puntuacion_total': int(row['Puntuación Total']),
+                'nivel_riesgo': nivel,
+                'recomendacion': generar_recomendaciones(nivel),
+                'categorias': {grupo: int(row[grupo]) for grupo in grupos},
+                'niveles_categoria': {
+                    categoria: row[f"Nivel de la categoría - {categoria}"]
+                    for categoria in cuestionario.cortes_categoria
+                    if f"Nivel de la categoría - {categoria}" in row},
+                'dominios': {
+                    dominio: {'puntuacion': int(row[f"Dominio - {dominio}"]),
+                              'nivel': row.get(f"Nivel del dominio - {dominio}")}
+                    for dominio in cuestionario.dominios if f"Dominio - {dominio}" in row},
+                'respuestas_no_resueltas': {
+                    clave: valor for clave, valor in detalles.items()
+                    if clave != 'Nombre' and cuestionario.resolver_respuesta(valor) is None},
+            }
+            puntuadas.append((resultado, row, detalles))
+        return puntuadas
+
+
+class ServicioPuntuacion:
+    """
+    Servidor HTTP/1.1 mínimo (con conexiones persistentes) sobre asyncio.
+    """
+
+    def __init__(self, cuestionario=None, backend='plantilla', procesos=None,
+                 espera_lote=0.005, maximo_lote=2000):
+        self.cuestionario = cuestionario or cuestionario_guia_ii
+        self.backend = backend
+        self.procesos = procesos or os.cpu_count() or 1
+        self.espera_lote = espera_lote
+        self.maximo_lote = maximo_lote
+        self.agrupador = None
+        self.executor = None
+        self.inicio = time.time()
+
+    async def iniciar(self, host='127.0.0.1', puerto=8035):
+        """
+        Crea el grupo de procesos de reportes y empieza a escuchar en `host`:`puerto`.
+        Devuelve el servidor de asyncio.
+        """
+        self.agrupador = AgrupadorPuntuaciones(self.cuestionario, self.espera_lote,
+                                               self.maximo_lote)
+        self.agrupador.iniciar()
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.procesos, initializer=_iniciar_proceso_reportes,
+            initargs=(self.backend, self.cuestionario))
+        return await asyncio.start_server(self.atender_conexion, host, puerto)
+
+    async def detener(self):
+        if self.agrupador is not None:
+            await self.agrupador.detener()
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+
+    async def atender_conexion(self, lector, escritor):
+        """
+        Atiende las peticiones de una conexión hasta que el cliente la cierre.
+        """
+        try:
+            while True:
+                try:
+                    peticion = await self._leer_peticion(lector)
+                except ErrorPeticion as e:
+                    await self._responder(escritor, e.estado, {'error': str(e)}, cerrar=True)
+                    break
+                if peticion is None:
+                    break
+                metodo, ruta, encabezados, cuerpo = peticion
+                cerrar = encabezados.get('connection', '').lower() == 'close'
+                try:
+                    estado, respuesta = 200, await self.despachar(metodo, ruta, cuerpo)
+                except ErrorPeticion as e:
+                    estado, respuesta = e.estado, {'error': str(e)}
+                except Exception as e:
+                    estado, respuesta = 500, {'error': str(e)}
+                await self._responder(escritor, estado, respuesta, cerrar)
+                if cerrar:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            escritor.close()
+
+    async def _leer_peticion(self, lector):
+        """
+        Lee una petición; devuelve (método, ruta, encabezados, cuerpo) o None si la
+        conexión se cerró.
+        """
+        linea = await lector.readline()
+        if not linea.strip():
+            return None
+        try:
+            metodo, ruta, _ = linea.decode('latin-1').split()
+        except ValueError:
+            raise ErrorPeticion("Línea de petición no válida")
+        encabezados = {}
+        while True:
+            linea = await lector.readline()
+            if linea in (b'\r\n', b'\n', b''):
+                break
+            clave, _, valor = linea.decode('latin-1').partition(':')
+            encabezados[clave.strip().lower()] = valor.strip()
+        cuerpo = b''
+        if metodo == 'POST':
+            if 'content-length' not in encabezados:
+                raise ErrorPeticion("Falta Content-Length", 411)
+            valor = encabezados['content-length']
+            # Solo dígitos: int() también aceptaría signos, espacios y guiones bajos
+            if not (valor.isascii() and valor.isdigit()):
+                raise ErrorPeticion("Content-Length no válido")
+            longitud = int(valor)
+            if longitud > tamano_maximo_peticion:
+                raise ErrorPeticion("La petición es demasiado grande", 413)
+            cuerpo = await lector.readexactly(longitud)
+        return metodo, ruta, encabezados, cuerpo
+
+    async def _responder(self, escritor, estado, datos, cerrar=False):
+        contenido = json.dumps(datos, ensure_ascii=False, default=_a_json).encode('utf-8')
+        escritor.write(
+            f"HTTP/1.1 {estado} {estados_http[estado]}\r\n"
+            "Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(contenido)}\r\n"
+            f"Connection: {'close' if cerrar else 'keep-alive'}\r\n\r\n".encode('latin-1')
+            + contenido)
+        await escritor.drain()
+
+    async def despachar(self, metodo, ruta, cuerpo):
+        """
+        Atiende una petición y devuelve los datos de la respuesta.
+        """
+        partes = urlsplit(ruta)
+        parametros = parse_qs(partes.query)
+        if partes.path == '/salud':
+            if metodo != 'GET':
+                raise ErrorPeticion("Use GET", 405)
+            return {'estado': 'ok', 'guia': self.cuestionario.nombre,
+                    'backend': self.backend, 'procesos': self.procesos,
+                    'lotes': self.agrupador.lotes,
+                    'evaluaciones': self.agrupador.evaluaciones,
+                    'activo_s': round(time.time() - self.inicio, 1)}
+        if partes.path != '/puntuar':
+            raise ErrorPeticion(f"Ruta desconocida: {partes.path}", 404)
+        if metodo != 'POST':
+            raise ErrorPeticion("Use POST", 405)
+
+        try:
+            datos = json.loads(cuerpo)
+        except ValueError as e:
+            raise ErrorPeticion(f"JSON no válido: {e}")
+        varias = isinstance(datos, list)
+        evaluaciones = [normalizar_evaluacion(d, self.cuestionario)
+                        for d in (datos if varias else [datos])]
+        if not evaluaciones:
+            return []
+        con_reporte = parametros.get('reporte', ['0'])[0].lower() in ('1', 'true', 'si', 'sí')
+
+        puntuadas = await self.agrupador.puntuar(evaluaciones)
+        fecha = datetime.now().replace(microsecond=0)
+        bucle = asyncio.get_running_loop()
+        reportes = {
+            k: bucle.run_in_executor(self.executor, _generar_reporte, row, detalles,
+                                     evaluaciones[k][1], fecha)
+            for k, (_, row, detalles) in enumerate(puntuadas)
+            if con_reporte or evaluaciones[k][3]}
+
+        respuesta = []
+        for k, (resultado, row, _) in enumerate(puntuadas):
+            resultado = dict(resultado, area=evaluaciones[k][1])
+            if k in reportes:
+                try:
+                    contenido = await reportes[k]
+                except Exception as e:
+                    resultado['reporte'] = {'error': str(e)}
+                else:
+                    resultado['reporte'] = {
+                        'archivo': nombre_archivo_reporte(
+                            row['Nombre'], extensiones_reporte.get(self.backend, '.xlsx')),
+                        'contenido_base64': contenido}
+            respuesta.append(resultado)
+        return respuesta if varias else respuesta[0]
+
+
+def _a_json(valor):
+    """
+    Convierte a tipos de JSON los valores de numpy que quedan en las respuestas.
+    """
+    if isinstance(valor, np.generic):
+        return valor.item()
+    return str(valor)
+
+
+async def servir(host, puerto, **opciones):
+    """
+    Inicia el servicio y atiende peticiones hasta que se interrumpa.
+    """
+    servicio = ServicioPuntuacion(**opciones)
+    servidor = await servicio.iniciar(host, puerto)
+    direcciones = ", ".join(str(s.getsockname()) for s in servidor.sockets)
+    print(f"Servicio de puntuación escuchando en {direcciones}", flush=True)
+    try:
+        async with servidor:
+            await servidor.serve_forever()
+    finally:
+        await servicio.detener()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="servicio.py", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default='127.0.0.1',
+                        help="dirección en la que se escucha (por defecto, solo este equipo)")
+    parser.add_argument("--puerto", type=int, default=8035)
+    parser.add_argument("--procesos", type=int, default=None,
+                        help="procesos para generar reportes (por defecto, uno por núcleo)")
+    parser.add_argument("--backend", choices=sorted(backends_reporte), default='plantilla',
+                        help="forma de escribir los reportes individuales")
+    parser.add_argument("--guia", default=None,
+                        help="archivo JSON de la guía de referencia (por defecto, la Guía II)")
+    parser.add_argument("--espera-lote", type=float, default=5.0, metavar="MS",
+                        help="milisegundos que se esperan evaluaciones para juntarlas en un lote")
+    parser.add_argument("--maximo-lote", type=int, default=2000,
+                        help="evaluaciones máximas por lote")
+    args = parser.parse_args(argv)
+
+    cuestionario = Cuestionario.desde_json(args.guia) if args.guia else None
+    try:
+        asyncio.run(servir(args.host, args.puerto, cuestionario=cuestionario,
+                           backend=args.backend, procesos=args.procesos,
+                           espera_lote=args.espera_lote / 1000, maximo_lote=args.maximo_lote))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
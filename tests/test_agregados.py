@@ -0,0 +1,37 @@
+"""
+Pruebas de los resúmenes por grupo de `agregar_resultados`.
+"""
+import pandas as pd
+import pytest
+
+import benchmark
+import main
+
+
+@pytest.fixture(scope='module')
+def resultados(tmp_path_factory):
+    archivo = tmp_path_factory.mktemp('agregados') / 'respuestas.xlsx'
+    benchmark.generar_respuestas_sinteticas(str(archivo), 60)
+    resultados, _ = main.calcular_puntuaciones(main.leer_respuestas(str(archivo)))
+    resultados['Área'] = ['Ventas', 'Almacén', 'Oficina'] * 20
+    return resultados
+
+
+def test_promedios_de_categorias_y_dominios(resultados):
+    general = main.agregar_resultados(resultados, [])['General']
+    cuestionario = main.cuestionario_guia_ii
+    for columna in [*cuestionario.categorias,
+                    *(f"Dominio - {dominio}" for dominio in cuestionario.dominios)]:
+        assert general[f"Promedio {columna}"][0] == round(resultados[columna].mean(), 2)
+
+
+def test_distribucion_por_nivel_de_categorias_y_dominios(resultados):
+    por_area = main.agregar_resultados(resultados, ['Área'])['Por Área'].set_index('Área')
+    for _, _, columna_nivel in main.cuestionario_guia_ii.calificaciones:
+        for area, grupo in resultados.groupby('Área'):
+            conteo = grupo[columna_nivel].value_counts()
+            for nivel in main.niveles_riesgo:
+                esperado = round(100 * conteo.get(nivel, 0) / len(grupo), 1)
+                assert por_area.loc[area, f"{columna_nivel}: % {nivel}"] == esperado
+        assert por_area[[f"{columna_nivel}: % {nivel}" for nivel in main.niveles_riesgo]] \
+            .sum(axis=1).round().eq(100).all()
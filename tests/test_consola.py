@@ -0,0 +1,46 @@
+"""
+Pruebas del modo consola.
+"""
+import os
+import subprocess
+import sys
+
+import benchmark
+
+raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_consola_sin_tkinter(tmp_path):
+    archivo = tmp_path / 'respuestas.xlsx'
+    benchmark.generar_respuestas_sinteticas(str(archivo), 3)
+    # Un servidor sin _tkinter: importarlo falla
+    codigo = (
+        "import sys\n"
+        "sys.modules['tkinter'] = sys.modules['_tkinter'] = None\n"
+        f"sys.path.insert(0, {raiz!r})\n"
+        "import main, servicio, planificador\n"
+        "sys.exit(main.ejecutar_desde_consola(sys.argv[1:]))\n"
+    )
+    proceso = subprocess.run(
+        [sys.executable, '-c', codigo, str(archivo), '-o', str(tmp_path / 'salida'),
+         '--procesos', '1'], capture_output=True, text=True)
+    assert proceso.returncode == 0, proceso.stderr
+    assert len(os.listdir(tmp_path / 'salida' / 'resultados_individuales')) == 3
+
+
+def test_historico_sin_pyarrow(tmp_path):
+    archivo = tmp_path / 'respuestas.xlsx'
+    benchmark.generar_respuestas_sinteticas(str(archivo), 3)
+    codigo = (
+        "import sys\n"
+        "sys.modules['pyarrow'] = None\n"
+        f"sys.path.insert(0, {raiz!r})\n"
+        "import main\n"
+        "sys.exit(main.ejecutar_desde_consola(sys.argv[1:]))\n"
+    )
+    proceso = subprocess.run(
+        [sys.executable, '-c', codigo, str(archivo), '-o', str(tmp_path / 'salida'),
+         '--historico', str(tmp_path / 'historico')], capture_output=True, text=True)
+    assert proceso.returncode == 2
+    assert 'pyarrow' in proceso.stderr
+    assert not (tmp_path / 'salida').exists()
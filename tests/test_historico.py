@@ -0,0 +1,31 @@
+"""
+Pruebas del histórico de evaluaciones.
+"""
+from datetime import date
+
+import pandas as pd
+import pytest
+
+pytest.importorskip('pyarrow')
+
+import historico  # noqa: E402
+
+
+def guardar(carpeta, fecha, filas):
+    resultados = pd.DataFrame(filas, columns=['Nombre', 'Puntuación Total', 'Nivel de Riesgo'])
+    escritor = historico.EscritorHistorico(str(carpeta), 'ACME', fecha)
+    escritor.agregar(resultados, resultados[['Nombre']])
+    escritor.cerrar()
+
+
+def test_comparar_anios_no_junta_trabajadores_con_el_mismo_nombre(tmp_path):
+    guardar(tmp_path, date(2024, 6, 1), [('Ana Pérez', 30, 'Bajo'), ('Ana Pérez', 80, 'Alto'),
+                                         ('Luis Gómez', 50, 'Medio')])
+    guardar(tmp_path, date(2025, 6, 1), [('Ana Pérez', 40, 'Bajo'), ('Ana Pérez', 70, 'Alto'),
+                                         ('Luis Gómez', 60, 'Medio')])
+
+    tabla = historico.comparar_anios(str(tmp_path), 'ACME')
+    assert list(tabla.index) == ['Ana Pérez', 'Ana Pérez (2)', 'Luis Gómez']
+    assert list(tabla[('Puntuación Total', '2024')]) == [30, 80, 50]
+    assert list(tabla[('Cambio Puntuación Total', '2025')]) == [10, -10, 10]
+    assert list(tabla[('Nombre repetido', '')]) == [True, True, False]
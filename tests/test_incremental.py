@@ -0,0 +1,76 @@
+"""
+Pruebas del modo incremental de `procesar_archivo`.
+"""
+import json
+import os
+
+import pandas as pd
+import pytest
+
+import benchmark
+import main
+
+
+@pytest.fixture
+def respuestas(tmp_path):
+    archivo = tmp_path / 'respuestas.xlsx'
+    benchmark.generar_respuestas_sinteticas(str(archivo), 20)
+    return str(archivo)
+
+
+def procesar(respuestas, carpeta, cuestionario=None):
+    return main.procesar_archivo(respuestas, str(carpeta), procesos=1, incremental=True,
+                                 cuestionario=cuestionario)
+
+
+def test_sin_cambios_reutiliza_resultados(respuestas, tmp_path):
+    salida = tmp_path / 'salida'
+    assert procesar(respuestas, salida)['incremental']['nuevos'] == 20
+    assert procesar(respuestas, salida)['incremental']['sin_cambios'] == 20
+
+
+def test_otra_guia_vuelve_a_puntuar(respuestas, tmp_path):
+    salida = tmp_path / 'salida'
+    procesar(respuestas, salida)
+
+    # Misma guía con otros cortes de nivel: todos los trabajadores quedan en 'Muy alto'
+    ruta_guia = os.path.join(os.path.dirname(main.__file__), 'guias', 'guia_ii.json')
+    with open(ruta_guia, encoding='utf-8') as f:
+        datos = json.load(f)
+    datos['cortes_nivel'] = [0, 0, 0, 0]
+    otra = tmp_path / 'otra.json'
+    otra.write_text(json.dumps(datos, ensure_ascii=False), encoding='utf-8')
+
+    resumen = procesar(respuestas, salida, main.Cuestionario.desde_json(str(otra)))
+    assert resumen['incremental']['modificados'] == 20
+    assert resumen['incremental']['sin_cambios'] == 0
+    general = pd.read_excel(salida / 'resultados_evaluacion_psicosocial.xlsx')
+    assert set(general['Nivel de Riesgo']) == {'Muy alto'}
+
+
+def test_manifiesto_sin_version_vuelve_a_puntuar(respuestas, tmp_path):
+    salida = tmp_path / 'salida'
+    procesar(respuestas, salida)
+    manifiesto = main.cargar_manifiesto(str(salida))
+    del manifiesto['puntuacion']
+    main.guardar_manifiesto(str(salida), manifiesto)
+
+    assert procesar(respuestas, salida)['incremental']['modificados'] == 20
+    assert procesar(respuestas, salida)['incremental']['sin_cambios'] == 20
+
+
+def test_borra_temporales_de_una_ejecucion_interrumpida(respuestas, tmp_path):
+    salida = tmp_path / 'salida'
+    procesar(respuestas, salida)
+    individuales = salida / 'resultados_individuales'
+    reporte = next(individuales.iterdir())
+    temporal = individuales / f"{reporte.name}.4321.tmp"
+    temporal.write_bytes(b'a medias')
+    ajeno = individuales / 'notas.tmp'
+    ajeno.write_bytes(b'')
+
+    procesar(respuestas, salida)
+    assert not temporal.exists()
+    assert ajeno.exists()
+    with open(salida / 'reporte_ejecucion.json', encoding='utf-8') as f:
+        assert json.load(f)['contadores']['temporales_borrados'] == 1
@@ -0,0 +1,151 @@
+"""
+Pruebas del cálculo de puntuaciones.
+"""
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import main
+
+ruta_guia_ii = os.path.join(os.path.dirname(main.__file__), 'guias', 'guia_ii.json')
+
+
+def respuestas_de(valores, nombre="Trabajador"):
+    """
+    DataFrame de un trabajador con las respuestas {pregunta: valor} y "Nunca" en las demás.
+    """
+    return pd.DataFrame({'Nombre Completo del trabajador': [nombre],
+                         **{f"{p}": [valores.get(p, "Nunca")] for p in range(1, 47)}})
+
+
+@pytest.fixture(params=['integrada', 'json'])
+def cuestionario(request):
+    if request.param == 'json':
+        return main.Cuestionario.desde_json(ruta_guia_ii)
+    return main.cuestionario_guia_ii
+
+
+@pytest.mark.parametrize('pregunta', [20, 4])
+def test_casi_nuca_puntua_como_casi_nunca(cuestionario, pregunta):
+    # Pregunta 20 positiva (Casi nunca = 3), pregunta 4 negativa (Casi nunca = 1)
+    base, _ = main.calcular_puntuaciones(respuestas_de({}), cuestionario)
+    correcta, _ = main.calcular_puntuaciones(respuestas_de({pregunta: "Casi nunca"}), cuestionario)
+    registro = {}
+    con_error, detalles = main.calcular_puntuaciones(
+        respuestas_de({pregunta: "Casi nuca"}), cuestionario, registro_respuestas=registro)
+
+    assert con_error['Puntuación Total'][0] == correcta['Puntuación Total'][0]
+    assert correcta['Puntuación Total'][0] != base['Puntuación Total'][0]
+    assert detalles[f"P{pregunta}"][0] == "Casi nunca"
+    assert registro['corregidas'] == {"Casi nuca": "Casi nunca"}
+    assert not registro['no_resueltas']
+
+
+def test_casi_nuca_no_es_respuesta_de_la_escala(cuestionario):
+    assert "Casi nuca" not in cuestionario.vocabulario
+    assert cuestionario.resolver_respuesta("Casi nuca") == "Casi nunca"
+    assert cuestionario.resolver_respuesta("  casi NUCA ") == "Casi nunca"
+
+
+def test_huella_de_la_guia_integrada_y_json_coinciden():
+    json_ii = main.Cuestionario.desde_json(ruta_guia_ii)
+    assert json_ii.huella == main.cuestionario_guia_ii.huella
+    assert main.huella_puntuacion(json_ii) == main.huella_puntuacion()
+
+
+# Tablas y ciclo por fila de la versión anterior de `calcular_puntuaciones`, para
+# comprobar que la versión con matrices da los mismos resultados
+puntuaciones_anteriores = {
+    'negativas': {'Siempre': 4, 'Casi siempre': 3, 'Algunas veces': 2, 'Casi nunca': 1,
+                  'Nunca': 0, 'Casi nuca': 1},
+    'positivas': {'Siempre': 0, 'Casi siempre': 1, 'Algunas veces': 2, 'Casi nunca': 3,
+                  'Nunca': 4},
+}
+
+
+def calcular_puntuaciones_anterior(df):
+    resultados = []
+    detalles_por_pregunta = []
+    for _, row in df.iterrows():
+        puntuacion_total = 0
+        detalles = {}
+        detalles_preguntas = {'Nombre': row['Nombre Completo del trabajador']}
+        for i in range(1, 47):
+            if f"{i}" in row.index:
+                respuesta = row[f"{i}"]
+                if pd.isna(respuesta) or respuesta == "":
+                    respuesta = "Nunca"
+                tipo = 'negativas' if (1 <= i <= 17 or 34 <= i <= 46) else 'positivas'
+                puntuacion = puntuaciones_anteriores[tipo].get(respuesta, 0)
+                puntuacion_total += puntuacion
+                detalles[f"P{i}"] = puntuacion
+                detalles_preguntas[f"P{i}"] = respuesta
+
+        categorias_puntuacion = {
+            'Ambiente de trabajo': sum(detalles.get(f"P{p}", 0)
+                                       for p in main.categorias['Ambiente de trabajo'])}
+        for cat, subcats in [k for k in main.categorias.items() if isinstance(k[1], dict)]:
+            punt_cat_total = 0
+            for subcat, preguntas in subcats.items():
+                punt_subcat = sum(detalles.get(f"P{p}", 0) for p in preguntas)
+                categorias_puntuacion[f"{cat} - {subcat}"] = punt_subcat
+                punt_cat_total += punt_subcat
+            categorias_puntuacion[cat] = punt_cat_total
+
+        resultados.append({
+            'Nombre': detalles_preguntas['Nombre'],
+            'Puntuación Total': puntuacion_total,
+            'Nivel de Riesgo': main.determinar_nivel_riesgo(puntuacion_total),
+            **categorias_puntuacion
+        })
+        detalles_por_pregunta.append(detalles_preguntas)
+    return pd.DataFrame(resultados), pd.DataFrame(detalles_por_pregunta)
+
+
+def respuestas_casos_limite():
+    """
+    Trabajadores con respuestas vacías, 'Casi nuca' en preguntas negativas, valores
+    desconocidos y las preguntas 41 a 46 (solo para quien atiende clientes o supervisa)
+    sin contestar.
+    """
+    generador = np.random.default_rng(7)
+    escala = ['Siempre', 'Casi siempre', 'Algunas veces', 'Casi nunca', 'Nunca']
+    filas = []
+    for k in range(40):
+        valores = {p: escala[generador.integers(5)] for p in range(1, 47)}
+        if k % 4 == 0:
+            valores.update({p: None for p in range(41, 47)})
+        elif k % 4 == 1:
+            valores.update({p: "" for p in range(41, 47)})
+        for p in generador.choice(46, 5, replace=False) + 1:
+            valores[p] = [np.nan, "", None, "No sé", 3][generador.integers(5)]
+        # Solo en preguntas negativas: en las positivas 'Casi nuca' antes puntuaba 0 y
+        # ahora puntúa como 'Casi nunca' (ver test_casi_nuca_puntua_como_casi_nunca)
+        for p in (4, 35, 44):
+            if k % 3 == 0:
+                valores[p] = "Casi nuca"
+        filas.append(valores)
+    return pd.DataFrame({'Nombre Completo del trabajador': [f"Trabajador {k}" for k in range(40)],
+                         **{f"{p}": [fila[p] for fila in filas] for p in range(1, 47)}})
+
+
+@pytest.mark.parametrize('sin_condicionales', [False, True])
+def test_igual_que_el_calculo_por_fila(sin_condicionales):
+    df = respuestas_casos_limite()
+    if sin_condicionales:
+        df = df.drop(columns=[f"{p}" for p in range(41, 47)])
+    anterior, detalles_anteriores = calcular_puntuaciones_anterior(df)
+    resultados, detalles = main.calcular_puntuaciones(df)
+
+    pd.testing.assert_frame_equal(resultados[anterior.columns], anterior, check_dtype=False)
+    # En los detalles 'Casi nuca' queda corregida como 'Casi nunca'
+    pd.testing.assert_frame_equal(detalles, detalles_anteriores.replace("Casi nuca", "Casi nunca"))
+
+
+def test_copias_de_la_guia_comparten_la_plantilla_compilada():
+    copia = pickle.loads(pickle.dumps(main.Cuestionario.desde_json(ruta_guia_ii)))
+    assert copia == main.cuestionario_guia_ii
+    assert main._maqueta_pdf(copia) is main._maqueta_pdf(main.cuestionario_guia_ii)
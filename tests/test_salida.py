@@ -0,0 +1,48 @@
+"""
+Pruebas de los archivos de salida de `procesar_archivo`.
+"""
+import os
+import threading
+
+import pandas as pd
+import pytest
+
+import benchmark
+import main
+
+
+def test_indice_legible_sin_excel(tmp_path):
+    archivo = tmp_path / 'respuestas.xlsx'
+    benchmark.generar_respuestas_sinteticas(str(archivo), 5)
+    salida = tmp_path / 'salida'
+    main.procesar_archivo(str(archivo), str(salida), procesos=1)
+
+    indice = pd.read_excel(salida / 'resultados_evaluacion_psicosocial.xlsx',
+                           sheet_name=main.hoja_indice)
+    assert len(indice) == 5
+    for ruta in indice['Archivo']:
+        assert ruta.startswith('resultados_individuales/')
+        assert os.path.isfile(salida / ruta)
+
+
+def test_tiempo_de_guardado_por_hilo():
+    antes = main.tiempo_guardado.segundos
+
+    def guardar_en_otro_hilo():
+        main.tiempo_guardado.segundos += 5.0
+    hilo = threading.Thread(target=guardar_en_otro_hilo)
+    hilo.start()
+    hilo.join()
+    assert main.tiempo_guardado.segundos == antes
+
+
+
+def test_columna_de_area_faltante(tmp_path):
+    archivo = tmp_path / 'respuestas.xlsx'
+    benchmark.generar_respuestas_sinteticas(str(archivo), 3)
+    with pytest.raises(ValueError, match=r"área adscrita \(--columna-area\): Departamento"):
+        main.procesar_archivo(str(archivo), str(tmp_path / 'salida'), procesos=1,
+                              columna_area='Departamento')
+    with pytest.raises(ValueError, match=r"agrupar \(--agrupar\): Centro$"):
+        main.procesar_archivo(str(archivo), str(tmp_path / 'salida'), procesos=1,
+                              columnas_grupo=['Centro'])
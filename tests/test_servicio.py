@@ -0,0 +1,32 @@
+"""
+Pruebas del servicio HTTP.
+"""
+import asyncio
+
+import pytest
+
+import servicio
+
+
+def leer(peticion):
+    async def leer_peticion():
+        lector = asyncio.StreamReader()
+        lector.feed_data(peticion)
+        lector.feed_eof()
+        return await servicio.ServicioPuntuacion()._leer_peticion(lector)
+    return asyncio.run(leer_peticion())
+
+
+def test_lee_el_cuerpo_de_un_post():
+    metodo, ruta, _, cuerpo = leer(b'POST /puntuar HTTP/1.1\r\nContent-Length: 2\r\n\r\n{}')
+    assert (metodo, ruta, cuerpo) == ('POST', '/puntuar', b'{}')
+
+
+@pytest.mark.parametrize('longitud, estado', [
+    (b'abc', 400), (b'-1', 400), (b'+2', 400), (b'1_0', 400), (b'', 400),
+    (str(servicio.tamano_maximo_peticion + 1).encode(), 413),
+])
+def test_content_length_no_valido(longitud, estado):
+    with pytest.raises(servicio.ErrorPeticion) as error:
+        leer(b'POST /puntuar HTTP/1.1\r\nContent-Length: ' + longitud + b'\r\n\r\n{}')
+    assert error.value.estado == estado